@@ -7,8 +7,7 @@ import mnist
 sys.path.append("extension")
 import pyceptron
 
-training_set = mnist.read(dataset="training", path="mnist")
-testing_set = mnist.read(dataset="testing", path="mnist")
+testing_images, testing_labels = mnist.load(dataset="testing", path="mnist", normalize=True)
 
 architecture = [784, 300, 10]
 activation = "ReLU"
@@ -17,18 +16,12 @@ softmax = 1
 network = pyceptron.Network(architecture, activation=activation, softmax=softmax)
 network.load_state("states/784_300_10_sgd_ReLU_softmax_229.state")
 
-bad_lbl = list()
-bad_img = list()
-print(len(testing_set))
-# Calculate the training error rate
-for i in range(len(testing_set)):
-    sample = testing_set[i]
-    prediction = network.predict(sample[0])
-    prediction = np.argmax(prediction)
-    expectation = np.argmax(sample[1])
-    if not prediction == expectation:
-        bad_lbl.append(np.argmax(sample[1]))
-        bad_img.append(sample[0])
+print(len(testing_labels))
+
+# Collect the misclassified samples of the testing set
+misclassified = network.evaluate(testing_images, testing_labels)["misclassified"]
+bad_lbl = testing_labels[misclassified]
+bad_img = testing_images[misclassified]
 
 num_wrong = len(bad_lbl)
 print(num_wrong)
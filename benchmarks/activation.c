@@ -0,0 +1,161 @@
+// #########################################################################
+// #                             activation.c                              #
+// #-----------------------------------------------------------------------#
+// # Time per element of the activation functions, applied one element at  #
+// # a time through a function pointer (as the network did before) and    #
+// # as vector kernels. Compile with the flags of the extension, e.g.      #
+// #                                                                       #
+// #  gcc -O3 -fopenmp -fno-trapping-math -I extension                     #
+// #      benchmarks/activation.c -o activation -lm                        #
+// #########################################################################
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+#include "activation.h"
+
+#define N 4096 /* elements per call, about the size of a layer of a mini-batch */
+#define REPEATS 20000
+
+typedef struct {
+    const char *name;
+    double (*scalar)(double);
+    double (*scalarGradient)(double);
+    void (*vector)(double *, long);
+    void (*vectorGradient)(const double *, double *, long);
+    float (*scalar32)(float);
+    float (*scalarGradient32)(float);
+    void (*vector32)(float *, long);
+    void (*vectorGradient32)(const float *, float *, long);
+} Activation;
+
+static const Activation activations[] = {
+    {"sigmoid", act_sigmoid, act_sigmoid_grad, act_sigmoid_vec, act_sigmoid_grad_vec,
+     act_sigmoid_f, act_sigmoid_grad_f, act_sigmoid_vec_f, act_sigmoid_grad_vec_f},
+    {"tanh", act_tanh, act_tanh_grad, act_tanh_vec, act_tanh_grad_vec,
+     act_tanh_f, act_tanh_grad_f, act_tanh_vec_f, act_tanh_grad_vec_f},
+    {"ReLU", act_relu, act_relu_grad, act_relu_vec, act_relu_grad_vec,
+     act_relu_f, act_relu_grad_f, act_relu_vec_f, act_relu_grad_vec_f},
+    {"Leaky ReLU", act_leaky_relu, act_leaky_relu_grad, act_leaky_relu_vec, act_leaky_relu_grad_vec,
+     act_leaky_relu_f, act_leaky_relu_grad_f, act_leaky_relu_vec_f, act_leaky_relu_grad_vec_f},
+    {"linear", act_linear, act_linear_grad, act_linear_vec, act_linear_grad_vec,
+     act_linear_f, act_linear_grad_f, act_linear_vec_f, act_linear_grad_vec_f},
+};
+
+/* The loops of the network before the vector kernels. noinline keeps the
+   compiler from resolving the function pointers. */
+__attribute__((noinline)) void scalarLoop(double (*f)(double), double *z, long n)
+{
+    long i;
+    for ( i = 0; i < n; i++ ) z[i] = f(z[i]);
+}
+
+__attribute__((noinline)) void scalarGradientLoop(double (*f)(double), const double *o, double *d, long n)
+{
+    long i;
+    for ( i = 0; i < n; i++ ) d[i] = f(o[i]) * d[i];
+}
+
+__attribute__((noinline)) void scalarLoop32(float (*f)(float), float *z, long n)
+{
+    long i;
+    for ( i = 0; i < n; i++ ) z[i] = f(z[i]);
+}
+
+__attribute__((noinline)) void scalarGradientLoop32(float (*f)(float), const float *o, float *d, long n)
+{
+    long i;
+    for ( i = 0; i < n; i++ ) d[i] = f(o[i]) * d[i];
+}
+
+__attribute__((noinline)) void scalarSoftmax(double *o, long n)
+{
+    long j;
+    double z = 0;
+    for ( j = 0; j < n; j++ ) z += exp(o[j]);
+    for ( j = 0; j < n; j++ ) o[j] = exp(o[j]) / z;
+}
+
+__attribute__((noinline)) void scalarSoftmax32(float *o, long n)
+{
+    long j;
+    float z = 0;
+    for ( j = 0; j < n; j++ ) z += expf(o[j]);
+    for ( j = 0; j < n; j++ ) o[j] = expf(o[j]) / z;
+}
+
+static double seconds(void)
+{
+    struct timespec t;
+    clock_gettime(CLOCK_MONOTONIC, &t);
+    return t.tv_sec + 1e-9 * t.tv_nsec;
+}
+
+/* Every call starts from the same inputs, restoring them is timed as well
+   but is the same for both variants. */
+static double input[N], z[N], o[N];
+static float input32[N], z32[N], o32[N];
+
+#define TIME(result, call, restore) \
+    do { \
+        int r; \
+        double start = seconds(); \
+        for ( r = 0; r < REPEATS; r++ ) \
+        { \
+            restore; \
+            call; \
+        } \
+        result = 1e9 * (seconds() - start) / ((double)REPEATS * N); \
+    } while (0)
+
+int main(void)
+{
+    int i, a;
+    double before, after;
+    srand(0);
+    for ( i = 0; i < N; i++ )
+    {
+        input[i] = 8.0 * rand() / RAND_MAX - 4.0;
+        input32[i] = (float)input[i];
+        o[i] = (double)rand() / RAND_MAX;
+        o32[i] = (float)o[i];
+    }
+
+    printf("%-26s %12s %12s %10s\n", "kernel [ns/element]", "before", "after", "speedup");
+    for ( a = 0; a < (int)(sizeof(activations) / sizeof(activations[0])); a++ )
+    {
+        const Activation *act = &activations[a];
+        char name[64];
+
+        TIME(before, scalarLoop(act->scalar, z, N), memcpy(z, input, sizeof(z)));
+        TIME(after, act->vector(z, N), memcpy(z, input, sizeof(z)));
+        printf("%-26s %12.3f %12.3f %10.2f\n", act->name, before, after, before / after);
+
+        snprintf(name, sizeof(name), "%s gradient", act->name);
+        TIME(before, scalarGradientLoop(act->scalarGradient, o, z, N), memcpy(z, input, sizeof(z)));
+        TIME(after, act->vectorGradient(o, z, N), memcpy(z, input, sizeof(z)));
+        printf("%-26s %12.3f %12.3f %10.2f\n", name, before, after, before / after);
+
+        snprintf(name, sizeof(name), "%s float32", act->name);
+        TIME(before, scalarLoop32(act->scalar32, z32, N), memcpy(z32, input32, sizeof(z32)));
+        TIME(after, act->vector32(z32, N), memcpy(z32, input32, sizeof(z32)));
+        printf("%-26s %12.3f %12.3f %10.2f\n", name, before, after, before / after);
+
+        snprintf(name, sizeof(name), "%s gradient float32", act->name);
+        TIME(before, scalarGradientLoop32(act->scalarGradient32, o32, z32, N), memcpy(z32, input32, sizeof(z32)));
+        TIME(after, act->vectorGradient32(o32, z32, N), memcpy(z32, input32, sizeof(z32)));
+        printf("%-26s %12.3f %12.3f %10.2f\n", name, before, after, before / after);
+    }
+
+    /* softmax over the 10 outputs of a sample */
+    TIME(before, for ( i = 0; i + 10 <= N; i += 10 ) scalarSoftmax(z + i, 10), memcpy(z, input, sizeof(z)));
+    TIME(after, for ( i = 0; i + 10 <= N; i += 10 ) act_softmax_vec(z + i, 10), memcpy(z, input, sizeof(z)));
+    printf("%-26s %12.3f %12.3f %10.2f\n", "softmax", before, after, before / after);
+
+    TIME(before, for ( i = 0; i + 10 <= N; i += 10 ) scalarSoftmax32(z32 + i, 10), memcpy(z32, input32, sizeof(z32)));
+    TIME(after, for ( i = 0; i + 10 <= N; i += 10 ) act_softmax_vec_f(z32 + i, 10), memcpy(z32, input32, sizeof(z32)));
+    printf("%-26s %12.3f %12.3f %10.2f\n", "softmax float32", before, after, before / after);
+
+    return 0;
+}
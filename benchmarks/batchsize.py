@@ -0,0 +1,42 @@
+######################################
+#           batchsize.py             #
+#------------------------------------#
+#  Per-epoch training time of the    #
+#  784-300-10 network against the    #
+#  mini-batch size.                  #
+######################################
+
+import sys
+import time
+import random
+sys.path.append("extension")
+import pyceptron
+
+# Synthetic data is used so the benchmark runs without the MNIST images.
+# Like MNIST, most of the pixels are zero.
+num_samples = 2000
+architecture = [784, 300, 10]
+batchsizes = [1, 10, 100]
+
+random.seed(0)
+training_set = list()
+for i in range(num_samples):
+    img_vec = [random.random() if random.random() < 0.2 else 0.0 for k in range(784)]
+    lbl_vec = [0.0] * 10
+    lbl_vec[i % 10] = 1.0
+    training_set.append([img_vec, lbl_vec])
+
+print("%-10s %12s %14s" % ("batchsize", "epoch [s]", "samples / s"))
+for batchsize in batchsizes:
+    network = pyceptron.Network(architecture, activation="ReLU", softmax=1)
+
+    for l in range(1, len(architecture)):
+        for j in range(architecture[l]):
+            for k in range(architecture[l-1]):
+                network.set_weight(l, j, k, 0.1 * (0.5 - random.random()))
+
+    start = time.perf_counter()
+    network.train(training_set, epochs=1, batchsize=batchsize, eta=0.005)
+    elapsed = time.perf_counter() - start
+
+    print("%-10i %12.3f %14.0f" % (batchsize, elapsed, num_samples / elapsed))
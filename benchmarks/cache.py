@@ -0,0 +1,76 @@
+######################################
+#             cache.py               #
+#------------------------------------#
+#  Load time and size of the MNIST   #
+#  training set as IDX and as a      #
+#  compressed dataset cache.         #
+######################################
+
+import sys
+import os
+import time
+import tempfile
+import numpy as np
+sys.path.append("modules")
+import idx
+import dataset
+
+repeats = 5
+
+def timed(function):
+    best = float("inf")
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+tmp = tempfile.mkdtemp()
+path_img = "mnist/train-images.idx3-ubyte"
+path_lbl = "mnist/train-labels.idx1-ubyte"
+
+if not os.path.exists(path_img):
+    # Without the MNIST images, 60000 randomly shifted copies of the survey
+    # digits stand in for them.
+    print("mnist/train-images.idx3-ubyte not found, using shifted survey digits.\n")
+    rng = np.random.default_rng(0)
+    digits = idx.read("survey/img.idx3-ubyte").body
+    choice = rng.integers(len(digits), size=60000)
+    img = idx.file(dtype=">u1", datashape=[28, 28])
+    img.body = digits[choice]
+    shifts = rng.integers(-3, 4, size=len(choice))
+    for shift in range(-3, 4):
+        rows = shifts == shift
+        img.body[rows] = np.roll(img.body[rows], shift, axis=2)
+    lbl = idx.file(dtype=">u1", datashape=[])
+    lbl.body = rng.integers(10, size=len(choice))
+    path_img = os.path.join(tmp, "img.idx3-ubyte")
+    path_lbl = os.path.join(tmp, "lbl.idx1-ubyte")
+    idx.write(path_img, img)
+    idx.write(path_lbl, lbl)
+
+def parseIDX():
+    # what mnist.read does before building its lists
+    img = idx.read(path_img).body
+    lbl = idx.read(path_lbl).body
+    return np.divide(img.reshape(len(img), -1), 255), lbl
+
+print("%-34s %12s %12s" % ("format, normalized images", "load [ms]", "size [MB]"))
+size = os.path.getsize(path_img) + os.path.getsize(path_lbl)
+print("%-34s %12.1f %12.1f" % ("IDX, float64", 1000 * timed(parseIDX), size / 1e6))
+
+path = os.path.join(tmp, "train.dsc")
+for codec in sorted(dataset.codecs):
+    dataset.convert(path_img, path_lbl, path, codec=codec)
+    elapsed = timed(lambda: dataset.load(path, normalize=True))
+    print("%-34s %12.1f %12.1f" % ("cache, %s" % codec, 1000 * elapsed, os.path.getsize(path) / 1e6))
+
+dataset.convert(path_img, path_lbl, path, normalized=True)
+for verify in (True, False):
+    elapsed = timed(lambda: dataset.load(path, normalize=True, verify=verify))
+    name = "cache, zlib + float32%s" % ("" if verify else ", no checksum")
+    print("%-34s %12.1f %12.1f" % (name, 1000 * elapsed, os.path.getsize(path) / 1e6))
+
+for name in os.listdir(tmp):
+    os.remove(os.path.join(tmp, name))
+os.rmdir(tmp)
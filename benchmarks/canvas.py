@@ -0,0 +1,142 @@
+######################################
+#             canvas.py              #
+#------------------------------------#
+#  Latency of turning one canvas     #
+#  into a network input, against     #
+#  the QImage and SciPy pipeline,    #
+#  and of the calculator.            #
+######################################
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+sys.path.append("modules")
+sys.path.append("extension")
+import preprocess
+import pyceptron
+
+repeats = 1000
+canvas = 280 # height of the canvases of the GUIs
+
+# a "0" and a "4" drawn with a few hundred mouse events
+t = np.linspace(0, 2 * np.pi, 150)
+zero = (np.stack((150 + 60 * np.cos(t), 140 + 90 * np.sin(t)), axis=1), np.ones(150, dtype=np.int64))
+four = (np.concatenate((np.stack((np.linspace(160, 70, 60), np.linspace(40, 170, 60)), axis=1),
+                        np.stack((np.linspace(70, 210, 60), np.full(60, 170.0)), axis=1),
+                        np.stack((np.full(80, 170.0), np.linspace(60, 250, 80)), axis=1))),
+        np.repeat([1, 1, 2], [60, 60, 80]))
+
+network = pyceptron.Network([784, 300, 10], activation="ReLU", softmax=1)
+network.load_state("states/784_300_10_sgd_ReLU_softmax_229.state")
+
+
+def best(function):
+    # Best time of repeats calls in microseconds.
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1e6
+
+
+def old(points, strokes):
+    # The pipeline the GUIs used before: draw the strokes on a full-size
+    # QImage, scale it down, center it with SciPy and convert it to a list.
+    img = QtGui.QImage(canvas, canvas, QtGui.QImage.Format_Grayscale8)
+    img.fill(QtCore.Qt.white)
+    painter = QtGui.QPainter()
+    painter.begin(img)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    painter.setPen(QtGui.QPen(QtGui.QColor(0, 0, 0), 25.0, QtCore.Qt.SolidLine, QtCore.Qt.RoundCap))
+    for i in range(len(points)):
+        painter.drawPoint(QtCore.QPointF(*points[i]))
+        if i > 0 and strokes[i] == strokes[i - 1]:
+            painter.drawLine(QtCore.QPointF(*points[i - 1]), QtCore.QPointF(*points[i]))
+    painter.end()
+
+    scaled_img = img.scaledToHeight(28, mode=QtCore.Qt.SmoothTransformation)
+    b = scaled_img.bits()
+    b.setsize(28 * 28)
+    arr = 255 - np.frombuffer(b, np.uint8).reshape((28, 28))
+    arr = ndimage.shift(arr, np.subtract((14, 14), ndimage.center_of_mass(arr)))
+    return network.predict((arr / 255).flatten().tolist())
+
+
+def new(points, strokes):
+    return network.predict(preprocess.to_input(preprocess.digit(points, strokes, canvas)))
+
+
+try:
+    from PyQt5 import QtGui, QtCore
+    from scipy import ndimage
+    app = QtGui.QGuiApplication(sys.argv)
+except ImportError:
+    print("PyQt5 or SciPy not found, only the new pipeline is timed.\n")
+    old = None
+
+print("%-24s %12s %12s %12s" % ("canvas [us]", "render", "+ predict", "before"))
+for label, (points, strokes) in (("0 (150 points)", zero), ("4 (200 points)", four)):
+    render = best(lambda: preprocess.digit(points, strokes, canvas))
+    total = best(lambda: new(points, strokes))
+    before = "%12.1f" % best(lambda: old(points, strokes)) if old else "%12s" % "-"
+    print("%-24s %12.1f %12.1f %s" % (label, render, total, before))
+
+print("\npredicted: 0 -> %i, 4 -> %i" % (np.argmax(new(*zero)), np.argmax(new(*four))))
+
+# The calculator: two numbers and an operator, one canvas each, on the
+# 341 pixel canvases of calculator.py.
+operators = pyceptron.Network([784, 100, 4], activation="ReLU", softmax=1)
+operators.load_state("states/operators.state")
+executor = ThreadPoolExecutor(max_workers=1)
+canvas = 341
+
+
+def line(start, end, n=30):
+    return np.stack((np.linspace(start[0], end[0], n), np.linspace(start[1], end[1], n)), axis=1)
+
+
+def drawing(*strokes):
+    return (np.concatenate(strokes), np.concatenate([np.full(len(stroke), i + 1) for i, stroke in enumerate(strokes)]))
+
+
+t = np.linspace(0, 2 * np.pi, 80)
+one = [line((40, 80), (40, 260))]
+ring = [np.stack((120 + 30 * np.cos(t), 170 + 90 * np.sin(t)), axis=1)]
+plus = drawing(line((70, 170), (270, 170)), line((170, 70), (170, 270)))
+single = drawing(line((170, 60), (170, 280)))
+numbers = {1: [single, single],
+           3: [drawing(*(one + ring), line((230, 80), (230, 260))), drawing(*(one + ring), line((230, 80), (230, 260)))]}
+
+
+def sequential(panels):
+    # One canvas after the other, as calculator.py did before.
+    results = []
+    for (points, strokes), model in zip(panels, (network, operators, network)):
+        results.append(np.argmax(model.predict(preprocess.to_input(preprocess.digit(points, strokes, canvas)))))
+    return results
+
+
+def batched(panels):
+    # The operator network runs in a thread while all digits are classified in one batch.
+    operator = executor.submit(operators.predict_batch, preprocess.to_input(preprocess.digit(*panels[1], canvas)), argmax=True)
+    points, strokes, labels, total = [], [], [], 0
+    for panel_points, panel_strokes in (panels[0], panels[2]):
+        panel_labels, count = preprocess.segment(panel_points, panel_strokes, canvas)
+        points.append(panel_points)
+        strokes.append(panel_strokes)
+        labels.append(panel_labels + total)
+        total += count
+    images = preprocess.characters(np.concatenate(points), np.concatenate(strokes), np.concatenate(labels), total, canvas)
+    digits = network.predict_batch(preprocess.to_input(images), argmax=True)
+    return digits, operator.result()
+
+
+print("\n%-24s %12s %12s" % ("calculator [us]", "sequential", "batched"))
+for length, (first, second) in numbers.items():
+    panels = (first, plus, second)
+    print("%-24s %12s %12.1f" % ("%i digit numbers" % length,
+                                 "%12.1f" % best(lambda: sequential(panels)) if length == 1 else "-",
+                                 best(lambda: batched(panels))))
+print("\n101 + 101 ->", batched((numbers[3][0], plus, numbers[3][1])))
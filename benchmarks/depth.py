@@ -0,0 +1,45 @@
+######################################
+#             depth.py               #
+#------------------------------------#
+#  Per-epoch training time against   #
+#  network depth.                    #
+######################################
+
+import sys
+import time
+import random
+sys.path.append("extension")
+import pyceptron
+
+# Synthetic data is used so the benchmark runs without the MNIST images.
+num_samples = 1000
+architectures = [[784, 10],
+                 [784, 300, 10],
+                 [784, 300, 100, 10],
+                 [784, 500, 300, 100, 10]]
+
+random.seed(0)
+training_set = list()
+for i in range(num_samples):
+    img_vec = [random.random() for k in range(784)]
+    lbl_vec = [0.0] * 10
+    lbl_vec[i % 10] = 1.0
+    training_set.append([img_vec, lbl_vec])
+
+print("%-24s %10s %12s %14s" % ("architecture", "weights", "epoch [s]", "ns / weight"))
+for architecture in architectures:
+    network = pyceptron.Network(architecture, activation="ReLU", softmax=1)
+
+    num_weights = 0
+    for l in range(1, len(architecture)):
+        num_weights += architecture[l] * architecture[l-1]
+        for j in range(architecture[l]):
+            for k in range(architecture[l-1]):
+                network.set_weight(l, j, k, 0.1 * (0.5 - random.random()))
+
+    start = time.perf_counter()
+    network.train(training_set, epochs=1, batchsize=1, eta=0.005)
+    elapsed = time.perf_counter() - start
+
+    print("%-24s %10i %12.3f %14.3f" % (",".join(map(str, architecture)), num_weights,
+                                         elapsed, 1e9 * elapsed / (num_weights * num_samples)))
@@ -0,0 +1,71 @@
+######################################
+#           precision.py             #
+#------------------------------------#
+#  Accuracy and speed of float32     #
+#  against float64 networks, using   #
+#  the bundled 784-300-10 states.    #
+######################################
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.append("modules")
+sys.path.append("extension")
+import idx
+import mnist
+import pyceptron
+
+states = [("784_300_10_sgd_ReLU_softmax_229", "ReLU", 1),
+          ("784_300_10_batchsize_100_ReLU_softmax", "ReLU", 1),
+          ("784_300_10_gd_ReLU_softmax", "ReLU", 1),
+          ("784_300_10_sgd_LeakyReLU_softmax_251", "Leaky ReLU", 1),
+          ("784_300_10_sgd_sigmoid_298", "sigmoid", 0)]
+
+if os.path.exists("mnist/t10k-images.idx3-ubyte"):
+    images, labels = mnist.load("testing", path="mnist")
+    print("MNIST test set, %i samples\n" % len(labels))
+else:
+    # the digits drawn in the survey are the only other labeled data
+    images = idx.read("survey/img.idx3-ubyte").body.reshape(-1, 784)
+    labels = idx.read("survey/lbl.idx1-ubyte").body
+    print("mnist/t10k-images.idx3-ubyte not found, using the %i survey digits.\n" % len(labels))
+
+print("%-40s %10s %10s %10s %12s" % ("state", "error f64", "error f32", "agreement", "max |diff|"))
+for name, activation, softmax in states:
+    networks = [pyceptron.Network([784, 300, 10], activation=activation, softmax=softmax, dtype=dtype)
+                for dtype in ("float64", "float32")]
+    for network in networks:
+        network.load_state("states/%s.state" % name)
+
+    outputs = [network.predict_batch(images) for network in networks]
+    errors = [network.evaluate(images, labels)["error_rate"] for network in networks]
+    agreement = np.mean(outputs[0].argmax(axis=1) == outputs[1].argmax(axis=1))
+    difference = np.abs(outputs[0] - outputs[1]).max()
+
+    print("%-40s %10.4f %10.4f %10.4f %12.2e" % (name, errors[0], errors[1], agreement, difference))
+
+# Speed on synthetic data, most of the pixels are zero like in MNIST.
+rng = np.random.default_rng(0)
+num_samples = 10000
+inputs = (rng.random((num_samples, 784)) * (rng.random((num_samples, 784)) < 0.2)).astype(np.float32)
+targets = rng.integers(10, size=num_samples)
+
+print("\n%-10s %16s %16s %12s" % ("dtype", "predict [1/s]", "train [1/s]", "state [kB]"))
+for dtype in ("float64", "float32"):
+    network = pyceptron.Network([784, 300, 10], activation="ReLU", softmax=1, dtype=dtype)
+    network.load_state("states/784_300_10_sgd_ReLU_softmax_229.state")
+
+    start = time.perf_counter()
+    network.predict_batch(inputs)
+    predict = num_samples / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    network.train(inputs[:2000], epochs=1, batchsize=100, eta=0.005, labels=targets[:2000])
+    train = 2000 / (time.perf_counter() - start)
+
+    network.save_state("precision.state")
+    size = os.path.getsize("precision.state") / 1000
+    os.remove("precision.state")
+
+    print("%-10s %16.0f %16.0f %12.0f" % (dtype, predict, train, size))
@@ -0,0 +1,85 @@
+######################################
+#          quantization.py           #
+#------------------------------------#
+#  Accuracy, speed and size of int8  #
+#  quantized networks against the    #
+#  float networks they come from.    #
+######################################
+
+import sys
+import os
+import time
+import numpy as np
+sys.path.append("modules")
+sys.path.append("extension")
+import idx
+import mnist
+import pyceptron
+
+digit_states = [("784_300_10_sgd_ReLU_softmax_229", "ReLU", 1),
+                ("784_300_10_batchsize_100_ReLU_softmax", "ReLU", 1),
+                ("784_300_10_gd_ReLU_softmax", "ReLU", 1),
+                ("784_300_10_sgd_LeakyReLU_softmax_251", "Leaky ReLU", 1),
+                ("784_300_10_sgd_sigmoid_298", "sigmoid", 0)]
+
+# (state, architecture, activation, softmax, images, labels, calibration images)
+benchmarks = []
+
+if os.path.exists("mnist/t10k-images.idx3-ubyte"):
+    images, labels = mnist.load("testing", path="mnist")
+    # calibrate on a sample of the training set
+    calibration = np.ascontiguousarray(mnist.load("training", path="mnist")[0][::60])
+    for name, activation, softmax in digit_states:
+        benchmarks.append((name, [784, 300, 10], activation, softmax, images, labels, calibration))
+else:
+    print("mnist/t10k-images.idx3-ubyte not found, only the operator network is evaluated.\n")
+
+# the operators drawn in the survey, every other one is used for calibration
+images = idx.read("survey/img.idx3-ubyte").body.reshape(-1, 784)
+labels = idx.read("survey/lbl.idx1-ubyte").body
+benchmarks.append(("operators", [784, 100, 4], "ReLU", 1, images, labels, np.ascontiguousarray(images[::2])))
+
+print("%-40s %9s %9s %9s %10s" % ("state (error rate)", "float64", "per row", "per layer", "agreement"))
+for name, architecture, activation, softmax, images, labels, calibration in benchmarks:
+    network = pyceptron.Network(architecture, activation=activation, softmax=softmax)
+    network.load_state("states/%s.state" % name)
+    reference = network.predict_batch(images, argmax=True)
+
+    errors = [np.mean(reference != labels)]
+    for per_row in (True, False):
+        predicted = network.quantize(calibration, per_row=per_row).predict_batch(images, argmax=True)
+        errors.append(np.mean(predicted != labels))
+        if per_row:
+            agreement = np.mean(predicted == reference)
+
+    print("%-40s %9.4f %9.4f %9.4f %10.4f" % (name, errors[0], errors[1], errors[2], agreement))
+
+# Speed on synthetic data, most of the pixels are zero like in MNIST.
+rng = np.random.default_rng(0)
+num_samples = 10000
+inputs = (rng.random((num_samples, 784)) * (rng.random((num_samples, 784)) < 0.2) * 255).astype(np.uint8)
+
+network = pyceptron.Network([784, 300, 10], activation="ReLU", softmax=1)
+network.load_state("states/784_300_10_sgd_ReLU_softmax_229.state")
+float32 = pyceptron.Network([784, 300, 10], activation="ReLU", softmax=1, dtype="float32")
+float32.load_state("states/784_300_10_sgd_ReLU_softmax_229.state")
+quantized = network.quantize(inputs[:1000])
+
+print("\n%-10s %16s %16s %12s" % ("784-300-10", "predict [1/s]", "single [us]", "state [kB]"))
+for label, model in (("float64", network), ("float32", float32), ("int8", quantized)):
+    batch = 0
+    for repeat in range(3):
+        start = time.perf_counter()
+        model.predict_batch(inputs)
+        batch = max(batch, num_samples / (time.perf_counter() - start))
+
+    start = time.perf_counter()
+    for i in range(1000):
+        model.predict(inputs[i])
+    single = (time.perf_counter() - start) * 1000
+
+    model.save_state("quantization.state")
+    size = os.path.getsize("quantization.state") / 1000
+    os.remove("quantization.state")
+
+    print("%-10s %16.0f %16.1f %12.0f" % (label, batch, single, size))
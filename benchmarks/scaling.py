@@ -0,0 +1,50 @@
+######################################
+#             scaling.py             #
+#------------------------------------#
+#  Scaling efficiency of the data-   #
+#  parallel trainer against the      #
+#  number of worker processes.       #
+######################################
+
+import sys
+import time
+import numpy as np
+sys.path.append("modules")
+sys.path.append("extension")
+import parallel
+import pyceptron
+
+# Synthetic data is used so the benchmark runs without the MNIST images.
+num_samples = 16000
+architecture = [784, 300, 10]
+worker_counts = [1, 2, 4, 8]
+batchsize = 64
+
+def main():
+    rng = np.random.default_rng(0)
+    images = (rng.random((num_samples, 784)) * 255 * (rng.random((num_samples, 784)) < 0.2)).astype(np.uint8)
+    labels = rng.integers(0, 10, num_samples)
+
+    initial = pyceptron.Network(architecture, activation="ReLU", softmax=1)
+    initial.set_parameters(0.1 * (0.5 - rng.random(initial.num_parameters)))
+
+    print("%-8s %12s %10s %12s %12s" % ("workers", "epoch [s]", "speedup", "efficiency", "error rate"))
+    reference_time = None
+    for workers in worker_counts:
+        network = pyceptron.Network(architecture, activation="ReLU", softmax=1)
+        network.set_parameters(initial.get_parameters())
+        trainer = parallel.ParallelTrainer(images, labels, workers=workers)
+
+        start = time.perf_counter()
+        trainer.train(network, epochs=1, batchsize=batchsize, eta=0.05)
+        elapsed = time.perf_counter() - start
+
+        if reference_time is None:
+            reference_time = elapsed
+        speedup = reference_time / elapsed
+        error_rate = network.evaluate(images, labels)["error_rate"]
+
+        print("%-8i %12.3f %10.2f %12.2f %12.4f" % (workers, elapsed, speedup, speedup / workers, error_rate))
+
+if __name__ == "__main__":
+    main()
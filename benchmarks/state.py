@@ -0,0 +1,55 @@
+######################################
+#             state.py               #
+#------------------------------------#
+#  Time to load a network state by   #
+#  reading or mapping the file,      #
+#  against reading the raw bytes.    #
+######################################
+
+import sys
+import os
+import time
+sys.path.append("extension")
+import pyceptron
+
+repeats = 200
+
+
+def best(function):
+    """ Best time of repeats calls in milliseconds. """
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def read_bytes(path):
+    with open(path, "rb") as f:
+        f.read()
+
+
+print("%-32s %10s %10s %10s %10s" % ("state [ms]", "bytes", "load", "mmap", "legacy"))
+for architecture, activation, softmax, legacy in (([784, 300, 10], "ReLU", 1, "states/784_300_10_sgd_ReLU_softmax_229.state"),
+                                                  ([784, 10], "ReLU", 1, "states/784_10_sgd_ReLU_softmax_807.state")):
+    network = pyceptron.Network(architecture, activation=activation, softmax=softmax)
+    network.load_state(legacy)
+    network.save_state("benchmark.state")
+
+    label = "-".join(str(n) for n in architecture)
+    print("%-32s %10.3f %10.3f %10.3f %10.3f" % (label,
+                                                 best(lambda: read_bytes("benchmark.state")),
+                                                 best(lambda: network.load_state("benchmark.state")),
+                                                 best(lambda: network.load_state("benchmark.state", mmap=True)),
+                                                 best(lambda: network.load_state(legacy))))
+    os.remove("benchmark.state")
+
+# creating the network from the file alone
+network = pyceptron.Network([784, 300, 10], activation="ReLU", softmax=1)
+network.save_state("benchmark.state")
+start = time.perf_counter()
+for i in range(repeats):
+    pyceptron.load("benchmark.state", mmap=True)
+print("\npyceptron.load(mmap=True) of 784-300-10: %.3f ms" % ((time.perf_counter() - start) * 1000 / repeats))
+os.remove("benchmark.state")
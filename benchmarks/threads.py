@@ -0,0 +1,48 @@
+######################################
+#            threads.py              #
+#------------------------------------#
+#  Mini-batch training and batch     #
+#  prediction time of the 784-300-10 #
+#  network against the number of     #
+#  threads.                          #
+######################################
+
+import sys
+import time
+import numpy as np
+sys.path.append("extension")
+import pyceptron
+
+# Synthetic data is used so the benchmark runs without the MNIST images.
+# Like MNIST, most of the pixels are zero.
+num_samples = 5000
+architecture = [784, 300, 10]
+thread_counts = [1, 2, 4, 8]
+
+rng = np.random.default_rng(0)
+images = rng.random((num_samples, 784)) * (rng.random((num_samples, 784)) < 0.2)
+labels = rng.integers(0, 10, num_samples)
+
+print("%-8s %12s %14s %14s" % ("threads", "epoch [s]", "predict [s]", "identical"))
+reference = None
+for threads in thread_counts:
+    network = pyceptron.Network(architecture, activation="ReLU", softmax=1, threads=threads)
+
+    weights = np.random.default_rng(1)
+    for l in range(1, len(architecture)):
+        for j in range(architecture[l]):
+            for k in range(architecture[l-1]):
+                network.set_weight(l, j, k, 0.1 * (0.5 - weights.random()))
+
+    start = time.perf_counter()
+    network.train(images, epochs=1, batchsize=100, eta=0.005, labels=labels)
+    train_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prediction = network.predict_batch(images)
+    predict_time = time.perf_counter() - start
+
+    if reference is None:
+        reference = prediction
+
+    print("%-8i %12.3f %14.3f %14s" % (threads, train_time, predict_time, np.array_equal(prediction, reference)))
@@ -1,11 +1,12 @@
 from PyQt5 import QtGui, QtCore, QtWidgets
 import sys
 import numpy as np
-from scipy import ndimage
 import datetime
 import struct
+from concurrent.futures import ThreadPoolExecutor
 sys.path.append("modules")
 import idx
+import preprocess
 sys.path.append("calculator")
 import gui
 sys.path.append("extension")
@@ -31,34 +32,45 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
         self.network_digits.load_state("states/784_300_10_sgd_ReLU_softmax_229.state")
         self.network_operators.load_state("states/operators.state")
 
-    def calculate(self):
-        digit_1 = self.guess(self.frame_1, self.network_digits)
-        digit_2 = self.guess(self.frame_3, self.network_digits)
-        operator = self.guess(self.frame_2, self.network_operators)
+        # runs the operator network while the digits are classified,
+        # pyceptron releases the GIL while it predicts
+        self.executor = ThreadPoolExecutor(max_workers=1)
 
-        print(digit_1)
-        print(digit_2)
+    def calculate(self):
+        # the operator is a single character, e.g. the dots of a division
+        # sign are no characters of their own
+        operator_input = preprocess.to_input(preprocess.digit(*self.frame_2.getStrokes()))
+        operator = self.executor.submit(self.network_operators.predict_batch, operator_input, argmax=True)
+        number_1, number_2 = self.readNumbers([self.frame_1, self.frame_3])
+        operator = operator.result()[0]
+
+        print(number_1)
+        print(number_2)
         print(operator)
 
+        if number_1 is None or number_2 is None:
+            self.label_result.setText("?")
+            return
+
         result = None
         self.clear()
 
         if operator == 0:
-            result =  int(digit_1) + int(digit_2)
+            result = number_1 + number_2
             self.label_frame_2.setText("+")
         elif operator == 1:
-            result =  int(digit_1) - int(digit_2)
+            result = number_1 - number_2
             self.label_frame_2.setText("-")
         elif operator == 2:
-            result = int(digit_1) * int(digit_2)
+            result = number_1 * number_2
             self.label_frame_2.setText("*")
         elif operator == 3:
-            if not int(digit_2) == 0:
-                result = int(digit_1) / int(digit_2)
+            if not number_2 == 0:
+                result = number_1 / number_2
             self.label_frame_2.setText("/")
 
-        self.label_frame_1.setText(str(digit_1))
-        self.label_frame_3.setText(str(digit_2))
+        self.label_frame_1.setText(str(number_1))
+        self.label_frame_3.setText(str(number_2))
 
         self.label_result.setText(str(result))
 
@@ -70,38 +82,34 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
         self.label_frame_2.setText("")
         self.label_frame_3.setText("")
 
-    def guess(self, panel, network):
-        img = QtGui.QImage(panel.geometry().width(), panel.geometry().height(), QtGui.QImage.Format_Grayscale8)
-        img.fill(QtCore.Qt.white)
-        painter = QtGui.QPainter()
-        painter.begin(img)
-        panel.drawLines(painter)
-        painter.end()
-        
-        scaled_img = img.scaledToHeight(28, mode=QtCore.Qt.SmoothTransformation)
-        scaled_img = scaled_img.convertToFormat(QtGui.QImage.Format_Grayscale8)
-
-        # image to buffer
-        b = scaled_img.bits()
-        # sip.voidptr must know size to support python buffer interface
-        b.setsize(28 * 28)
-        # buffer to array
-        arr = np.frombuffer(b, np.uint8).reshape((28, 28))
-    
-        arr = 255 - arr
-
-        # shift by weight (maybe better shift by bounding box?)
-        com = ndimage.measurements.center_of_mass(arr)
-        shift = np.subtract((14, 14),  com)
-        arr = ndimage.interpolation.shift(arr, shift)
-
-        # normalize
-        arr = arr / 255
-
-        prediction = network.predict(arr.flatten().tolist())
-        index = np.argmax(prediction)
-
-        return index
+    def readNumbers(self, panels):
+        # Splits every panel into its digits and classifies the digits of
+        # all panels in one batch. Returns the number on every panel, read
+        # from left to right, or None if a panel is empty. All panels have
+        # the same size.
+        points, strokes, labels, counts = [], [], [], []
+        total = 0
+        for panel in panels:
+            panel_points, panel_strokes, height = panel.getStrokes()
+            panel_labels, count = preprocess.segment(panel_points, panel_strokes, height)
+            points.append(panel_points)
+            strokes.append(panel_strokes)
+            labels.append(panel_labels + total)
+            counts.append(count)
+            total += count
+
+        digits = []
+        if total > 0:
+            images = preprocess.characters(np.concatenate(points), np.concatenate(strokes),
+                                           np.concatenate(labels), total, height)
+            digits = self.network_digits.predict_batch(preprocess.to_input(images), argmax=True)
+
+        numbers = []
+        start = 0
+        for count in counts:
+            numbers.append(int("".join(str(digit) for digit in digits[start:start + count])) if count > 0 else None)
+            start += count
+        return numbers
 
 app = QtWidgets.QApplication(sys.argv)
 MainWindow = GUI()
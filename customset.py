@@ -47,23 +47,8 @@ tot_epochs = 50
 for epochs in np.arange(0, tot_epochs, step):
         network.train(training_set, batchsize=1, eta=0.000005, epochs=step)
 
-        num_wrong = 0
-        for sample in testing_set:
-                prediction = np.argmax(network.predict(sample[0]))
-                target = np.argmax(sample[1])
-                if not prediction == target:
-                        num_wrong += 1
-        
-        test_loss.append(num_wrong / len(testing_set))
-
-        num_wrong = 0
-        for sample in training_set:
-                prediction = np.argmax(network.predict(sample[0]))
-                target = np.argmax(sample[1])
-                if not prediction == target:
-                        num_wrong += 1
-        
-        train_loss.append(num_wrong / len(training_set))
+        test_loss.append(network.evaluate(testing_set)["error_rate"])
+        train_loss.append(network.evaluate(training_set)["error_rate"])
 
         os.system('cls')
         print('[', end='')
@@ -0,0 +1,121 @@
+// #########################################################################
+// #                               linalg.h                                #
+// #-----------------------------------------------------------------------#
+// # Dense matrix kernels used by the mini-batch training path. All        #
+// # matrices are row-major. The kernels are tiled so that a block of the  #
+// # right hand matrix stays in cache while it is reused for every row of  #
+// # the left hand matrix.                                                 #
+// # Like network.h, this file is included once per precision.            #
+// #########################################################################
+
+#ifndef TILE_K
+#define TILE_K 64 /* rows of the right hand matrix per tile */
+#define TILE_N 256 /* columns of the right hand matrix per tile */
+#endif
+
+/**
+ * gemm_nn
+ * -------
+ * C += A * B
+ * 
+ * A: M x K matrix.
+ * B: K x N matrix.
+ * C: M x N matrix.
+ */
+void KERNEL(gemm_nn)(int M, int N, int K, const real *A, const real *B, real *C)
+{
+    int i, j, k, kk, jj;
+    for ( kk = 0; kk < K; kk += TILE_K )
+    {
+        int kEnd = kk + TILE_K < K ? kk + TILE_K : K;
+        for ( jj = 0; jj < N; jj += TILE_N )
+        {
+            int jEnd = jj + TILE_N < N ? jj + TILE_N : N;
+            for ( i = 0; i < M; i++ )
+            {
+                const real *a = A + (long)i * K;
+                real *c = C + (long)i * N;
+                for ( k = kk; k < kEnd; k++ )
+                {
+                    const real *b = B + (long)k * N;
+                    real aik = a[k];
+                    if ( aik == 0.0 ) continue; /* inputs and ReLU outputs are often sparse */
+                    for ( j = jj; j < jEnd; j++ )
+                    {
+                        c[j] += aik * b[j];
+                    }
+                }
+            }
+        }
+    }
+}
+
+/**
+ * gemm_nt
+ * -------
+ * C = A * B^T
+ * 
+ * A: M x K matrix.
+ * B: N x K matrix.
+ * C: M x N matrix.
+ */
+void KERNEL(gemm_nt)(int M, int N, int K, const real *A, const real *B, real *C)
+{
+    int i, j, k, jj;
+    for ( jj = 0; jj < N; jj += TILE_K )
+    {
+        int jEnd = jj + TILE_K < N ? jj + TILE_K : N;
+        for ( i = 0; i < M; i++ )
+        {
+            const real *a = A + (long)i * K;
+            for ( j = jj; j < jEnd; j++ )
+            {
+                const real *b = B + (long)j * K;
+                real sum = 0.0;
+                for ( k = 0; k < K; k++ )
+                {
+                    sum += a[k] * b[k];
+                }
+                C[(long)i * N + j] = sum;
+            }
+        }
+    }
+}
+
+/**
+ * gemm_tn
+ * -------
+ * C += A^T * B
+ * 
+ * A: K x M matrix, stored with a row length of lda >= M. This allows
+ *    computing only a block of columns of A (i.e. rows of C).
+ * B: K x N matrix.
+ * C: M x N matrix.
+ */
+void KERNEL(gemm_tn)(int M, int N, int K, const real *A, int lda, const real *B, real *C)
+{
+    int i, j, k, ii, jj;
+    for ( ii = 0; ii < M; ii += TILE_K )
+    {
+        int iEnd = ii + TILE_K < M ? ii + TILE_K : M;
+        for ( jj = 0; jj < N; jj += TILE_N )
+        {
+            int jEnd = jj + TILE_N < N ? jj + TILE_N : N;
+            for ( k = 0; k < K; k++ )
+            {
+                const real *a = A + (long)k * lda;
+                const real *b = B + (long)k * N;
+                for ( i = ii; i < iEnd; i++ )
+                {
+                    real aki = a[i];
+                    if ( aki == 0.0 ) continue;
+                    real *c = C + (long)i * N;
+                    for ( j = jj; j < jEnd; j++ )
+                    {
+                        c[j] += aki * b[j];
+                    }
+                }
+            }
+        }
+    }
+}
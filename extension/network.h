@@ -0,0 +1,917 @@
+// #########################################################################
+// #                               network.h                               #
+// #-----------------------------------------------------------------------#
+// # Everything that depends on the floating point type of the network:   #
+// # the layers, forward feed, backpropagation and the training and        #
+// # prediction loops. This file is included once per precision by         #
+// # pyceptron.c with the following macros defined:                         #
+// #                                                                       #
+// #  real: The floating point type (double or float).                     #
+// #  KERNEL(name): Appends the precision to a function or type name, e.g. #
+// #                KERNEL(forwardfeed) is forwardfeed64 or forwardfeed32.  #
+// #  ACTIVATION, ACTIVATION_GRADIENT: The NetworkObject members holding    #
+// #                the activation vector kernels of that type.             #
+// #  SOFTMAX: The softmax vector kernel of that type.                      #
+// #########################################################################
+
+#include "linalg.h"
+
+/**
+ * Layer
+ * ----
+ * This defines the structure of a fully connected layer in the
+ * network. All vectors of a layer are views into blocks owned by
+ * the network so that a layer never allocates memory itself.
+ * 
+ * w: Weight matrix of the incoming connections. Stored row-major with
+ *    one row per node of the previous layer, so w[k * numNodes + j]
+ *    connects node k of the previous layer to node j of this layer.
+ * grad_w: Error gradients of the weights (same layout as w).
+ * b: Biases of the nodes.
+ * grad_b: Error gradients of the biases.
+ * o: Output values of the nodes.
+ * d: Backpropagation deltas of the nodes for the current sample.
+ * batch_o: Outputs of the nodes for every sample of a mini-batch
+ *          (one row per sample).
+ * batch_d: Backpropagation deltas for every sample of a mini-batch.
+ */
+
+typedef struct {
+    real *w; /* Input weights */
+    real *grad_w; /* Input weight gradients */
+    real *b; /* Input biases */
+    real *grad_b; /* Input bias gradients */
+    real *o; /* Node outputs */
+    real *d; /* Backpropagation deltas */
+    real *batch_o; /* Node outputs of a mini-batch */
+    real *batch_d; /* Backpropagation deltas of a mini-batch */
+} KERNEL(Layer);
+
+/**
+ * pointParams
+ * -----------
+ * Points the weights and biases of every layer into the params block,
+ * after the block was allocated or replaced (e.g. by a memory-mapped file).
+ * 
+ * self: Pointer to the neural network Python object.
+ */
+void KERNEL(pointParams)(NetworkObject *self)
+{
+    KERNEL(Layer) *layers = self->layers;
+    long numWeights = self->numParams;
+    int l;
+    for ( l = 1; l < self->numLayers; l++ ) numWeights -= self->numNeurons[l];
+
+    real *w = self->params;
+    real *b = w + numWeights;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        layers[l].w = w;
+        layers[l].b = b;
+        w += (long)self->numNeurons[l] * self->numNeurons[l-1];
+        b += self->numNeurons[l];
+    }
+}
+
+/**
+ * initializeLayers
+ * ----------------
+ * Allocates the parameter, gradient and activation blocks of the
+ * network and points every layer into them. Expects numLayers and
+ * numNeurons to be set.
+ * 
+ * self: Pointer to the neural network Python object.
+ * 
+ * Returns:
+ *  0 on success, -1 if the memory could not be allocated.
+ */
+int KERNEL(initializeLayers)(NetworkObject *self)
+{
+    long numWeights = 0;
+    long numNodes = 0;
+    int l;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        numWeights += (long)self->numNeurons[l] * self->numNeurons[l-1];
+        numNodes += self->numNeurons[l];
+    }
+    self->numParams = numWeights + numNodes;
+
+    KERNEL(Layer) *layers = (KERNEL(Layer) *)calloc(self->numLayers, sizeof(KERNEL(Layer)));
+    real *params = (real *)calloc(self->numParams, sizeof(real));
+    real *grads = (real *)calloc(self->numParams, sizeof(real));
+    real *activations = (real *)calloc(2 * (numNodes + self->numNeurons[0]), sizeof(real));
+
+    self->layers = layers;
+    self->params = params;
+    self->grads = grads;
+    self->activations = activations;
+
+    if ( layers == NULL || params == NULL || grads == NULL || activations == NULL )
+    {
+        return -1;
+    }
+
+    real *grad_w = grads;
+    real *grad_b = grads + numWeights;
+    real *o = activations;
+    real *d = activations + numNodes + self->numNeurons[0];
+
+    for ( l = 0; l < self->numLayers; l++ )
+    {
+        KERNEL(Layer) *layer = &layers[l];
+        layer->o = o;
+        layer->d = d;
+        o += self->numNeurons[l];
+        d += self->numNeurons[l];
+
+        if ( l > 0 ) /* no input weights/biases for the input layer */
+        {
+            layer->grad_w = grad_w;
+            layer->grad_b = grad_b;
+            grad_w += self->numNeurons[l] * self->numNeurons[l-1];
+            grad_b += self->numNeurons[l];
+        }
+    }
+
+    KERNEL(pointParams)(self);
+    return 0;
+}
+
+/**
+ * reserveBatch
+ * ------------
+ * Makes sure the mini-batch buffers can hold at least batchsize samples
+ * and points every layer into them.
+ * 
+ * self: Pointer to the neural network Python object.
+ * batchsize: Number of samples per mini-batch.
+ * 
+ * Returns:
+ *  0 on success, -1 if the memory could not be allocated.
+ */
+int KERNEL(reserveBatch)(NetworkObject *self, long batchsize)
+{
+    if ( batchsize <= self->batchCapacity ) return 0;
+
+    KERNEL(Layer) *layers = self->layers;
+    long numNodes = 0;
+    int l;
+    for ( l = 0; l < self->numLayers; l++ )
+    {
+        numNodes += self->numNeurons[l];
+    }
+
+    long numOutputs = self->numNeurons[self->numLayers-1];
+    real *block = (real *)malloc((2 * numNodes + numOutputs) * batchsize * sizeof(real));
+    if ( block == NULL ) return -1;
+
+    free(self->batchActivations);
+    self->batchActivations = block;
+    self->batchCapacity = batchsize;
+
+    for ( l = 0; l < self->numLayers; l++ )
+    {
+        layers[l].batch_o = block;
+        block += self->numNeurons[l] * batchsize;
+        layers[l].batch_d = block;
+        block += self->numNeurons[l] * batchsize;
+    }
+    self->batchTargets = block;
+
+    return 0;
+}
+
+/**
+ * forwardfeed
+ * -----------
+ * Calculates the values of the output layer by forward feed.
+ * 
+ * self: Pointer to the neural network Python object.
+ */
+void KERNEL(forwardfeed)(NetworkObject *self)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l, j, k;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        int n = self->numNeurons[l];
+        const real *in = layers[l-1].o;
+        const real *w = layers[l].w;
+        real *z = layers[l].o;
+
+        /* net input as z = b + W^T * o, one row of W at a time */
+        memcpy(z, layers[l].b, n * sizeof(real));
+        for ( k = 0; k < self->numNeurons[l-1]; k++ )
+        {
+            const real *row = w + (long)k * n;
+            real o = in[k];
+            for ( j = 0; j < n; j++ )
+            {
+                z[j] += row[j] * o;
+            }
+        }
+
+        self->ACTIVATION(z, n);
+    }
+    return;
+}
+
+/**
+ * softmaxRows
+ * -----------
+ * Applies softmax normalization to every row of a matrix.
+ * 
+ * o: Matrix with one output vector per row.
+ * rows: Number of rows.
+ * n: Length of each row.
+ */
+void KERNEL(softmaxRows)(real *o, long rows, int n)
+{
+    long r;
+    for ( r = 0; r < rows; r++, o += n )
+    {
+        SOFTMAX(o, n);
+    }
+}
+
+/**
+ * softmax
+ * -------
+ * Applies softmax normalization to the output vector.
+ * Backpropagation doesn't change for cross entropy.
+ * 
+ * self: Pointer to the neural network Python object.
+ */
+void KERNEL(softmax)(NetworkObject *self)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l = self->numLayers-1;
+    KERNEL(softmaxRows)(layers[l].o, 1, self->numNeurons[l]);
+}
+
+/**
+ * computeDeltas
+ * -------------
+ * Computes the "delta" vector for backpropagation of every layer, starting
+ * at the output layer and moving towards the input. Each delta is computed
+ * exactly once and stored in the layer so the layer below can reuse it.
+ * 
+ * self: Pointer to the neural network Python object.
+ * output: Target output vector.
+ */
+void KERNEL(computeDeltas)(NetworkObject *self, const real *output)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l, j, k;
+    int L = self->numLayers-1;
+
+    /* The same for square error and softmax with cross entropy. */
+    real *o = layers[L].o;
+    real *d = layers[L].d;
+    for ( j = 0; j < self->numNeurons[L]; j++ )
+    {
+        d[j] = o[j] - output[j];
+    }
+    self->ACTIVATION_GRADIENT(o, d, self->numNeurons[L]);
+
+    for ( l = L-1; l > 0; l-- )
+    {
+        int n = self->numNeurons[l+1];
+        const real *w = layers[l+1].w;
+        const real *next = layers[l+1].d;
+        o = layers[l].o;
+        d = layers[l].d;
+
+        /* d = W * next, one row of W per node of this layer */
+        for ( k = 0; k < self->numNeurons[l]; k++ )
+        {
+            const real *row = w + (long)k * n;
+            real sum = 0.0;
+            for ( j = 0; j < n; j++ )
+            {
+                sum += row[j] * next[j];
+            }
+            d[k] = sum;
+        }
+        self->ACTIVATION_GRADIENT(o, d, self->numNeurons[l]);
+    }
+}
+
+/**
+ * backpropagation
+ * ---------------
+ * Executes a full backpropagation in the current state of the network and sets all gradients accordingly.
+ * 
+ * self: Pointer to the neural network Python object.
+ * output: Target output vector.
+ */
+
+void KERNEL(backpropagation)(NetworkObject *self, const real *output)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l, j, k; /* target indices */
+
+    KERNEL(computeDeltas)(self, output);
+
+    /* compute weight gradients as the outer product of the previous outputs and the deltas */
+    for ( l = 1; l < self->numLayers ; l++ )   /* target layer */
+    {
+        int n = self->numNeurons[l];
+        const real *d = layers[l].d;
+        const real *o = layers[l-1].o;
+        real *grad_w = layers[l].grad_w;
+        real *grad_b = layers[l].grad_b;
+
+        for ( k = 0; k < self->numNeurons[l-1]; k++ ) /* previous neuron */
+        {
+            real *row = grad_w + (long)k * n;
+            real ok = o[k];
+            for ( j = 0; j < n; j++)   /* target neuron */
+            {
+                row[j] += d[j] * ok;
+            }
+        }
+
+        for ( j = 0; j < n; j++ )
+        {
+            grad_b[j] += d[j];
+        }
+    }
+}
+
+/**
+ * forwardfeedRows
+ * ---------------
+ * Forward feed of the samples first to last-1 of a mini-batch through all
+ * layers. Every layer is computed as one matrix-matrix product of the
+ * previous outputs and the weight matrix. The rows of different samples
+ * are independent, so disjoint ranges can be processed by different threads.
+ * 
+ * self: Pointer to the neural network Python object.
+ * first: First sample.
+ * last: One past the last sample.
+ */
+void KERNEL(forwardfeedRows)(NetworkObject *self, long first, long last)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l;
+    long i;
+    long rows = last - first;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        int n = self->numNeurons[l];
+        real *z = layers[l].batch_o + first * n;
+
+        for ( i = 0; i < rows; i++ )
+        {
+            memcpy(z + i * n, layers[l].b, n * sizeof(real));
+        }
+
+        KERNEL(gemm_nn)(rows, n, self->numNeurons[l-1], layers[l-1].batch_o + first * self->numNeurons[l-1], layers[l].w, z);
+
+        self->ACTIVATION(z, rows * n);
+    }
+
+    if (self->softmax)
+    {
+        int L = self->numLayers-1;
+        KERNEL(softmaxRows)(layers[L].batch_o + first * self->numNeurons[L], rows, self->numNeurons[L]);
+    }
+}
+
+/**
+ * deltaRows
+ * ---------
+ * Computes the deltas of the samples first to last-1 of a mini-batch for
+ * all layers, each layer as one matrix-matrix product. Expects the
+ * targets in batchTargets.
+ * 
+ * self: Pointer to the neural network Python object.
+ * first: First sample.
+ * last: One past the last sample.
+ */
+void KERNEL(deltaRows)(NetworkObject *self, long first, long last)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l;
+    long i;
+    long rows = last - first;
+    int L = self->numLayers-1;
+
+    /* The same for square error and softmax with cross entropy. */
+    long offset = first * self->numNeurons[L];
+    real *o = layers[L].batch_o + offset;
+    real *d = layers[L].batch_d + offset;
+    const real *t = (const real *)self->batchTargets + offset;
+    for ( i = 0; i < rows * self->numNeurons[L]; i++ )
+    {
+        d[i] = o[i] - t[i];
+    }
+    self->ACTIVATION_GRADIENT(o, d, rows * self->numNeurons[L]);
+
+    for ( l = L-1; l > 0; l-- )
+    {
+        o = layers[l].batch_o + first * self->numNeurons[l];
+        d = layers[l].batch_d + first * self->numNeurons[l];
+
+        KERNEL(gemm_nt)(rows, self->numNeurons[l], self->numNeurons[l+1],
+                layers[l+1].batch_d + first * self->numNeurons[l+1], layers[l+1].w, d);
+
+        self->ACTIVATION_GRADIENT(o, d, rows * self->numNeurons[l]);
+    }
+}
+
+/**
+ * gradientRows
+ * ------------
+ * Accumulates the weight gradients of a whole mini-batch as one product of
+ * the previous outputs and the deltas. The rows of every gradient matrix
+ * are split into numThreads parts of which only part thread is computed,
+ * so no two threads ever write the same gradient and no reduction is
+ * needed. The bias gradients are computed by thread 0.
+ * 
+ * self: Pointer to the neural network Python object.
+ * batchsize: Number of samples in the mini-batch.
+ * thread: Index of the calling thread.
+ * numThreads: Number of threads.
+ */
+void KERNEL(gradientRows)(NetworkObject *self, long batchsize, int thread, int numThreads)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int l, j;
+    long i;
+    for ( l = 1; l < self->numLayers ; l++ )
+    {
+        int n = self->numNeurons[l];
+        int m = self->numNeurons[l-1];
+        int first = (long)m * thread / numThreads;
+        int last = (long)m * (thread + 1) / numThreads;
+        const real *d = layers[l].batch_d;
+
+        KERNEL(gemm_tn)(last - first, n, batchsize, layers[l-1].batch_o + first, m, d, layers[l].grad_w + (long)first * n);
+
+        if ( thread == 0 )
+        {
+            for ( i = 0; i < batchsize; i++ )
+            {
+                for ( j = 0; j < n; j++ )
+                {
+                    layers[l].grad_b[j] += d[i * n + j];
+                }
+            }
+        }
+    }
+}
+
+/**
+ * forwardfeedBatch
+ * ----------------
+ * Forward feed of a whole mini-batch, split into one block of samples per
+ * thread. Expects the inputs in the batch_o rows of the input layer.
+ * 
+ * self: Pointer to the neural network Python object.
+ * batchsize: Number of samples in the mini-batch.
+ */
+void KERNEL(forwardfeedBatch)(NetworkObject *self, long batchsize)
+{
+    int numThreads = batchsize < self->numThreads ? (int)batchsize : self->numThreads;
+
+    #pragma omp parallel num_threads(numThreads) if (numThreads > 1)
+    {
+        int thread = omp_get_thread_num();
+        int threads = omp_get_num_threads();
+        KERNEL(forwardfeedRows)(self, batchsize * thread / threads, batchsize * (thread + 1) / threads);
+    }
+}
+
+/**
+ * trainBatch
+ * ----------
+ * Forward feed and backpropagation of a whole mini-batch. Each thread
+ * feeds forward and computes the deltas of its block of samples, then
+ * all threads accumulate their share of the weight gradients. Since the
+ * split never changes the order of any sum, the result is the same for
+ * every number of threads. Expects the inputs in the batch_o rows of the
+ * input layer and the targets in batchTargets.
+ * 
+ * self: Pointer to the neural network Python object.
+ * batchsize: Number of samples in the mini-batch.
+ */
+void KERNEL(trainBatch)(NetworkObject *self, long batchsize)
+{
+    int numThreads = self->numThreads;
+
+    #pragma omp parallel num_threads(numThreads) if (numThreads > 1)
+    {
+        int thread = omp_get_thread_num();
+        int threads = omp_get_num_threads();
+        long first = batchsize * thread / threads;
+        long last = batchsize * (thread + 1) / threads;
+
+        KERNEL(forwardfeedRows)(self, first, last);
+        KERNEL(deltaRows)(self, first, last);
+
+        #pragma omp barrier
+
+        KERNEL(gradientRows)(self, batchsize, thread, threads);
+    }
+}
+
+/**
+ * applyGradients
+ * --------------
+ * Applies the accumulated gradients to the weights and biases and resets
+ * them to 0 for the next batch.
+ * 
+ * self: Pointer to the neural network Python object.
+ * rate: Step size (learning rate divided by batch size).
+ */
+void KERNEL(applyGradients)(NetworkObject *self, double rate)
+{
+    real *params = self->params;
+    real *grads = self->grads;
+    real step = (real)rate;
+    long i;
+    for ( i = 0; i < self->numParams; i++ )
+    {
+        params[i] -= step * grads[i];
+        grads[i] = 0.0;
+    }
+}
+
+/**
+ * readVector
+ * ----------
+ * Converts n numbers from a buffer to the type of the network. uint8
+ * values are taken as pixel intensities and scaled to [0, 1].
+ * 
+ * src: Pointer to the first number.
+ * format: struct format character of the numbers.
+ * n: Number of values.
+ * dst: Output vector.
+ */
+void KERNEL(readVector)(const char *src, char format, long n, real *dst)
+{
+    long i;
+    switch ( format )
+    {
+        case 'd':
+            if ( sizeof(real) == sizeof(double) ) memcpy(dst, src, n * sizeof(real));
+            else for ( i = 0; i < n; i++ ) dst[i] = ((const double *)src)[i];
+            break;
+        case 'f':
+            if ( sizeof(real) == sizeof(float) ) memcpy(dst, src, n * sizeof(real));
+            else for ( i = 0; i < n; i++ ) dst[i] = ((const float *)src)[i];
+            break;
+        case 'B': for ( i = 0; i < n; i++ ) dst[i] = ((const unsigned char *)src)[i] / 255.0; break;
+        case 'b': for ( i = 0; i < n; i++ ) dst[i] = ((const signed char *)src)[i]; break;
+        case 'h': for ( i = 0; i < n; i++ ) dst[i] = ((const short *)src)[i]; break;
+        case 'H': for ( i = 0; i < n; i++ ) dst[i] = ((const unsigned short *)src)[i]; break;
+        case 'i': for ( i = 0; i < n; i++ ) dst[i] = ((const int *)src)[i]; break;
+        case 'I': for ( i = 0; i < n; i++ ) dst[i] = ((const unsigned int *)src)[i]; break;
+        case 'l': for ( i = 0; i < n; i++ ) dst[i] = ((const long *)src)[i]; break;
+        case 'L': for ( i = 0; i < n; i++ ) dst[i] = ((const unsigned long *)src)[i]; break;
+        case 'q': for ( i = 0; i < n; i++ ) dst[i] = ((const long long *)src)[i]; break;
+        case 'Q': for ( i = 0; i < n; i++ ) dst[i] = ((const unsigned long long *)src)[i]; break;
+    }
+}
+
+/**
+ * Dataset_sample
+ * --------------
+ * Writes one input vector and its target output vector.
+ * 
+ * self: Pointer to the set.
+ * i: Index of the sample.
+ * input: Output buffer for the input vector.
+ * target: Output buffer for the target output vector (may be NULL).
+ */
+void KERNEL(Dataset_sample)(const Dataset *self, long i, real *input, real *target)
+{
+    if ( !self->hasBuffers )
+    {
+        KERNEL(readVector)((const char *)self->inputs[i], 'd', self->inputDim, input);
+        if ( target != NULL ) KERNEL(readVector)((const char *)self->outputs[i], 'd', self->outputDim, target);
+        return;
+    }
+
+    KERNEL(readVector)((const char *)self->inputView.buf + i * self->inputDim * self->inputView.itemsize,
+               self->inputFormat, self->inputDim, input);
+
+    if ( target == NULL ) return;
+
+    if ( self->labelsAreIndices )
+    {
+        memset(target, 0, self->outputDim * sizeof(real));
+        target[readIndex((const char *)self->labelView.buf + i * self->labelView.itemsize, self->labelFormat)] = 1.0;
+    }
+    else
+    {
+        KERNEL(readVector)((const char *)self->labelView.buf + i * self->outputDim * self->labelView.itemsize,
+                   self->labelFormat, self->outputDim, target);
+    }
+}
+
+/**
+ * predictSample
+ * -------------
+ * Feeds the input vector in the outputs of the input layer forward.
+ * 
+ * self: Pointer to the neural network Python object.
+ */
+void KERNEL(predictSample)(NetworkObject *self)
+{
+    KERNEL(forwardfeed)(self);
+    if (self->softmax) KERNEL(softmax)(self);
+}
+
+/**
+ * predictSet
+ * ----------
+ * Feeds a whole set of input vectors forward in chunks of PREDICT_CHUNK
+ * samples. Expects the batch buffers to hold PREDICT_CHUNK samples.
+ * 
+ * self: Pointer to the neural network Python object.
+ * inputs: (numSamples, input dimension) matrix of numbers.
+ * format: struct format character of the inputs.
+ * itemsize: Size of one input number in bytes.
+ * numSamples: Number of samples.
+ * argmax: Whether to write class indices instead of output vectors.
+ * result: numSamples long long class indices or a (numSamples, output
+ *         dimension) matrix of reals.
+ */
+void KERNEL(predictSet)(NetworkObject *self, const char *inputs, char format, long itemsize, long numSamples, int argmax, void *result)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+    const real *output = layers[self->numLayers-1].batch_o;
+    long start, i;
+    int j;
+
+    for ( start = 0; start < numSamples; start += PREDICT_CHUNK )
+    {
+        long chunk = numSamples - start < PREDICT_CHUNK ? numSamples - start : PREDICT_CHUNK;
+
+        for ( i = 0; i < chunk; i++ )
+        {
+            KERNEL(readVector)(inputs + (start + i) * inputDim * itemsize, format, inputDim,
+                               layers[0].batch_o + i * inputDim);
+        }
+
+        KERNEL(forwardfeedBatch)(self, chunk);
+
+        if ( argmax )
+        {
+            long long *indices = (long long *)result + start;
+            for ( i = 0; i < chunk; i++ )
+            {
+                const real *row = output + i * outputDim;
+                int best = 0;
+                for ( j = 1; j < outputDim; j++ )
+                {
+                    if ( row[j] > row[best] ) best = j;
+                }
+                indices[i] = best;
+            }
+        }
+        else
+        {
+            memcpy((real *)result + start * outputDim, output, chunk * outputDim * sizeof(real));
+        }
+    }
+}
+
+/**
+ * calibrateSet
+ * ------------
+ * Feeds a set of input vectors forward like predictSet and records the
+ * range of the outputs of every layer but the output layer. Expects the
+ * batch buffers to hold PREDICT_CHUNK samples.
+ * 
+ * self: Pointer to the neural network Python object.
+ * inputs: (numSamples, input dimension) matrix of numbers.
+ * format: struct format character of the inputs.
+ * itemsize: Size of one input number in bytes.
+ * numSamples: Number of samples.
+ * minima, maxima: Set to the smallest and largest output of every layer
+ *                 (numLayers-1 values each).
+ */
+void KERNEL(calibrateSet)(NetworkObject *self, const char *inputs, char format, long itemsize, long numSamples, double *minima, double *maxima)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int inputDim = self->numNeurons[0];
+    long start, i;
+    int l;
+
+    for ( l = 0; l < self->numLayers-1; l++ )
+    {
+        minima[l] = 0.0;
+        maxima[l] = 0.0;
+    }
+
+    for ( start = 0; start < numSamples; start += PREDICT_CHUNK )
+    {
+        long chunk = numSamples - start < PREDICT_CHUNK ? numSamples - start : PREDICT_CHUNK;
+
+        for ( i = 0; i < chunk; i++ )
+        {
+            KERNEL(readVector)(inputs + (start + i) * inputDim * itemsize, format, inputDim,
+                               layers[0].batch_o + i * inputDim);
+        }
+
+        KERNEL(forwardfeedBatch)(self, chunk);
+
+        for ( l = 0; l < self->numLayers-1; l++ )
+        {
+            const real *o = layers[l].batch_o;
+            real low = (real)minima[l];
+            real high = (real)maxima[l];
+            for ( i = 0; i < chunk * self->numNeurons[l]; i++ )
+            {
+                low = o[i] < low ? o[i] : low;
+                high = o[i] > high ? o[i] : high;
+            }
+            minima[l] = low;
+            maxima[l] = high;
+        }
+    }
+}
+
+/**
+ * evaluateSet
+ * -----------
+ * Feeds a whole set forward in chunks of PREDICT_CHUNK samples and
+ * compares the outputs with the targets. Expects the batch buffers to
+ * hold PREDICT_CHUNK samples.
+ * 
+ * self: Pointer to the neural network Python object.
+ * set: The set.
+ * misclassified: Set to the indices of all misclassified samples.
+ * confusion: (k, k) matrix to count the (expected, predicted) pairs in.
+ * loss: Set to the summed loss of all samples.
+ * 
+ * Returns:
+ *  The number of misclassified samples.
+ */
+long KERNEL(evaluateSet)(NetworkObject *self, const Dataset *set, long *misclassified, long long *confusion, double *loss)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+    const real *output = layers[self->numLayers-1].batch_o;
+    const real *targets = self->batchTargets;
+    long numWrong = 0;
+    long start, i;
+    int j;
+
+    *loss = 0.0;
+
+    for ( start = 0; start < set->numSamples; start += PREDICT_CHUNK )
+    {
+        long chunk = set->numSamples - start < PREDICT_CHUNK ? set->numSamples - start : PREDICT_CHUNK;
+
+        for ( i = 0; i < chunk; i++ )
+        {
+            KERNEL(Dataset_sample)(set, start + i, layers[0].batch_o + i * inputDim,
+                                   (real *)targets + i * outputDim);
+        }
+
+        KERNEL(forwardfeedBatch)(self, chunk);
+
+        for ( i = 0; i < chunk; i++ )
+        {
+            const real *o = output + i * outputDim;
+            const real *t = targets + i * outputDim;
+            int predicted = 0;
+            int expected = 0;
+            for ( j = 0; j < outputDim; j++ )
+            {
+                if ( o[j] > o[predicted] ) predicted = j;
+                if ( t[j] > t[expected] ) expected = j;
+
+                if ( self->softmax )
+                {
+                    if ( t[j] != 0.0 ) *loss -= t[j] * log(o[j] > 1e-300 ? o[j] : 1e-300);
+                }
+                else
+                {
+                    *loss += 0.5 * (o[j] - t[j]) * (o[j] - t[j]);
+                }
+            }
+
+            confusion[(long)expected * outputDim + predicted]++;
+            if ( predicted != expected ) misclassified[numWrong++] = start + i;
+        }
+    }
+
+    return numWrong;
+}
+
+/**
+ * trainBatches
+ * ------------
+ * Trains the network on count mini-batches of a set, starting at the
+ * mini-batch position. Positions count the mini-batches of all epochs, so
+ * position numSamples / batchsize is the first mini-batch of the second
+ * epoch and training can be resumed where the last call stopped. Samples
+ * that don't fill a whole mini-batch are left out. Expects the batch
+ * buffers to hold batchsize samples.
+ * 
+ * self: Pointer to the neural network Python object.
+ * set: The set, holding at least batchsize samples.
+ * position: Position of the first mini-batch.
+ * count: Number of mini-batches to train on.
+ * batchsize: Number of samples per weight update.
+ * eta: Learning rate used for training.
+ */
+void KERNEL(trainBatches)(NetworkObject *self, const Dataset *set, long position, long count, long batchsize, double eta)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+    real *targets = self->batchTargets;
+    long numBatches = set->numSamples / batchsize;
+
+    long end = position + count;
+    for ( ; position < end; position++ )
+    {
+        long batch = position % numBatches;
+        long sampleInBatch, sample;
+        if ( batchsize > 1 ) /* whole mini-batch as matrix-matrix products */
+        {
+            for ( sampleInBatch = 0; sampleInBatch < batchsize; sampleInBatch++ )
+            {
+                sample = sampleInBatch + batch * batchsize; // mini-batch offset
+
+                KERNEL(Dataset_sample)(set, sample, layers[0].batch_o + sampleInBatch * inputDim,
+                                       targets + sampleInBatch * outputDim);
+            }
+
+            KERNEL(trainBatch)(self, batchsize);
+        }
+        else
+        {
+            sample = batch;
+
+            KERNEL(Dataset_sample)(set, sample, layers[0].o, targets);
+
+            KERNEL(forwardfeed)(self);
+            if (self->softmax) KERNEL(softmax)(self);
+            KERNEL(backpropagation)(self, targets);
+        }
+
+        /* apply weight gradients and set to 0 for next batch */
+        KERNEL(applyGradients)(self, eta / batchsize);
+    }
+}
+
+/**
+ * trainSet
+ * --------
+ * Trains the network for a number of epochs on a set. Expects the batch
+ * buffers to hold batchsize samples.
+ * 
+ * self: Pointer to the neural network Python object.
+ * set: The set.
+ * epochs: Number of epochs to train for.
+ * batchsize: Number of samples per weight update.
+ * eta: Learning rate used for training.
+ */
+void KERNEL(trainSet)(NetworkObject *self, const Dataset *set, long epochs, long batchsize, double eta)
+{
+    long numBatches = set->numSamples / batchsize;
+    if ( numBatches > 0 ) KERNEL(trainBatches)(self, set, 0, epochs * numBatches, batchsize, eta);
+}
+
+/**
+ * accumulateSet
+ * -------------
+ * Adds the gradients of all samples of a set, fed in chunks of at most
+ * chunksize samples. Expects the batch buffers to hold chunksize samples.
+ * 
+ * self: Pointer to the neural network Python object.
+ * set: The set.
+ * chunksize: Number of samples per chunk.
+ */
+void KERNEL(accumulateSet)(NetworkObject *self, const Dataset *set, long chunksize)
+{
+    KERNEL(Layer) *layers = self->layers;
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+    real *targets = self->batchTargets;
+    long start, i;
+
+    for ( start = 0; start < set->numSamples; start += chunksize )
+    {
+        long chunk = set->numSamples - start < chunksize ? set->numSamples - start : chunksize;
+
+        for ( i = 0; i < chunk; i++ )
+        {
+            KERNEL(Dataset_sample)(set, start + i, layers[0].batch_o + i * inputDim, targets + i * outputDim);
+        }
+
+        KERNEL(trainBatch)(self, chunk);
+    }
+}
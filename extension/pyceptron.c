@@ -6,736 +6,3044 @@
 // #########################################################################
 
 #include <Python.h>
+#include <structmember.h>
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include "activation.h"
 
-/**
- * Node
- * ----
- * This implements one single node in the network.
- * 
- * o: Output value of the node.
- * w: Array holding the weights of the incoming connections.
- * w_grad: Array holding the error gradients of the weights.
- * b: Bias of incoming connections.
- * grad_b: Error gradient of the bias.
- * z: Net input of the nodes.
- * initLayer: Function pointer to the initialization function of the node.
- */
+#ifndef _WIN32
+#include <sys/mman.h>
+#endif
 
-typedef struct nodeStruct {
-    double o; /* Node output */
-
-    double *w; /* Input weights */
-    double *grad_w; /* Input weight gradients */
-    double b; /* Input bias */
-    double grad_b; /* Input bias gradient */
-
-    void (*initNode)(struct nodeStruct *self, int numberOfPreviousNodes);
-} Node;
+#ifdef _OPENMP
+#include <omp.h>
+#else
+#define omp_get_thread_num() 0
+#define omp_get_num_threads() 1
+#endif
 
 /**
- * initializeNode
- * --------------
- * Standard initialization function for a Node.
+ * NetworkObject
+ * -------------
+ * Structure of the neural network as a whole (as a Python object).
  * 
- * self: Pointer to the node.
- * numberOfPreviousNodes: Number of nodes in the previous layer.
- *                        This is needed for the weights.
+ * dtype: DTYPE_FLOAT64 or DTYPE_FLOAT32, the type of all parameters,
+ *        gradients and activations.
+ * layers: Array of all layers in the network (Layer64 or Layer32, see network.h).
+ * numLayers: Number of layers in the network (including input and output).
+ * numNeurons: One-dimensional array holding the number of neurons for each layer.
+ * numParams: Total number of weights and biases.
+ * params: Block holding all weights (layer by layer) followed by all biases.
+ *         This is the same order in which the state files are written.
+ * mapping: Memory-mapped state file that params points into, or NULL if
+ *          params was allocated (see load_state).
+ * mappingSize: Size of the mapping in bytes.
+ * grads: Block holding the gradients of params (same layout).
+ * activations: Block holding the outputs and deltas of all layers.
+ * batchCapacity: Number of samples the mini-batch buffers can hold.
+ * batchActivations: Block holding the mini-batch outputs, deltas and targets.
+ * batchTargets: Target output vectors of the current mini-batch.
+ * activationFunc: Vector kernel applying the activation function in place.
+ * activationFuncGradient: Vector kernel multiplying deltas by the gradient of the activation function.
+ * activationFunc32, activationFuncGradient32: Single precision versions of both.
+ * activationName: Name of the activation function as passed to the constructor.
+ * numThreads: Number of threads used for mini-batches.
+ * busy: Set while a method runs without the GIL.
  */
+#define DTYPE_FLOAT64 0
+#define DTYPE_FLOAT32 1
 
-void initializeNode(struct nodeStruct *self, int numberOfPreviousNodes)
-{
-    self->o = 0.0;
-    self->b = 0.0;
-    self->grad_b = 0.0;
+typedef struct {
+    PyObject_HEAD
 
-    self->w = (double *)malloc(numberOfPreviousNodes * sizeof(double));
-    self->grad_w = (double *)malloc(numberOfPreviousNodes * sizeof(double));
+    int dtype; /* type of all numbers */
 
-    int k;
-    for ( k = 0; k < numberOfPreviousNodes; k++ )
-    {
-        self->w[k] = 0.0;
-        self->grad_w[k] = 0.0;
-    }
-}
+    void *layers; /* array of layer objects */
 
-/** 
- * Layer
- * ----
- * This defines the structure of a fully connected layer in the
- * network.
- * 
- * nodes: Nodes in layer
- */
+    int numLayers; /* number of layers */
+    int *numNeurons; /* number of neurons in each layer */
 
-typedef struct layerStruct {
-    Node *nodes; /* Nodes in layer */
+    long numParams; /* number of weights and biases */
+    void *params; /* weights and biases */
+    void *mapping; /* mapped state file holding params */
+    size_t mappingSize; /* size of the mapping */
+    void *grads; /* weight and bias gradients */
+    void *activations; /* outputs and deltas */
 
-    void (*initLayer)(struct layerStruct *self, int numberOfNodes, int numberOfPreviousNodes);
-} Layer;
+    long batchCapacity; /* samples per mini-batch buffer */
+    void *batchActivations; /* mini-batch outputs and deltas */
+    void *batchTargets; /* mini-batch target outputs */
 
-/**
- * initializeLayer
- * --------------
- * Standard initialization function for a Layer.
- * 
- * self: Pointer to the layer.
- * numberOfNodes: Number of nodes in the new layer.
- * numberOfPreviousNodes: Number of nodes in the previous layer.
- *                        The node will be fully connected to them.
- */
+    void (*activationFunc)(double *, long); /* activation function */
+    void (*activationFuncGradient)(const double *, double *, long); /* gradient of activation function */
+    void (*activationFunc32)(float *, long); /* single precision activation function */
+    void (*activationFuncGradient32)(const float *, float *, long); /* single precision gradient */
+    const char *activationName; /* name of the activation function */
 
-void initializeLayer(struct layerStruct *self, int numberOfNodes, int numberOfPreviousNodes)
-{
-    self->nodes = (Node *)malloc(numberOfNodes * sizeof(Node));
+    int softmax;    /* enable softmax? */
 
-    int j;
-    for ( j = 0; j < numberOfNodes; j++ )
-    {
-        self->nodes[j].initNode = initializeNode;
-        self->nodes[j].initNode(&self->nodes[j], numberOfPreviousNodes);
-    }
-}
+    int numThreads; /* threads per mini-batch */
+    int busy; /* running without the GIL? */
+} NetworkObject;
 
 /**
- * NetworkObject
- * -------------
- * Structure of the neural network as a whole (as a Python object).
+ * QuantizedNetworkObject
+ * ----------------------
+ * An int8 quantized copy of a trained network for inference (as a Python
+ * object), see quantized.h.
  * 
- * nodes: Pointer to a two-dimensional array of all nodes/neurons in the network.
- * numLayer: Number of layers in the network (including input and output).
+ * layers: Array of all layers in the network (QuantizedLayer).
+ * numLayers: Number of layers in the network (including input and output).
  * numNeurons: One-dimensional array holding the number of neurons for each layer.
- * activationFunc: Function pointer to the activation function.
- * activationFuncGradient: Function pointer to the gradient fo the activation function.
+ * numParams: Total number of weights and biases.
+ * weights: Block holding the int8 weights of all layers.
+ * scales: Block holding the weight scales of all layers, followed by all
+ *         biases and all row scales.
+ * outputScales: Quantization scale of the outputs of every layer but the
+ *               output layer (the inputs of the next layer).
+ * outputLows: Smallest quantized output of every layer, -127 for signed
+ *             and 0 for unsigned outputs.
+ * activationFunc32: Single precision activation vector kernel.
+ * activationName: Name of the activation function.
+ * softmax: Whether to apply softmax to the output layer.
+ * numThreads: Number of threads used by predict_batch.
+ * busy: Set while a method runs without the GIL.
  */
 typedef struct {
     PyObject_HEAD
 
-    Layer *layers; /* array of layer objects */
+    void *layers; /* array of layer objects */
 
     int numLayers; /* number of layers */
     int *numNeurons; /* number of neurons in each layer */
 
-    double (*activationFunc)(double); /* activation function */
-    double (*activationFuncGradient)(double); /* gradient of activation function */
+    long numParams; /* number of weights and biases */
+    signed char *weights; /* int8 weights */
+    float *scales; /* weight scales, biases and row scales */
+    float *outputScales; /* quantization scale of each layers outputs */
+    int *outputLows; /* smallest quantized output of each layer */
 
-    int softmax;    /* enable softmax? */
-} NetworkObject;
+    void (*activationFunc32)(float *, long); /* activation function */
+    const char *activationName; /* name of the activation function */
 
-/**
- * forwardfeed
- * -----------
- * Calculates the values of the output layer by forward feed.
- * 
- * self: Pointer to the neural network Python object.
- */
-void forwardfeed(NetworkObject *self)
-{
-    int l, j;
-    for ( l = 1; l < self->numLayers; l++ )
-    {
-        for ( j = 0; j < self->numNeurons[l]; j++ )
-        {
-            /* net input */            
-            int i;
-            double z = 0.0;
-            for ( i = 0; i < self->numNeurons[l-1]; i++ )
-            {
-                z += self->layers[l].nodes[j].w[i] * self->layers[l-1].nodes[i].o;
-            }
+    int softmax;    /* enable softmax? */
 
-            z += self->layers[l].nodes[j].b;
-            self->layers[l].nodes[j].o = self->activationFunc(z);
-        }
-    }
-    return;
-}
+    int numThreads; /* threads for predict_batch */
+    int busy; /* running without the GIL? */
+} QuantizedNetworkObject;
 
 /**
- * softmax
+ * Dataset
  * -------
- * Applies softmax normalization to the output vector.
- * Backpropagation doesn't change for cross entropy.
+ * A set of input vectors and target outputs that is read sample by sample
+ * during training. The samples either come from a nested Python list, which
+ * is converted once, or from buffer-protocol objects (e.g. NumPy arrays)
+ * that are read in place.
  * 
- * self: Pointer to the neural network Python object.
+ * numSamples: Number of samples in the set.
+ * inputDim: Length of each input vector.
+ * outputDim: Length of each target output vector.
+ * inputs, outputs: Converted vectors of the list path.
+ * inputView: Buffer holding one input vector per row.
+ * labelView: Buffer holding either one class index per sample or one
+ *            target output vector per row.
+ * inputFormat, labelFormat: struct format characters of the buffers.
+ * hasBuffers: Whether the set is read from buffers.
+ * labelsAreIndices: Whether labelView holds class indices.
  */
-void softmax(NetworkObject *self)
-{
-    int l = self->numLayers-1;
+typedef struct {
+    long numSamples;
+    int inputDim;
+    int outputDim;
 
-    /* apply softmax */
-    double z = 0;
-    int j;
-    for ( j = 0; j < self->numNeurons[l]; j++)
-    {
-        z += exp(self->layers[l].nodes[j].o);
-    }
+    double **inputs;
+    double **outputs;
 
-    for ( j = 0; j < self->numNeurons[l]; j++)
-    {
-        self->layers[l].nodes[j].o = exp(self->layers[l].nodes[j].o) / z;
-    }
-}
+    Py_buffer inputView;
+    Py_buffer labelView;
+    char inputFormat;
+    char labelFormat;
+    int hasBuffers;
+    int labelsAreIndices;
+} Dataset;
 
 /**
- * delta
- * -----
- * The "delta" tensor for backpropagation.
+ * bufferFormat
+ * ------------
+ * Returns the struct format character of a buffer in native byte order
+ * or 0 if the buffer holds anything but a single native number type.
  * 
- * self: Pointer to the neural network Python object.
- * l: Target layer.
- * j: Target node.
- * output: Target output vector.
+ * view: The buffer.
  */
-double delta(NetworkObject *self, int l, int j, double *output)
+char bufferFormat(const Py_buffer *view)
 {
-    if ( l < self->numLayers-1)
-    {
-        double sum = 0;
-        int i;
-        for ( i = 0; i < self->numNeurons[l+1]; i++ )
-        {
-            sum += delta(self, l+1, i, output) * self->layers[l+1].nodes[i].w[j];
-        }
-        return sum * self->activationFuncGradient(self->layers[l].nodes[j].o);
-    }
-    else
-    {
-        /* The same for square error and softmax with cross entropy. */
-        return self->activationFuncGradient(self->layers[l].nodes[j].o) * (self->layers[l].nodes[j].o - output[j]);
-    }
+    const char *fmt = view->format == NULL ? "B" : view->format;
+    const union { int i; char c; } endian = { 1 };
+
+    if ( *fmt == '@' || *fmt == '=' || (*fmt == '<' && endian.c) ) fmt++;
+    if ( fmt[0] == '\0' || fmt[1] != '\0' ) return 0;
+    if ( strchr("dfbBhHiIlLqQ", fmt[0]) == NULL ) return 0;
+    return fmt[0];
 }
 
 /**
- * backpropagation
- * ---------------
- * Executes a full backpropagation in the current state of the network and sets all gradients accordingly.
+ * readIndex
+ * ---------
+ * Reads a single integer from a buffer.
  * 
- * self: Pointer to the neural network Python object.
- * output: Target output vector.
- * numSets: Numver of training sets (only used for gradient calculation).
+ * src: Pointer to the number.
+ * format: struct format character of the number.
  */
-
-void backpropagation(NetworkObject *self, double *output)
+long readIndex(const char *src, char format)
 {
-    int l, j, k; /* target indices */
-
-    /* back propagation */
-    /* compute weight gradients */
-    for ( l = 1; l < self->numLayers ; l++ )   /* target layer */
+    switch ( format )
     {
-        for ( j = 0; j < self->numNeurons[l]; j++)   /* target neuron */
-        {
-            double d = delta(self, l, j, output);
-            for ( k = 0; k < self->numNeurons[l-1]; k++ ) /* previous neuron */
-            {
-                self->layers[l].nodes[j].grad_w[k] += d * self->layers[l-1].nodes[k].o;
-            }
-            self->layers[l].nodes[j].grad_b += d;
-        }
+        case 'b': return *(const signed char *)src;
+        case 'B': return *(const unsigned char *)src;
+        case 'h': return *(const short *)src;
+        case 'H': return *(const unsigned short *)src;
+        case 'i': return *(const int *)src;
+        case 'I': return *(const unsigned int *)src;
+        case 'l': return *(const long *)src;
+        case 'L': return *(const unsigned long *)src;
+        case 'q': return *(const long long *)src;
+        case 'Q': return *(const unsigned long long *)src;
     }
+    return -1;
 }
 
 /**
- * Network_new
- * -----------
- * Creates a new neural network and returns the created network as a Python object.
+ * getMatrix
+ * ---------
+ * Requests a C-contiguous buffer from an object and checks that it holds
+ * a number type and has cols values per row. One-dimensional buffers are
+ * treated as a single row.
  * 
- * architecture: Python list the length of the layer number containing the number of nodes in each layer.
- * activation: "sigmoid" or "tanh", activation function is chosen accordingly.
+ * obj: The buffer-protocol object.
+ * view: Buffer to fill. Must be released by the caller on success.
+ * cols: Expected number of values per row.
+ * rows: Set to the number of rows.
  * 
  * Returns:
- *  Python object representing the network.
+ *  The struct format character of the buffer, or 0 with an exception set.
  */
-static PyObject* Network_new(PyTypeObject *type, PyObject *args, PyObject *kwargs)
+char getMatrix(PyObject *obj, Py_buffer *view, long cols, long *rows)
 {
-    NetworkObject *self;
-    self = (NetworkObject *) type->tp_alloc(type, 0);
-
-    static char *kwlist[] = {"architecture", "activation", "softmax", NULL};
-
-    PyObject * listObj; /* the list of strings */
-    char * actString = "sigmoid";
-    int softmax = 0; /* should there be a softmax layer? */
+    if ( PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0 ) return 0;
 
-    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O!|si", kwlist, &PyList_Type, &listObj, &actString, &softmax )) return NULL;
-
-    if (strcmp(actString, "sigmoid") == 0)
-    {
-        self->activationFunc = &act_sigmoid;
-        self->activationFuncGradient = &act_sigmoid_grad;
-    }
-    else if (strcmp(actString, "tanh") == 0)
-    {
-        self->activationFunc = &act_tanh;
-        self->activationFuncGradient = &act_tanh_grad;
-    }
-    else if (strcmp(actString, "ReLU") == 0)
+    char format = bufferFormat(view);
+    if ( format == 0 )
     {
-        self->activationFunc = &act_relu;
-        self->activationFuncGradient = &act_relu_grad;
+        PyBuffer_Release(view);
+        PyErr_SetString(PyExc_ValueError, "Buffers must hold native integers, float32 or float64 values!");
+        return 0;
     }
-    else if (strcmp(actString, "Leaky ReLU") == 0)
+
+    if ( view->ndim == 1 && view->shape[0] == cols )
     {
-        self->activationFunc = &act_leaky_relu;
-        self->activationFuncGradient = &act_leaky_relu_grad;
+        *rows = 1;
     }
-    else if (strcmp(actString, "linear") == 0)
+    else if ( view->ndim == 2 && view->shape[1] == cols )
     {
-        self->activationFunc = &act_linear;
-        self->activationFuncGradient = &act_linear_grad;
+        *rows = view->shape[0];
     }
     else
     {
-        PyErr_SetString(PyExc_ValueError, "Unknown activation function!");
-        return NULL;
-    }
-
-    self->softmax = softmax;
-
-    /* get the number of lines passed to us */
-    self->numLayers = PyList_Size(listObj);
-
-    self->numNeurons = (int *)malloc(self->numLayers * sizeof(int));
-
-    /* build the neural network */
-    self->layers = (Layer *)malloc(self->numLayers * sizeof(Layer));
-
-    int l;
-    for ( l = 0; l < self->numLayers; l++ )   /* set neurons in layers */
-    {
-        PyObject* listItem = PyList_GetItem(listObj, l);
-        self->numNeurons[l] = PyLong_AsLong(listItem);
-
-
-        self->layers[l].initLayer = initializeLayer;
-        if ( l > 0)
-        {
-            self->layers[l].initLayer(&self->layers[l], self->numNeurons[l], self->numNeurons[l-1]);
-        }
-        else /* no input weights/biases */
-        {
-            self->layers[l].initLayer(&self->layers[l], self->numNeurons[l], 1);
-        }
+        PyBuffer_Release(view);
+        PyErr_SetString(PyExc_ValueError, "Input dimension must match the input layers dimension!");
+        return 0;
     }
 
-    return (PyObject *) self;
+    return format;
 }
 
 /**
- * Network_predict
+ * Dataset_release
  * ---------------
- * Makes a single prediction using the current network configuration.
+ * Frees the converted vectors or releases the buffers of a set.
  * 
- * listObj: Input vector as Python list.
- * 
- * Returns:
- *  Output vector as Python list.
+ * self: Pointer to the set.
  */
-static PyObject* Network_predict(NetworkObject *self, PyObject *args)
+void Dataset_release(Dataset *self)
 {
-    PyObject *listObj;
-    if (! PyArg_ParseTuple( args, "O!", &PyList_Type, &listObj)) return NULL;
-
-    long inputDim = PyList_Size(listObj);
-
-    if ( inputDim != self->numNeurons[0] )
-    {
-        PyErr_SetString(PyExc_ValueError, "Input dimension must match the input layers dimension!");
-        return NULL;
-    }
-
-    double* input = (double *)malloc(inputDim * sizeof(double));
-    int i;
-    for ( i = 0; i < inputDim; i++ )
+    long i;
+    if ( self->hasBuffers )
     {
-        PyObject *itemObj = PyList_GetItem(listObj, i);
-        input[i] = PyFloat_AsDouble(itemObj);
+        PyBuffer_Release(&self->inputView);
+        PyBuffer_Release(&self->labelView);
+        self->hasBuffers = 0;
     }
 
-    int j;
-    for ( j = 0; j < self->numNeurons[0]; j++ )
-    {
-        self->layers[0].nodes[j].o = input[j];
-    }
-
-    forwardfeed(self);
-    if (self->softmax) softmax(self);
-
-    PyObject* outputList = PyList_New(0);
-    for ( j = 0; j < self->numNeurons[self->numLayers-1]; j++ )
+    if ( self->inputs != NULL )
     {
-        PyObject* objItem = PyFloat_FromDouble(self->layers[self->numLayers-1].nodes[j].o);
-        int result = PyList_Append(outputList, objItem);
+        for ( i = 0; i < self->numSamples; i++ )
+        {
+            free(self->inputs[i]);
+            free(self->outputs[i]);
+        }
+        free(self->inputs);
+        free(self->outputs);
+        self->inputs = NULL;
+        self->outputs = NULL;
     }
-
-    free(input);
-
-    return outputList;
 }
 
 /**
- * Network_train
- * -------------
- * Trains the network using the supplied training sets.
+ * Dataset_fromList
+ * ----------------
+ * Converts a nested Python list of [input vector, target output vector]
+ * pairs.
  * 
- * listObj: Nested Python list containing input and target output vectors of each set.
- * epochs: Number of epochs to train for.
- * eta: Learning rate used for training.
+ * self: Pointer to the set.
+ * listObj: The nested Python list.
+ * inputDim: Expected length of the input vectors.
+ * outputDim: Expected length of the target output vectors.
+ * 
+ * Returns:
+ *  0 on success, -1 with an exception set otherwise.
  */
-static PyObject* Network_train(NetworkObject *self, PyObject *args, PyObject *kwargs)
+int Dataset_fromList(Dataset *self, PyObject *listObj, int inputDim, int outputDim)
 {
-    long epochs;
-    long batchsize;
-    double eta;
-
-    PyObject *listObj;
-
-    static char *kwlist[] = {"set", "epochs", "batchsize", "eta", NULL};
-
-    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O!lld", kwlist, &PyList_Type, &listObj, &epochs, &batchsize, &eta)) return NULL;
-
-    int numSamples = PyList_Size(listObj);
-    double** inputs = (double **)malloc(numSamples * sizeof(double *));
-    double** outputs = (double **)malloc(numSamples * sizeof(double *));
+    memset(self, 0, sizeof(Dataset));
+    self->inputDim = inputDim;
+    self->outputDim = outputDim;
+    self->numSamples = PyList_Size(listObj);
+    self->inputs = (double **)calloc(self->numSamples + 1, sizeof(double *));
+    self->outputs = (double **)calloc(self->numSamples + 1, sizeof(double *));
+
+    if ( self->inputs == NULL || self->outputs == NULL )
+    {
+        Dataset_release(self);
+        PyErr_NoMemory();
+        return -1;
+    }
 
-    int i;
-    for ( i = 0; i < numSamples; i++ )
+    long i;
+    for ( i = 0; i < self->numSamples; i++ )
     {
         PyObject *IoTuple = PyList_GetItem(listObj, i);
-        PyObject* inputVectorItem = PyList_GetItem(IoTuple, 0);
-        PyObject* outputVectorItem = PyList_GetItem(IoTuple, 1);
-        long inputDim = PyList_Size(inputVectorItem);
-        long outputDim = PyList_Size(outputVectorItem);
+        PyObject* inputVectorItem = PySequence_GetItem(IoTuple, 0);
+        PyObject* outputVectorItem = PySequence_GetItem(IoTuple, 1);
+        Py_XDECREF(inputVectorItem); /* the pair keeps its items alive */
+        Py_XDECREF(outputVectorItem);
 
-        if ( inputDim != self->numNeurons[0] )
+        if ( inputVectorItem == NULL || outputVectorItem == NULL ) break;
+
+        if ( !PyList_Check(inputVectorItem) || PyList_Size(inputVectorItem) != inputDim )
         {
             PyErr_SetString(PyExc_ValueError, "Input dimension must match the input layers dimension!");
-            return NULL;
+            break;
         }
 
-        if ( outputDim != self->numNeurons[self->numLayers-1] )
+        if ( !PyList_Check(outputVectorItem) || PyList_Size(outputVectorItem) != outputDim )
         { 
             PyErr_SetString(PyExc_ValueError, "Output dimnesion must match the output layers dimension!");
-            return NULL;
+            break;
         }
 
-        inputs[i] = (double *)malloc(inputDim * sizeof(double));
-        outputs[i] = (double *)malloc(outputDim * sizeof(double));
+        self->inputs[i] = (double *)malloc(inputDim * sizeof(double));
+        self->outputs[i] = (double *)malloc(outputDim * sizeof(double));
+
+        if ( self->inputs[i] == NULL || self->outputs[i] == NULL )
+        {
+            PyErr_NoMemory();
+            break;
+        }
 
         int j;
         for ( j = 0; j < inputDim; j++ )
         {
-            PyObject* inputItem = PyList_GetItem(inputVectorItem, j);
-            double input = PyFloat_AsDouble(inputItem);
-            inputs[i][j] = input;
+            self->inputs[i][j] = PyFloat_AsDouble(PyList_GET_ITEM(inputVectorItem, j));
         }
 
         for ( j = 0; j < outputDim; j++ )
         {
-            PyObject* outputItem = PyList_GetItem(outputVectorItem, j);
-            double output = PyFloat_AsDouble(outputItem);
-            outputs[i][j] = output;
+            self->outputs[i][j] = PyFloat_AsDouble(PyList_GET_ITEM(outputVectorItem, j));
         }
-    }
-
-    int epoch;
-    for (epoch = 0; epoch < epochs; epoch++ )
-    {
-        int batch;
-        int sampleInBatch, sample;
-        int l, j, k;
-        for (batch = 0; batch < numSamples / batchsize; batch++ )
-        {
-            for ( sampleInBatch = 0; sampleInBatch < batchsize; sampleInBatch++ )
-            {
-                sample = sampleInBatch + batch * batchsize; // mini-batch offset
-
-                for ( j = 0; j < self->numNeurons[0]; j++ )
-                {
-                    self->layers[0].nodes[j].o = inputs[sample][j];
-                }
 
-                forwardfeed(self);
-                if (self->softmax) softmax(self);
-                backpropagation(self, outputs[sample]);
-            }
-            
-            /* apply weight gradients and set to 0 for next batch */
-            for ( l = 1; l < self->numLayers ; l++ )   /* weight to layer */
-            {
-                for ( j = 0; j < self->numNeurons[l]; j++)   /* to neuron */
-                {
-                    self->layers[l].nodes[j].b -= eta / batchsize * self->layers[l].nodes[j].grad_b;
-                    self->layers[l].nodes[j].grad_b = 0.0;
-                    for ( k = 0; k < self->numNeurons[l-1]; k++ ) /* from neuron */
-                    {
-                        self->layers[l].nodes[j].w[k] -= eta / batchsize * self->layers[l].nodes[j].grad_w[k];
-                        self->layers[l].nodes[j].grad_w[k] = 0.0;
-                    }
-                }
-            }
-        }
+        if ( PyErr_Occurred() ) break;
     }
 
-    for ( i = 0; i < numSamples; i++ )
+    if ( PyErr_Occurred() )
     {
-        free(inputs[i]);
-        free(outputs[i]);
+        self->numSamples = i + 1; /* free what was converted so far */
+        Dataset_release(self);
+        return -1;
     }
-    free(inputs);
-    free(outputs);
-    return Py_None;
+
+    return 0;
 }
 
 /**
- * Network_set_weight
- * ------------------
- * Manually set a single weight of the network.
+ * Dataset_fromBuffers
+ * -------------------
+ * Wraps an (N, inputDim) input buffer and a label buffer without copying.
+ * The labels are either N class indices or an (N, outputDim) matrix of
+ * target output vectors.
  * 
- * l: Layer of the weights target node.
- * j: Index of the weights target node in layer.
- * k: Index of the weights origin node in layer.
- * new_weight: New weight to set.
+ * self: Pointer to the set.
+ * inputObj: Buffer-protocol object holding the inputs.
+ * labelObj: Buffer-protocol object holding the labels, either integer
+ *           class indices or float target output vectors.
+ * inputDim: Expected length of the input vectors.
+ * outputDim: Expected length of the target output vectors.
+ * 
+ * Returns:
+ *  0 on success, -1 with an exception set otherwise.
  */
-static PyObject* Network_set_weight(NetworkObject *self, PyObject *args)
+int Dataset_fromBuffers(Dataset *self, PyObject *inputObj, PyObject *labelObj, int inputDim, int outputDim)
 {
-    int l;  /* to layer */
-    int j;  /* to neuron */
-    int k;  /* from neuron */
-    double new_weight;
+    memset(self, 0, sizeof(Dataset));
+    self->inputDim = inputDim;
+    self->outputDim = outputDim;
 
-    if (! PyArg_ParseTuple(args, "iiid", &l, &j, &k, &new_weight)) return NULL;
+    self->inputFormat = getMatrix(inputObj, &self->inputView, inputDim, &self->numSamples);
+    if ( self->inputFormat == 0 ) return -1;
 
-    if ( l == 0 || l > self->numLayers-1 || j > self->numNeurons[l] - 1 || k > self->numNeurons[l-1] - 1 )
+    if ( PyObject_GetBuffer(labelObj, &self->labelView, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0 )
     {
-        PyErr_SetString(PyExc_ValueError, "One ore more indices are out of bounds!");
-        return NULL;
+        PyBuffer_Release(&self->inputView);
+        return -1;
     }
+    self->hasBuffers = 1;
 
-    self->layers[l].nodes[j].w[k] = new_weight;
+    self->labelFormat = bufferFormat(&self->labelView);
+    self->labelsAreIndices = self->labelView.ndim == 1 && self->labelFormat != 'd' && self->labelFormat != 'f';
 
-    Py_INCREF(Py_None);
-    return Py_None;
+    if ( self->labelFormat == 0 )
+    {
+        PyErr_SetString(PyExc_ValueError, "Buffers must hold native integers, float32 or float64 values!");
+    }
+    else if ( self->labelsAreIndices ? self->labelView.shape[0] != self->numSamples
+              : (self->labelView.ndim != 2 || self->labelView.shape[0] != self->numSamples || self->labelView.shape[1] != outputDim
+                 || (self->labelFormat != 'd' && self->labelFormat != 'f')) )
+    {
+        PyErr_SetString(PyExc_ValueError, "Labels must be one class index or one target output vector per sample!");
+    }
+    else if ( self->labelsAreIndices )
+    {
+        long i;
+        for ( i = 0; i < self->numSamples; i++ )
+        {
+            long label = readIndex((const char *)self->labelView.buf + i * self->labelView.itemsize, self->labelFormat);
+            if ( label < 0 || label >= outputDim )
+            {
+                PyErr_SetString(PyExc_ValueError, "Class indices must be smaller than the output layers dimension!");
+                break;
+            }
+        }
+    }
+
+    if ( PyErr_Occurred() )
+    {
+        Dataset_release(self);
+        return -1;
+    }
+
+    return 0;
 }
 
 /**
- * Network_set_bias
+ * Dataset_fromArgs
  * ----------------
- * Manually set a single bias of the network.
+ * Builds a set from the set and labels arguments of the training and
+ * evaluation methods: a nested list if labels is None, buffers otherwise.
  * 
- * l: Layer of the biases node.
- * j: Index of the biases node in layer.
- * new_bias: New bias to set.
+ * self: Pointer to the set.
+ * setObj: Nested Python list or buffer-protocol object holding the inputs.
+ * labelObj: None for a nested list, otherwise the labels (see Dataset_fromBuffers).
+ * inputDim: Expected length of the input vectors.
+ * outputDim: Expected length of the target output vectors.
+ * 
+ * Returns:
+ *  0 on success, -1 with an exception set otherwise.
  */
-static PyObject* Network_set_bias(NetworkObject *self, PyObject *args)
+static int Dataset_fromArgs(Dataset *self, PyObject *setObj, PyObject *labelObj, int inputDim, int outputDim)
 {
-    int l;  /* to layer */
-    int j;  /* to neuron */
-
-    double new_bias;
-
-    if (! PyArg_ParseTuple(args, "iid", &l, &j, &new_bias)) return NULL;
+    if ( labelObj != Py_None ) return Dataset_fromBuffers(self, setObj, labelObj, inputDim, outputDim);
 
-    if ( l == 0 || l > self->numLayers-1 || j > self->numNeurons[l] - 1 )
+    if ( !PyList_Check(setObj) )
     {
-        PyErr_SetString(PyExc_ValueError, "One ore more indices are out of bounds!");
-        return NULL;
+        PyErr_SetString(PyExc_TypeError, "Expected a nested list or an input buffer with labels!");
+        return -1;
     }
+    return Dataset_fromList(self, setObj, inputDim, outputDim);
+}
 
-    self->layers[l].nodes[j].b = new_bias;
+#define PREDICT_CHUNK 256 /* samples per forward feed in predict_batch and evaluate */
+
+/* double precision functions, e.g. forwardfeed64 */
+#define real double
+#define KERNEL(name) name##64
+#define ACTIVATION activationFunc
+#define ACTIVATION_GRADIENT activationFuncGradient
+#define SOFTMAX act_softmax_vec
+#include "network.h"
+#undef real
+#undef KERNEL
+#undef ACTIVATION
+#undef ACTIVATION_GRADIENT
+#undef SOFTMAX
+
+/* single precision functions, e.g. forwardfeed32 */
+#define real float
+#define KERNEL(name) name##32
+#define ACTIVATION activationFunc32
+#define ACTIVATION_GRADIENT activationFuncGradient32
+#define SOFTMAX act_softmax_vec_f
+#include "network.h"
+#undef real
+#undef KERNEL
+#undef ACTIVATION
+#undef ACTIVATION_GRADIENT
+#undef SOFTMAX
+
+#include "quantized.h"
+#include "state.h"
+
+/* The function of a network's precision, e.g. DISPATCH(self, forwardfeed)(self) */
+#define DISPATCH(self, name) ((self)->dtype == DTYPE_FLOAT32 ? name##32 : name##64)
 
-    Py_INCREF(Py_None);
-    return Py_None;
+/**
+ * realSize
+ * --------
+ * Returns the size of a number of the network in bytes.
+ */
+size_t realSize(const NetworkObject *self)
+{
+    return self->dtype == DTYPE_FLOAT32 ? sizeof(float) : sizeof(double);
 }
 
 /**
- * Network_get_weight
- * ------------------
- * Returns the value a single weight in the network.
- * 
- * l: Layer of the weights target node.
- * j: Index of the weights target node in layer.
- * k: Index of the weights origin node in layer.
+ * dtypeName
+ * ---------
+ * Returns the NumPy name of the type of the network.
  */
-static PyObject* Network_get_weight(NetworkObject *self, PyObject *args)
+const char* dtypeName(const NetworkObject *self)
 {
-    int l;  /* to layer */
-    int j;  /* to neuron */
-    int k;  /* from neuron */
+    return self->dtype == DTYPE_FLOAT32 ? "float32" : "float64";
+}
 
-    if (! PyArg_ParseTuple(args, "iii", &l, &j, &k)) return NULL;
+/**
+ * realFormat
+ * ----------
+ * Returns the struct format character of the type of the network.
+ */
+char realFormat(const NetworkObject *self)
+{
+    return self->dtype == DTYPE_FLOAT32 ? 'f' : 'd';
+}
 
-    if ( l == 0 || l > self->numLayers-1 || j > self->numNeurons[l] - 1 || k > self->numNeurons[l-1] - 1 )
+/**
+ * getReal
+ * -------
+ * Reads the i-th number of a block of the network (e.g. params).
+ */
+double getReal(const NetworkObject *self, const void *block, long i)
+{
+    return self->dtype == DTYPE_FLOAT32 ? ((const float *)block)[i] : ((const double *)block)[i];
+}
+
+/**
+ * setReal
+ * -------
+ * Writes the i-th number of a block of the network (e.g. params).
+ */
+void setReal(const NetworkObject *self, void *block, long i, double value)
+{
+    if ( self->dtype == DTYPE_FLOAT32 ) ((float *)block)[i] = (float)value;
+    else ((double *)block)[i] = value;
+}
+
+/**
+ * weightIndex
+ * -----------
+ * Returns the position of a weight in the params block.
+ * 
+ * l: Layer of the weights target node.
+ * j: Index of the weights target node in layer.
+ * k: Index of the weights origin node in layer (0 for the first weight of the layer).
+ */
+long weightIndex(const NetworkObject *self, int l, int j, int k)
+{
+    long index = 0;
+    int m;
+    for ( m = 1; m < l; m++ )
+    {
+        index += (long)self->numNeurons[m] * self->numNeurons[m-1];
+    }
+    return index + (long)k * self->numNeurons[l] + j;
+}
+
+/**
+ * biasIndex
+ * ---------
+ * Returns the position of a bias in the params block.
+ * 
+ * l: Layer of the biases node.
+ * j: Index of the biases node in layer.
+ */
+long biasIndex(const NetworkObject *self, int l, int j)
+{
+    long index = 0;
+    int m;
+    for ( m = 1; m < self->numLayers; m++ ) /* all weights come first */
+    {
+        index += (long)self->numNeurons[m] * self->numNeurons[m-1];
+    }
+    for ( m = 1; m < l; m++ )
+    {
+        index += self->numNeurons[m];
+    }
+    return index + j;
+}
+
+/**
+ * outputIndex
+ * -----------
+ * Returns the position of the first output of a layer in the activations
+ * block. The outputs of the input layer come first.
+ */
+long outputIndex(const NetworkObject *self, int l)
+{
+    long index = 0;
+    int m;
+    for ( m = 0; m < l; m++ )
+    {
+        index += self->numNeurons[m];
+    }
+    return index;
+}
+
+/**
+ * acquire
+ * -------
+ * Marks the network as busy before a method releases the GIL. The
+ * buffers of a network can only be used by one call at a time.
+ * 
+ * self: Pointer to the neural network Python object.
+ * 
+ * Returns:
+ *  0 on success, -1 with an exception set if the network is busy.
+ */
+int acquire(NetworkObject *self)
+{
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return -1;
+    }
+
+    if ( self->numThreads < 1 ) self->numThreads = 1;
+    self->busy = 1;
+    return 0;
+}
+
+/**
+ * releaseParams
+ * -------------
+ * Frees a params block, or unmaps it if it lies in a mapped state file.
+ * 
+ * params: The block.
+ * mapping: The mapping holding the block or NULL.
+ * mappingSize: Size of the mapping in bytes.
+ */
+void releaseParams(void *params, void *mapping, size_t mappingSize)
+{
+#ifndef _WIN32
+    if ( mapping != NULL )
+    {
+        munmap(mapping, mappingSize);
+        return;
+    }
+#endif
+    free(params);
+}
+
+/**
+ * Network_dealloc
+ * ---------------
+ * Frees all memory held by the network.
+ */
+static void Network_dealloc(NetworkObject *self)
+{
+    free(self->layers);
+    free(self->numNeurons);
+    releaseParams(self->params, self->mapping, self->mappingSize);
+    free(self->grads);
+    free(self->activations);
+    free(self->batchActivations);
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+/**
+ * Activation
+ * ----------
+ * The vector kernels of an activation function (see activation.h).
+ */
+typedef struct {
+    const char *name;
+    void (*func)(double *, long);
+    void (*gradient)(const double *, double *, long);
+    void (*func32)(float *, long);
+    void (*gradient32)(const float *, float *, long);
+} Activation;
+
+static const Activation activations[] = {
+    {"sigmoid", act_sigmoid_vec, act_sigmoid_grad_vec, act_sigmoid_vec_f, act_sigmoid_grad_vec_f},
+    {"tanh", act_tanh_vec, act_tanh_grad_vec, act_tanh_vec_f, act_tanh_grad_vec_f},
+    {"ReLU", act_relu_vec, act_relu_grad_vec, act_relu_vec_f, act_relu_grad_vec_f},
+    {"Leaky ReLU", act_leaky_relu_vec, act_leaky_relu_grad_vec, act_leaky_relu_vec_f, act_leaky_relu_grad_vec_f},
+    {"linear", act_linear_vec, act_linear_grad_vec, act_linear_vec_f, act_linear_grad_vec_f},
+};
+
+/**
+ * findActivation
+ * --------------
+ * Looks up an activation function by name.
+ * 
+ * Returns:
+ *  The activation function or NULL with an exception set if the name is unknown.
+ */
+const Activation* findActivation(const char *name)
+{
+    size_t i;
+    for ( i = 0; i < sizeof(activations) / sizeof(activations[0]); i++ )
+    {
+        if ( strcmp(name, activations[i].name) == 0 ) return &activations[i];
+    }
+    PyErr_SetString(PyExc_ValueError, "Unknown activation function!");
+    return NULL;
+}
+
+/**
+ * readArchitecture
+ * ----------------
+ * Reads the number of neurons of every layer from a Python list.
+ * 
+ * listObj: Python list of the number of neurons of every layer.
+ * numNeurons: Set to a new array of the numbers of neurons.
+ * 
+ * Returns:
+ *  The number of layers or -1 with an exception set.
+ */
+int readArchitecture(PyObject *listObj, int **numNeurons)
+{
+    int numLayers = PyList_Size(listObj);
+
+    if ( numLayers < 2 )
+    {
+        PyErr_SetString(PyExc_ValueError, "The network needs at least an input and an output layer!");
+        return -1;
+    }
+
+    *numNeurons = (int *)malloc(numLayers * sizeof(int));
+    if ( *numNeurons == NULL )
+    {
+        PyErr_NoMemory();
+        return -1;
+    }
+
+    int l;
+    for ( l = 0; l < numLayers; l++ )   /* set neurons in layers */
+    {
+        PyObject* listItem = PyList_GetItem(listObj, l);
+        (*numNeurons)[l] = PyLong_AsLong(listItem);
+
+        if ( (*numNeurons)[l] <= 0 )
+        {
+            PyErr_SetString(PyExc_ValueError, "Every layer needs at least one neuron!");
+            return -1;
+        }
+    }
+
+    return numLayers;
+}
+
+/**
+ * architectureList
+ * ----------------
+ * Returns the number of neurons in each layer as a Python list.
+ */
+PyObject* architectureList(const int *numNeurons, int numLayers)
+{
+    PyObject *listObj = PyList_New(numLayers);
+    if ( listObj == NULL ) return NULL;
+
+    int l;
+    for ( l = 0; l < numLayers; l++ )
+    {
+        PyList_SET_ITEM(listObj, l, PyLong_FromLong(numNeurons[l]));
+    }
+    return listObj;
+}
+
+/**
+ * Network_new
+ * -----------
+ * Creates a new neural network and returns the created network as a Python object.
+ * 
+ * architecture: Python list the length of the layer number containing the number of nodes in each layer.
+ * activation: "sigmoid", "tanh", "ReLU", "Leaky ReLU" or "linear", activation function is chosen accordingly.
+ * softmax: Whether to apply softmax to the output layer.
+ * threads: Number of threads used for mini-batch training, predict_batch and evaluate.
+ * dtype: "float64" or "float32", the type of all parameters and activations.
+ * 
+ * Returns:
+ *  Python object representing the network.
+ */
+static PyObject* Network_new(PyTypeObject *type, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"architecture", "activation", "softmax", "threads", "dtype", NULL};
+
+    PyObject * listObj; /* the list of strings */
+    char * actString = "sigmoid";
+    int softmax = 0; /* should there be a softmax layer? */
+    int threads = 1;
+    char * dtypeString = "float64";
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O!|siis", kwlist, &PyList_Type, &listObj, &actString, &softmax, &threads, &dtypeString )) return NULL;
+
+    if ( threads < 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "The number of threads must be at least 1!");
+        return NULL;
+    }
+
+    int dtype;
+    if ( strcmp(dtypeString, "float64") == 0 )
+    {
+        dtype = DTYPE_FLOAT64;
+    }
+    else if ( strcmp(dtypeString, "float32") == 0 )
+    {
+        dtype = DTYPE_FLOAT32;
+    }
+    else
+    {
+        PyErr_SetString(PyExc_ValueError, "The dtype must be \"float64\" or \"float32\"!");
+        return NULL;
+    }
+
+    const Activation *activation = findActivation(actString);
+    if ( activation == NULL ) return NULL;
+
+    NetworkObject *self;
+    self = (NetworkObject *) type->tp_alloc(type, 0);
+    if ( self == NULL ) return NULL;
+
+    self->activationFunc = activation->func;
+    self->activationFuncGradient = activation->gradient;
+    self->activationFunc32 = activation->func32;
+    self->activationFuncGradient32 = activation->gradient32;
+    self->activationName = activation->name;
+
+    self->softmax = softmax;
+    self->numThreads = threads;
+    self->dtype = dtype;
+
+    self->numLayers = readArchitecture(listObj, &self->numNeurons);
+    if ( self->numLayers < 0 )
+    {
+        Py_DECREF(self);
+        return NULL;
+    }
+
+    /* build the neural network */
+    if ( DISPATCH(self, initializeLayers)(self) < 0 )
+    {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+
+    return (PyObject *) self;
+}
+
+/**
+ * Network_predict
+ * ---------------
+ * Makes a single prediction using the current network configuration.
+ * 
+ * inputObj: Input vector as Python list or as a buffer-protocol object
+ *           (e.g. a NumPy array) of float64, float32 or uint8 values.
+ *           uint8 values are scaled to [0, 1].
+ * 
+ * Returns:
+ *  Output vector as Python list.
+ */
+static PyObject* Network_predict(NetworkObject *self, PyObject *args)
+{
+    PyObject *inputObj;
+    if (! PyArg_ParseTuple( args, "O", &inputObj)) return NULL;
+
+    long inputDim = self->numNeurons[0];
+
+    if ( acquire(self) < 0 ) return NULL;
+
+    if ( PyList_Check(inputObj) )
+    {
+        if ( PyList_Size(inputObj) != inputDim )
+        {
+            self->busy = 0;
+            PyErr_SetString(PyExc_ValueError, "Input dimension must match the input layers dimension!");
+            return NULL;
+        }
+
+        int i;
+        for ( i = 0; i < inputDim; i++ )
+        {
+            PyObject *itemObj = PyList_GET_ITEM(inputObj, i);
+            setReal(self, self->activations, i, PyFloat_AsDouble(itemObj)); /* outputs of the input layer */
+        }
+    }
+    else
+    {
+        Py_buffer view;
+        long rows;
+        char format = getMatrix(inputObj, &view, inputDim, &rows);
+
+        if ( format != 0 && rows != 1 )
+        {
+            PyBuffer_Release(&view);
+            PyErr_SetString(PyExc_ValueError, "predict() takes a single input vector!");
+        }
+        else if ( format != 0 )
+        {
+            if ( self->dtype == DTYPE_FLOAT32 ) readVector32(view.buf, format, inputDim, self->activations);
+            else readVector64(view.buf, format, inputDim, self->activations);
+            PyBuffer_Release(&view);
+        }
+    }
+
+    if ( PyErr_Occurred() )
+    {
+        self->busy = 0;
+        return NULL;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, predictSample)(self);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    int j;
+    int outputDim = self->numNeurons[self->numLayers-1];
+    long output = outputIndex(self, self->numLayers-1);
+    PyObject* outputList = PyList_New(outputDim);
+    if ( outputList == NULL ) return NULL;
+    for ( j = 0; j < outputDim; j++ )
+    {
+        PyList_SET_ITEM(outputList, j, PyFloat_FromDouble(getReal(self, self->activations, output + j)));
+    }
+
+    return outputList;
+}
+
+/**
+ * newArray
+ * --------
+ * Creates a new uninitialized NumPy array. NumPy is imported at runtime
+ * so that the extension builds without its headers.
+ * 
+ * rows: Number of rows.
+ * cols: Number of columns, or 0 for a one-dimensional array.
+ * dtype: NumPy dtype name.
+ * 
+ * Returns:
+ *  The new array or NULL with an exception set.
+ */
+PyObject* newArray(long rows, long cols, const char *dtype)
+{
+    PyObject *numpy = PyImport_ImportModule("numpy");
+    if ( numpy == NULL ) return NULL;
+
+    PyObject *shape = cols > 0 ? Py_BuildValue("(ll)", rows, cols) : Py_BuildValue("(l)", rows);
+    PyObject *array = shape == NULL ? NULL : PyObject_CallMethod(numpy, "empty", "Os", shape, dtype);
+
+    Py_XDECREF(shape);
+    Py_DECREF(numpy);
+    return array;
+}
+
+/**
+ * Network_predict_batch
+ * ---------------------
+ * Makes predictions for a whole set of input vectors at once. The set is
+ * fed forward in chunks as matrix-matrix products.
+ * 
+ * inputObj: Buffer-protocol object (e.g. a NumPy array) of shape
+ *           (N, input dimension) holding float64, float32 or uint8 values.
+ *           uint8 values are scaled to [0, 1].
+ * argmax: If true, only the index of the largest output of each sample
+ *         is returned.
+ * 
+ * Returns:
+ *  (N, output dimension) NumPy array of output vectors of the networks
+ *  dtype or, with argmax, an (N,) int64 NumPy array of class indices.
+ */
+static PyObject* Network_predict_batch(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *inputObj;
+    int argmax = 0;
+
+    static char *kwlist[] = {"inputs", "argmax", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O|p", kwlist, &inputObj, &argmax)) return NULL;
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Py_buffer view;
+    long numSamples;
+    char format = getMatrix(inputObj, &view, inputDim, &numSamples);
+    if ( format == 0 ) return NULL;
+
+    if ( acquire(self) < 0 )
+    {
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+
+    PyObject *result = newArray(numSamples, argmax ? 0 : outputDim, argmax ? "int64" : dtypeName(self));
+    Py_buffer resultView;
+    if ( result == NULL || PyObject_GetBuffer(result, &resultView, PyBUF_C_CONTIGUOUS) < 0 )
+    {
+        Py_XDECREF(result);
+        PyBuffer_Release(&view);
+        self->busy = 0;
+        return NULL;
+    }
+
+    if ( DISPATCH(self, reserveBatch)(self, PREDICT_CHUNK) < 0 )
+    {
+        PyBuffer_Release(&resultView);
+        PyBuffer_Release(&view);
+        Py_DECREF(result);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, predictSet)(self, view.buf, format, view.itemsize, numSamples, argmax, resultView.buf);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    PyBuffer_Release(&resultView);
+    PyBuffer_Release(&view);
+    return result;
+}
+
+/**
+ * Network_evaluate
+ * ----------------
+ * Evaluates the network on a whole set in one pass. The set is fed
+ * forward in chunks as matrix-matrix products.
+ * 
+ * set: Nested Python list containing input and target output vectors of each set,
+ *      or a buffer-protocol object of shape (N, input dimension) (see train).
+ * labels: Required for buffer inputs. Either N integer class indices or an
+ *         (N, output dimension) float buffer of target output vectors.
+ * 
+ * Returns:
+ *  Dictionary with the keys
+ *   "error_rate": Fraction of misclassified samples.
+ *   "loss": Mean cross entropy with softmax, mean square error otherwise.
+ *   "confusion": (k, k) int64 NumPy array, rows are the expected and
+ *                columns the predicted classes.
+ *   "misclassified": int64 NumPy array of the indices of all misclassified samples.
+ */
+static PyObject* Network_evaluate(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *setObj;
+    PyObject *labelObj = Py_None;
+
+    static char *kwlist[] = {"set", "labels", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O|O", kwlist, &setObj, &labelObj)) return NULL;
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Dataset set;
+    if ( Dataset_fromArgs(&set, setObj, labelObj, inputDim, outputDim) < 0 ) return NULL;
+
+    if ( acquire(self) < 0 )
+    {
+        Dataset_release(&set);
+        return NULL;
+    }
+
+    long numSamples = set.numSamples;
+    long *misclassified = (long *)malloc((numSamples + 1) * sizeof(long));
+    long long *confusion = (long long *)calloc((long)outputDim * outputDim, sizeof(long long));
+
+    if ( misclassified == NULL || confusion == NULL || DISPATCH(self, reserveBatch)(self, PREDICT_CHUNK) < 0 )
+    {
+        free(misclassified);
+        free(confusion);
+        Dataset_release(&set);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+
+    long numWrong;
+    double loss;
+    long i;
+
+    Py_BEGIN_ALLOW_THREADS
+    numWrong = DISPATCH(self, evaluateSet)(self, &set, misclassified, confusion, &loss);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    Dataset_release(&set);
+
+    PyObject *confusionArray = newArray(outputDim, outputDim, "int64");
+    PyObject *misclassifiedArray = newArray(numWrong, 0, "int64");
+    PyObject *result = NULL;
+    Py_buffer view;
+
+    if ( confusionArray != NULL && misclassifiedArray != NULL
+         && PyObject_GetBuffer(confusionArray, &view, PyBUF_C_CONTIGUOUS) == 0 )
+    {
+        memcpy(view.buf, confusion, (long)outputDim * outputDim * sizeof(long long));
+        PyBuffer_Release(&view);
+
+        if ( PyObject_GetBuffer(misclassifiedArray, &view, PyBUF_C_CONTIGUOUS) == 0 )
+        {
+            for ( i = 0; i < numWrong; i++ )
+            {
+                ((long long *)view.buf)[i] = misclassified[i];
+            }
+            PyBuffer_Release(&view);
+
+            result = Py_BuildValue("{s:d,s:d,s:O,s:O}",
+                                   "error_rate", numSamples > 0 ? (double)numWrong / numSamples : 0.0,
+                                   "loss", numSamples > 0 ? loss / numSamples : 0.0,
+                                   "confusion", confusionArray,
+                                   "misclassified", misclassifiedArray);
+        }
+    }
+
+    Py_XDECREF(confusionArray);
+    Py_XDECREF(misclassifiedArray);
+    free(misclassified);
+    free(confusion);
+    return result;
+}
+
+/**
+ * Network_train
+ * -------------
+ * Trains the network using the supplied training sets.
+ * 
+ * set: Nested Python list containing input and target output vectors of each set,
+ *      or a buffer-protocol object (e.g. a NumPy array) of shape (N, input dimension)
+ *      holding float64, float32 or uint8 inputs. uint8 values are scaled to [0, 1].
+ * epochs: Number of epochs to train for.
+ * batchsize: Number of samples per weight update.
+ * eta: Learning rate used for training.
+ * labels: Required for buffer inputs. Either N integer class indices or an
+ *         (N, output dimension) float buffer of target output vectors.
+ */
+static PyObject* Network_train(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    long epochs;
+    long batchsize;
+    double eta;
+
+    PyObject *setObj;
+    PyObject *labelObj = Py_None;
+
+    static char *kwlist[] = {"set", "epochs", "batchsize", "eta", "labels", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "Olld|O", kwlist, &setObj, &epochs, &batchsize, &eta, &labelObj)) return NULL;
+
+    if ( batchsize < 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "The batch size must be at least 1!");
+        return NULL;
+    }
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Dataset set;
+    if ( Dataset_fromArgs(&set, setObj, labelObj, inputDim, outputDim) < 0 ) return NULL;
+
+    if ( acquire(self) < 0 )
+    {
+        Dataset_release(&set);
+        return NULL;
+    }
+
+    if ( DISPATCH(self, reserveBatch)(self, batchsize) < 0 )
+    {
+        Dataset_release(&set);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, trainSet)(self, &set, epochs, batchsize, eta);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    Dataset_release(&set);
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_train_batches
+ * ---------------------
+ * Trains the network on a bounded number of mini-batches, so long training
+ * runs can be split into short calls, e.g. to report progress or to stop
+ * early. Positions count the mini-batches of all epochs (see trainBatches):
+ * training with epochs * (N // batchsize) batches from position 0, in any
+ * number of calls that each start where the last one stopped, gives the
+ * same network as train.
+ * 
+ * set: Nested Python list or input buffer (see train). Buffers are used
+ *      without copying, lists are converted on every call.
+ * batchsize: Number of samples per weight update.
+ * eta: Learning rate used for training.
+ * position: Position of the first mini-batch.
+ * count: Number of mini-batches to train on.
+ * labels: Required for buffer inputs (see train).
+ * 
+ * Returns:
+ *  The position to continue from, position + count.
+ */
+static PyObject* Network_train_batches(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    long batchsize;
+    double eta;
+    long position;
+    long count;
+
+    PyObject *setObj;
+    PyObject *labelObj = Py_None;
+
+    static char *kwlist[] = {"set", "batchsize", "eta", "position", "count", "labels", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "Oldll|O", kwlist, &setObj, &batchsize, &eta, &position, &count, &labelObj)) return NULL;
+
+    if ( batchsize < 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "The batch size must be at least 1!");
+        return NULL;
+    }
+    if ( position < 0 || count < 0 )
+    {
+        PyErr_SetString(PyExc_ValueError, "The position and the number of batches can't be negative!");
+        return NULL;
+    }
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Dataset set;
+    if ( Dataset_fromArgs(&set, setObj, labelObj, inputDim, outputDim) < 0 ) return NULL;
+
+    if ( set.numSamples < batchsize )
+    {
+        Dataset_release(&set);
+        PyErr_SetString(PyExc_ValueError, "The set holds less samples than one batch!");
+        return NULL;
+    }
+
+    if ( acquire(self) < 0 )
+    {
+        Dataset_release(&set);
+        return NULL;
+    }
+
+    if ( DISPATCH(self, reserveBatch)(self, batchsize) < 0 )
+    {
+        Dataset_release(&set);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, trainBatches)(self, &set, position, count, batchsize, eta);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    Dataset_release(&set);
+
+    return PyLong_FromLong(position + count);
+}
+
+/**
+ * Network_accumulate_gradients
+ * ----------------------------
+ * Adds the error gradients of all samples in a set to the gradients of
+ * the network without changing any weight. Together with
+ * apply_gradients and the parameter/gradient accessors this allows
+ * training loops outside of the network, e.g. gradient averaging across
+ * processes.
+ * 
+ * set: Nested Python list or input buffer (see train).
+ * labels: Required for buffer inputs (see train).
+ */
+static PyObject* Network_accumulate_gradients(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *setObj;
+    PyObject *labelObj = Py_None;
+
+    static char *kwlist[] = {"set", "labels", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O|O", kwlist, &setObj, &labelObj)) return NULL;
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Dataset set;
+    if ( Dataset_fromArgs(&set, setObj, labelObj, inputDim, outputDim) < 0 ) return NULL;
+
+    if ( acquire(self) < 0 )
+    {
+        Dataset_release(&set);
+        return NULL;
+    }
+
+    if ( DISPATCH(self, reserveBatch)(self, PREDICT_CHUNK) < 0 )
+    {
+        Dataset_release(&set);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, accumulateSet)(self, &set, PREDICT_CHUNK);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    Dataset_release(&set);
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_train_step
+ * ------------------
+ * Trains the network on a single mini-batch: the gradients of all samples
+ * are accumulated as one batch and applied in one weight update. Meant
+ * for streamed mini-batches that never exist as one set in memory.
+ * 
+ * set: Nested Python list or input buffer holding the mini-batch (see train).
+ * eta: Learning rate used for training.
+ * labels: Required for buffer inputs (see train).
+ */
+static PyObject* Network_train_step(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *setObj;
+    PyObject *labelObj = Py_None;
+    double eta;
+
+    static char *kwlist[] = {"set", "eta", "labels", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "Od|O", kwlist, &setObj, &eta, &labelObj)) return NULL;
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Dataset set;
+    if ( Dataset_fromArgs(&set, setObj, labelObj, inputDim, outputDim) < 0 ) return NULL;
+
+    long batchsize = set.numSamples;
+    if ( batchsize == 0 )
+    {
+        Dataset_release(&set);
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    if ( acquire(self) < 0 )
+    {
+        Dataset_release(&set);
+        return NULL;
+    }
+
+    if ( DISPATCH(self, reserveBatch)(self, batchsize) < 0 )
+    {
+        Dataset_release(&set);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, accumulateSet)(self, &set, batchsize);
+    DISPATCH(self, applyGradients)(self, eta / batchsize);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    Dataset_release(&set);
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_apply_gradients
+ * -----------------------
+ * Subtracts the accumulated gradients times a step size from the weights
+ * and biases and resets the gradients to 0.
+ * 
+ * rate: Step size, usually the learning rate divided by the number of
+ *       accumulated samples.
+ */
+static PyObject* Network_apply_gradients(NetworkObject *self, PyObject *args)
+{
+    double rate;
+
+    if (! PyArg_ParseTuple(args, "d", &rate)) return NULL;
+
+    if ( acquire(self) < 0 ) return NULL;
+    DISPATCH(self, applyGradients)(self, rate);
+    self->busy = 0;
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * copyOut
+ * -------
+ * Copies a block of numbers into a writable buffer of the same type
+ * (float64 or float32, see dtype) and size or, if outObj is None, into
+ * a new NumPy array.
+ * 
+ * src: The block.
+ * n: Number of values in the block.
+ * outObj: Target buffer or None.
+ * 
+ * Returns:
+ *  New reference to the target or NULL with an exception set.
+ */
+PyObject* copyOut(NetworkObject *self, const void *src, long n, PyObject *outObj)
+{
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return NULL;
+    }
+
+    PyObject *result = outObj == Py_None ? newArray(n, 0, dtypeName(self)) : outObj;
+    if ( result == NULL ) return NULL;
+
+    Py_buffer view;
+    if ( PyObject_GetBuffer(result, &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0 )
+    {
+        if ( outObj == Py_None ) Py_DECREF(result);
+        return NULL;
+    }
+
+    if ( bufferFormat(&view) != realFormat(self) || view.len != n * (long)realSize(self) )
+    {
+        PyBuffer_Release(&view);
+        if ( outObj == Py_None ) Py_DECREF(result);
+        PyErr_Format(PyExc_ValueError, "Expected a %s buffer of %ld values!", dtypeName(self), n);
+        return NULL;
+    }
+
+    memcpy(view.buf, src, n * realSize(self));
+    PyBuffer_Release(&view);
+
+    if ( outObj != Py_None ) Py_INCREF(result);
+    return result;
+}
+
+/**
+ * copyIn
+ * ------
+ * Copies a buffer into a block of numbers of the same type (float64 or
+ * float32, see dtype) and size.
+ * 
+ * dst: The block.
+ * n: Number of values in the block.
+ * inObj: Source buffer.
+ * 
+ * Returns:
+ *  None or NULL with an exception set.
+ */
+PyObject* copyIn(NetworkObject *self, void *dst, long n, PyObject *inObj)
+{
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return NULL;
+    }
+
+    Py_buffer view;
+    if ( PyObject_GetBuffer(inObj, &view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0 ) return NULL;
+
+    if ( bufferFormat(&view) != realFormat(self) || view.len != n * (long)realSize(self) )
+    {
+        PyBuffer_Release(&view);
+        PyErr_Format(PyExc_ValueError, "Expected a %s buffer of %ld values!", dtypeName(self), n);
+        return NULL;
+    }
+
+    memcpy(dst, view.buf, n * realSize(self));
+    PyBuffer_Release(&view);
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_get_parameters
+ * ----------------------
+ * Returns all weights and biases as one flat vector of the networks dtype
+ * in state file order: the weight matrices of all layers (row-major, one row per origin
+ * node) followed by the biases of all layers.
+ * 
+ * out: Optional writable buffer to copy into instead of a new array.
+ */
+static PyObject* Network_get_parameters(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *outObj = Py_None;
+    static char *kwlist[] = {"out", NULL};
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "|O", kwlist, &outObj)) return NULL;
+    return copyOut(self, self->params, self->numParams, outObj);
+}
+
+/**
+ * Network_set_parameters
+ * ----------------------
+ * Sets all weights and biases from one flat buffer (see get_parameters).
+ */
+static PyObject* Network_set_parameters(NetworkObject *self, PyObject *args)
+{
+    PyObject *inObj;
+    if (! PyArg_ParseTuple(args, "O", &inObj)) return NULL;
+    return copyIn(self, self->params, self->numParams, inObj);
+}
+
+/**
+ * Network_get_gradients
+ * ---------------------
+ * Returns the accumulated gradients as one flat vector in the same order
+ * as get_parameters.
+ * 
+ * out: Optional writable buffer to copy into instead of a new array.
+ */
+static PyObject* Network_get_gradients(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *outObj = Py_None;
+    static char *kwlist[] = {"out", NULL};
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "|O", kwlist, &outObj)) return NULL;
+    return copyOut(self, self->grads, self->numParams, outObj);
+}
+
+/**
+ * Network_set_gradients
+ * ---------------------
+ * Sets the accumulated gradients from one flat buffer (see get_gradients).
+ */
+static PyObject* Network_set_gradients(NetworkObject *self, PyObject *args)
+{
+    PyObject *inObj;
+    if (! PyArg_ParseTuple(args, "O", &inObj)) return NULL;
+    return copyIn(self, self->grads, self->numParams, inObj);
+}
+
+/**
+ * Network_set_weight
+ * ------------------
+ * Manually set a single weight of the network.
+ * 
+ * l: Layer of the weights target node.
+ * j: Index of the weights target node in layer.
+ * k: Index of the weights origin node in layer.
+ * new_weight: New weight to set.
+ */
+static PyObject* Network_set_weight(NetworkObject *self, PyObject *args)
+{
+    int l;  /* to layer */
+    int j;  /* to neuron */
+    int k;  /* from neuron */
+    double new_weight;
+
+    if (! PyArg_ParseTuple(args, "iiid", &l, &j, &k, &new_weight)) return NULL;
+
+    if ( l < 1 || l > self->numLayers-1 || j < 0 || k < 0 || j > self->numNeurons[l] - 1 || k > self->numNeurons[l-1] - 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "One ore more indices are out of bounds!");
+        return NULL;
+    }
+
+    /* not while another thread reads or trains the weights */
+    if ( acquire(self) < 0 ) return NULL;
+    setReal(self, self->params, weightIndex(self, l, j, k), new_weight);
+    self->busy = 0;
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_set_bias
+ * ----------------
+ * Manually set a single bias of the network.
+ * 
+ * l: Layer of the biases node.
+ * j: Index of the biases node in layer.
+ * new_bias: New bias to set.
+ */
+static PyObject* Network_set_bias(NetworkObject *self, PyObject *args)
+{
+    int l;  /* to layer */
+    int j;  /* to neuron */
+
+    double new_bias;
+
+    if (! PyArg_ParseTuple(args, "iid", &l, &j, &new_bias)) return NULL;
+
+    if ( l < 1 || l > self->numLayers-1 || j < 0 || j > self->numNeurons[l] - 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "One ore more indices are out of bounds!");
+        return NULL;
+    }
+
+    /* not while another thread reads or trains the weights */
+    if ( acquire(self) < 0 ) return NULL;
+    setReal(self, self->params, biasIndex(self, l, j), new_bias);
+    self->busy = 0;
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_get_weight
+ * ------------------
+ * Returns the value a single weight in the network.
+ * 
+ * l: Layer of the weights target node.
+ * j: Index of the weights target node in layer.
+ * k: Index of the weights origin node in layer.
+ */
+static PyObject* Network_get_weight(NetworkObject *self, PyObject *args)
+{
+    int l;  /* to layer */
+    int j;  /* to neuron */
+    int k;  /* from neuron */
+
+    if (! PyArg_ParseTuple(args, "iii", &l, &j, &k)) return NULL;
+
+    if ( l < 1 || l > self->numLayers-1 || j < 0 || k < 0 || j > self->numNeurons[l] - 1 || k > self->numNeurons[l-1] - 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "One ore more indices are out of bounds!");
+        return NULL;
+    }
+
+    return Py_BuildValue("d", getReal(self, self->params, weightIndex(self, l, j, k)));
+}
+
+/**
+ * raiseHeaderError
+ * ----------------
+ * Raises a Python exception for the failed results of readHeader.
+ * 
+ * Returns:
+ *  result if it is STATE_OK or STATE_LEGACY, -1 with an exception set otherwise.
+ */
+int raiseHeaderError(int result)
+{
+    switch ( result )
+    {
+        case STATE_NEWER:
+            PyErr_SetString(PyExc_ValueError, "The state file was saved by a newer version of pyceptron.");
+            return -1;
+        case STATE_INVALID:
+            PyErr_SetString(PyExc_ValueError, "The header of the state file is damaged.");
+            return -1;
+        case STATE_NO_MEMORY:
+            PyErr_NoMemory();
+            return -1;
+    }
+    return result;
+}
+
+/**
+ * loadStateHeader
+ * ---------------
+ * Reads the header of a state file (see state.h) and raises a Python
+ * exception if it can't be used.
+ * 
+ * fp: The open state file.
+ * header: Filled with the header, numNeurons must be freed if STATE_OK is returned.
+ * 
+ * Returns:
+ *  STATE_OK, STATE_LEGACY for files without a header or -1 with an exception set.
+ */
+int loadStateHeader(FILE *fp, StateHeader *header)
+{
+    return raiseHeaderError(readStateHeader(fp, header));
+}
+
+/**
+ * loadQuantizedHeader
+ * -------------------
+ * Reads the header of a quantized state file like loadStateHeader.
+ * STATE_LEGACY means the file is not a quantized state.
+ */
+int loadQuantizedHeader(FILE *fp, StateHeader *header)
+{
+    return raiseHeaderError(readQuantizedHeader(fp, header));
+}
+
+/**
+ * storeParams
+ * -----------
+ * Copies parameters read from a state file into the params block,
+ * converting them to the precision and byte order of the network.
+ * 
+ * buffer: numParams numbers as stored in the file, swapped in place if necessary.
+ * dtype: struct format character of the stored numbers, 'd' or 'f'.
+ * swap: Whether the byte order of the file differs from the native one.
+ */
+void storeParams(NetworkObject *self, void *buffer, char dtype, int swap)
+{
+    size_t itemsize = dtype == 'f' ? sizeof(float) : sizeof(double);
+    long i;
+
+    if ( swap ) swapBytes(buffer, self->numParams, itemsize);
+
+    if ( itemsize == realSize(self) )
+    {
+        memcpy(self->params, buffer, self->numParams * itemsize);
+        return;
+    }
+    for ( i = 0; i < self->numParams; i++ )
+    {
+        setReal(self, self->params, i, dtype == 'f' ? ((float *)buffer)[i] : ((double *)buffer)[i]);
+    }
+}
+
+/**
+ * checkHeader
+ * -----------
+ * Raises a ValueError telling what differs if a state file holds
+ * another network than the one described by the other arguments.
+ * 
+ * header: Header of the state file.
+ * numLayers, numNeurons, activationName, softmax: The network.
+ * 
+ * Returns:
+ *  0 if the file fits the network, -1 otherwise.
+ */
+int checkHeader(const StateHeader *header, int numLayers, const int *numNeurons, const char *activationName, int softmax)
+{
+    if ( header->numLayers != numLayers
+         || memcmp(header->numNeurons, numNeurons, numLayers * sizeof(int)) != 0 )
+    {
+        PyObject *saved = architectureList(header->numNeurons, header->numLayers);
+        PyObject *own = architectureList(numNeurons, numLayers);
+        if ( saved != NULL && own != NULL )
+        {
+            PyErr_Format(PyExc_ValueError, "The state file holds a %R network, not %R.", saved, own);
+        }
+        Py_XDECREF(saved);
+        Py_XDECREF(own);
+        return -1;
+    }
+
+    if ( strcmp(header->activation, activationName) != 0 )
+    {
+        PyErr_Format(PyExc_ValueError, "The state file holds a network with %s activation, not %s.",
+                     header->activation, activationName);
+        return -1;
+    }
+
+    if ( (header->softmax != 0) != (softmax != 0) )
+    {
+        PyErr_Format(PyExc_ValueError, "The state file holds a network %s softmax.",
+                     header->softmax ? "with" : "without");
+        return -1;
+    }
+
+    return 0;
+}
+
+/**
+ * Network_save_state
+ * ------------------
+ * Saves all biases and weights of the network to a file a the supplied location.
+ * The file starts with a header describing the network (see state.h), the
+ * numbers are written in the precision of the network, so the file of a
+ * float32 network is half the size of the file of a float64 network.
+ * 
+ * filePath: path to the file to which to save to
+ */
+static PyObject* Network_save_state(NetworkObject *self, PyObject *args)
+{
+    char *filePath;
+
+    if (!PyArg_ParseTuple(args, "s", &filePath)) return NULL;
+
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return NULL;
+    }
+
+    StateHeader header = {0};
+    header.dtype = realFormat(self);
+    header.softmax = self->softmax;
+    strncpy(header.activation, self->activationName, ACTIVATION_NAME_SIZE);
+    header.checksum = checksum32(0, self->params, self->numParams * realSize(self));
+    header.numLayers = self->numLayers;
+    header.numNeurons = self->numNeurons;
+
+    FILE *fp = fopen(filePath, "wb");
+    if ( fp == NULL ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+
+    /* params holds all weight matrices followed by all biases, which is the file order */
+    int ok = writeStateHeader(fp, &header) == 0
+          && fwrite(self->params, realSize(self), self->numParams, fp) == (size_t)self->numParams;
+    
+    if ( fclose(fp) != 0 || !ok )
+    {
+        return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+    }
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
+/**
+ * Network_load_state
+ * ------------------
+ * Tries to read weights and biases from a file at the supplied location and
+ * applies them to the network. The architecture, activation function and
+ * softmax flag in the header of the file must match the network and the
+ * checksum must match the parameters, otherwise a ValueError is raised and
+ * the network is left unchanged. The numbers are converted to the precision
+ * and byte order of the network if necessary.
+ * Older files without a header are checked only by their size, which tells
+ * whether they hold float64 or float32 numbers.
+ * 
+ * filePath: path to the file to which to save to
+ * mmap: Whether to map the file into memory instead of reading it. The
+ *       pages are shared by all processes mapping the same file until the
+ *       network changes them (e.g. by training), which copies only the
+ *       changed pages, the file itself is never written. The file must
+ *       hold the precision and byte order of the network.
+ */
+static PyObject* Network_load_state(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"path", "mmap", NULL};
+
+    char *filePath;
+    int map = 0;
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "s|p", kwlist, &filePath, &map )) return NULL;
+
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return NULL;
+    }
+
+    FILE *fp = fopen(filePath, "rb");
+    if ( fp == NULL ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+
+    long fileSize = 0;
+    fseek(fp, 0L, SEEK_END);
+    fileSize = ftell(fp);
+    rewind(fp);
+
+    StateHeader header;
+    int hasHeader = loadStateHeader(fp, &header);
+    if ( hasHeader < 0 )
+    {
+        fclose(fp);
+        return NULL;
+    }
+
+    char dtype;
+    int swap = 0;
+    long offset = 0;
+    if ( hasHeader )
+    {
+        int fits = checkHeader(&header, self->numLayers, self->numNeurons, self->activationName, self->softmax) == 0;
+        free(header.numNeurons);
+        if ( !fits )
+        {
+            fclose(fp);
+            return NULL;
+        }
+
+        dtype = header.dtype;
+        swap = header.byteOrder != nativeByteOrder();
+        offset = header.headerSize;
+    }
+    else
+    {
+        /* an older file, only the size tells the precision */
+        dtype = fileSize == self->numParams * (long)sizeof(float) ? 'f' : 'd';
+    }
+
+    size_t itemsize = dtype == 'f' ? sizeof(float) : sizeof(double);
+    long paramsSize = self->numParams * (long)itemsize;
+    if ( fileSize - offset != paramsSize )
+    {
+        fclose(fp);
+        PyErr_SetString(PyExc_ValueError, "The file size doesn't match the expected value for this network.");
+        return NULL;       
+    }
+
+    /* the parameters are read into a new block (or mapped) and only
+       replace the old ones if they are valid */
+    void *block;
+    void *mapping = NULL;
+    if ( map )
+    {
+        if ( dtype != realFormat(self) || swap )
+        {
+            fclose(fp);
+            PyErr_SetString(PyExc_ValueError, "Only files of the network's precision and byte order can be mapped.");
+            return NULL;
+        }
+
+#ifdef _WIN32
+        fclose(fp);
+        PyErr_SetString(PyExc_NotImplementedError, "Memory-mapped states are not supported on Windows.");
+        return NULL;
+#else
+        mapping = mmap(NULL, fileSize, PROT_READ | PROT_WRITE, MAP_PRIVATE, fileno(fp), 0);
+        fclose(fp);
+        if ( mapping == MAP_FAILED ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+        block = (char *)mapping + offset;
+#endif
+    }
+    else
+    {
+        block = malloc(paramsSize);
+        if ( block == NULL )
+        {
+            fclose(fp);
+            return PyErr_NoMemory();
+        }
+
+        long read = fread(block, 1, paramsSize, fp);
+        fclose(fp);
+
+        if ( read != paramsSize )
+        {
+            free(block);
+            return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+        }
+    }
+
+    if ( hasHeader && checksum32(0, block, paramsSize) != header.checksum )
+    {
+        releaseParams(block, mapping, fileSize);
+        PyErr_SetString(PyExc_ValueError, "The checksum of the state file doesn't match, the file is damaged.");
+        return NULL;
+    }
+
+    if ( mapping != NULL || (dtype == realFormat(self) && !swap) )
+    {
+        /* use the block as it is */
+        releaseParams(self->params, self->mapping, self->mappingSize);
+        self->params = block;
+        self->mapping = mapping;
+        self->mappingSize = mapping != NULL ? (size_t)fileSize : 0;
+        DISPATCH(self, pointParams)(self);
+    }
+    else
+    {
+        if ( self->mapping != NULL )
+        {
+            void *own = malloc(self->numParams * realSize(self));
+            if ( own == NULL )
+            {
+                free(block);
+                return PyErr_NoMemory();
+            }
+            releaseParams(self->params, self->mapping, self->mappingSize);
+            self->params = own;
+            self->mapping = NULL;
+            self->mappingSize = 0;
+            DISPATCH(self, pointParams)(self);
+        }
+        storeParams(self, block, dtype, swap);
+        free(block);
+    }
+
+    Py_INCREF(Py_None);
+    return Py_None;    
+}
+
+
+static PyTypeObject QuantizedNetworkType;
+
+/**
+ * QuantizedNetwork_initialize
+ * ---------------------------
+ * Allocates the weight and scale blocks of a quantized network and points
+ * every layer into them. Expects numLayers and numNeurons to be set.
+ * 
+ * self: Pointer to the quantized network Python object.
+ * 
+ * Returns:
+ *  0 on success, -1 if the memory could not be allocated.
+ */
+int QuantizedNetwork_initialize(QuantizedNetworkObject *self)
+{
+    long numWeights = 0;
+    long numNodes = 0;
+    int l;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        numWeights += (long)self->numNeurons[l] * self->numNeurons[l-1];
+        numNodes += self->numNeurons[l];
+    }
+    self->numParams = numWeights + numNodes;
+
+    QuantizedLayer *layers = (QuantizedLayer *)calloc(self->numLayers, sizeof(QuantizedLayer));
+    self->layers = layers;
+    self->weights = (signed char *)calloc(numWeights, sizeof(signed char));
+    self->scales = (float *)calloc(3 * numNodes, sizeof(float));
+    self->outputScales = (float *)calloc(self->numLayers, sizeof(float));
+    self->outputLows = (int *)calloc(self->numLayers, sizeof(int));
+
+    if ( layers == NULL || self->weights == NULL || self->scales == NULL || self->outputScales == NULL || self->outputLows == NULL )
+    {
+        return -1;
+    }
+
+    signed char *w = self->weights;
+    float *scale = self->scales;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        layers[l].w = w;
+        layers[l].scale = scale;
+        layers[l].b = scale + numNodes;
+        layers[l].rowScale = scale + 2 * numNodes;
+        w += (long)self->numNeurons[l] * self->numNeurons[l-1];
+        scale += self->numNeurons[l];
+    }
+
+    for ( l = 0; l < self->numLayers; l++ )
+    {
+        self->outputScales[l] = 1.f;
+    }
+
+    return 0;
+}
+
+/**
+ * QuantizedNetwork_updateRowScales
+ * --------------------------------
+ * Recomputes the row scales of every layer from the weight scales and the
+ * output scales of the previous layer.
+ */
+void QuantizedNetwork_updateRowScales(QuantizedNetworkObject *self)
+{
+    QuantizedLayer *layers = self->layers;
+    int l, j;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        for ( j = 0; j < self->numNeurons[l]; j++ )
+        {
+            layers[l].rowScale[j] = layers[l].scale[j] * self->outputScales[l-1];
+        }
+    }
+}
+
+/**
+ * Network_quantize
+ * ----------------
+ * Creates an int8 quantized copy of the network for inference. The
+ * weights get one scale per node (or one per layer), the outputs of every
+ * layer one scale chosen so that the largest output of the calibration
+ * set fits. Outputs that are never negative (e.g. of ReLU and sigmoid
+ * layers) use the range 0 to 255, others -127 to 127.
+ * 
+ * calibration: Buffer-protocol object of shape (N, input dimension), a
+ *              sample of the training set (see predict_batch).
+ * per_row: Whether every node gets its own weight scale.
+ * 
+ * Returns:
+ *  A pyceptron.QuantizedNetwork.
+ */
+static PyObject* Network_quantize(NetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *inputObj;
+    int perRow = 1;
+
+    static char *kwlist[] = {"calibration", "per_row", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O|p", kwlist, &inputObj, &perRow)) return NULL;
+
+    Py_buffer view;
+    long numSamples;
+    char format = getMatrix(inputObj, &view, self->numNeurons[0], &numSamples);
+    if ( format == 0 ) return NULL;
+
+    if ( numSamples == 0 )
+    {
+        PyBuffer_Release(&view);
+        PyErr_SetString(PyExc_ValueError, "The calibration set is empty!");
+        return NULL;
+    }
+
+    if ( acquire(self) < 0 )
+    {
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+
+    double *minima = (double *)malloc(2 * self->numLayers * sizeof(double));
+    if ( minima == NULL || DISPATCH(self, reserveBatch)(self, PREDICT_CHUNK) < 0 )
+    {
+        free(minima);
+        PyBuffer_Release(&view);
+        self->busy = 0;
+        return PyErr_NoMemory();
+    }
+    double *maxima = minima + self->numLayers;
+
+    Py_BEGIN_ALLOW_THREADS
+    DISPATCH(self, calibrateSet)(self, view.buf, format, view.itemsize, numSamples, minima, maxima);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+    PyBuffer_Release(&view);
+
+    QuantizedNetworkObject *quantized = (QuantizedNetworkObject *)QuantizedNetworkType.tp_alloc(&QuantizedNetworkType, 0);
+    if ( quantized == NULL )
+    {
+        free(minima);
+        return NULL;
+    }
+
+    quantized->numLayers = self->numLayers;
+    quantized->numNeurons = (int *)malloc(self->numLayers * sizeof(int));
+    if ( quantized->numNeurons == NULL )
+    {
+        free(minima);
+        Py_DECREF(quantized);
+        return PyErr_NoMemory();
+    }
+    memcpy(quantized->numNeurons, self->numNeurons, self->numLayers * sizeof(int));
+
+    if ( QuantizedNetwork_initialize(quantized) < 0 )
+    {
+        free(minima);
+        Py_DECREF(quantized);
+        return PyErr_NoMemory();
+    }
+
+    quantized->activationFunc32 = findActivation(self->activationName)->func32;
+    quantized->activationName = self->activationName;
+    quantized->softmax = self->softmax;
+    quantized->numThreads = self->numThreads;
+
+    int l, j, k;
+    for ( l = 0; l < self->numLayers-1; l++ )
+    {
+        double range = maxima[l] > -minima[l] ? maxima[l] : -minima[l];
+        quantized->outputLows[l] = minima[l] < 0 ? -127 : 0;
+        quantized->outputScales[l] = range > 0 ? (float)(range / (minima[l] < 0 ? 127 : 255)) : 1.f;
+    }
+    free(minima);
+
+    QuantizedLayer *layers = quantized->layers;
+    for ( l = 1; l < self->numLayers; l++ )
+    {
+        int N = self->numNeurons[l];
+        int K = self->numNeurons[l-1];
+        long first = weightIndex(self, l, 0, 0);
+        long bias = biasIndex(self, l, 0);
+        double layerMax = 0.0;
+
+        for ( j = 0; j < N; j++ )
+        {
+            double rowMax = 0.0;
+            for ( k = 0; k < K; k++ )
+            {
+                double w = fabs(getReal(self, self->params, first + (long)k * N + j));
+                rowMax = w > rowMax ? w : rowMax;
+            }
+            layers[l].scale[j] = rowMax > 0 ? (float)(rowMax / 127) : 1.f;
+            layerMax = rowMax > layerMax ? rowMax : layerMax;
+            layers[l].b[j] = (float)getReal(self, self->params, bias + j);
+        }
+
+        for ( j = 0; j < N; j++ )
+        {
+            if ( !perRow ) layers[l].scale[j] = layerMax > 0 ? (float)(layerMax / 127) : 1.f;
+
+            /* one row per node, unlike the params block */
+            signed char *row = layers[l].w + (long)j * K;
+            for ( k = 0; k < K; k++ )
+            {
+                double q = getReal(self, self->params, first + (long)k * N + j) / layers[l].scale[j];
+                q = q > 127 ? 127 : (q < -127 ? -127 : q);
+                row[k] = (signed char)lround(q);
+            }
+        }
+    }
+    QuantizedNetwork_updateRowScales(quantized);
+
+    return (PyObject *)quantized;
+}
+
+/**
+ * Network_methods
+ * ---------------
+ * Python method definitions that will be exposed by the Python network object.
+ */
+static PyMethodDef Network_methods[] = {
+    {"predict", (PyCFunction)Network_predict, METH_VARARGS,
+     "Forward feed prediction."
+    },
+    {"predict_batch", (PyCFunction)Network_predict_batch, METH_VARARGS | METH_KEYWORDS,
+     "Forward feed prediction of a whole set of input vectors."
+    },
+    {"evaluate", (PyCFunction)Network_evaluate, METH_VARARGS | METH_KEYWORDS,
+     "Error rate, loss, confusion matrix and misclassified samples of a set."
+    },
+    {"train", (PyCFunction)Network_train, METH_VARARGS | METH_KEYWORDS,
+     "Train the network."
+    },
+    {"train_batches", (PyCFunction)Network_train_batches, METH_VARARGS | METH_KEYWORDS,
+     "Train the network on a number of mini-batches, resuming at a position."
+    },
+    {"accumulate_gradients", (PyCFunction)Network_accumulate_gradients, METH_VARARGS | METH_KEYWORDS,
+     "Add the gradients of a set without updating the weights."
+    },
+    {"train_step", (PyCFunction)Network_train_step, METH_VARARGS | METH_KEYWORDS,
+     "Train the network on a single mini-batch."
+    },
+    {"apply_gradients", (PyCFunction)Network_apply_gradients, METH_VARARGS,
+     "Apply and reset the accumulated gradients."
+    },
+    {"get_parameters", (PyCFunction)Network_get_parameters, METH_VARARGS | METH_KEYWORDS,
+     "Get all weights and biases as a flat vector."
+    },
+    {"set_parameters", (PyCFunction)Network_set_parameters, METH_VARARGS,
+     "Set all weights and biases from a flat vector."
+    },
+    {"get_gradients", (PyCFunction)Network_get_gradients, METH_VARARGS | METH_KEYWORDS,
+     "Get the accumulated gradients as a flat vector."
+    },
+    {"set_gradients", (PyCFunction)Network_set_gradients, METH_VARARGS,
+     "Set the accumulated gradients from a flat vector."
+    },
+    {
+    "set_weight", (PyCFunction)Network_set_weight, METH_VARARGS,
+    "Set a weight manually."
+    },
+    {
+    "set_bias",(PyCFunction)Network_set_bias, METH_VARARGS,
+    "Set a bias manually."
+    },
+    {
+    "get_weight", (PyCFunction)Network_get_weight, METH_VARARGS,
+    "Get a single weight."
+    },
+    {"save_state", (PyCFunction)Network_save_state, METH_VARARGS,
+    "Saves the current weights and biases to disk."
+    },
+    {
+    "load_state", (PyCFunction)Network_load_state, METH_VARARGS | METH_KEYWORDS,
+    "Loads weights and biases from disk."
+    },
+    {"quantize", (PyCFunction)Network_quantize, METH_VARARGS | METH_KEYWORDS,
+     "Create an int8 quantized copy of the network for inference."
+    },
+    {NULL}  /* Sentinel */
+};
+
+/**
+ * Network_get_architecture
+ * ------------------------
+ * Returns the number of neurons in each layer as a Python list.
+ */
+static PyObject* Network_get_architecture(NetworkObject *self, void *closure)
+{
+    return architectureList(self->numNeurons, self->numLayers);
+}
+
+/**
+ * Network_get_activation
+ * ----------------------
+ * Returns the name of the activation function.
+ */
+static PyObject* Network_get_activation(NetworkObject *self, void *closure)
+{
+    return PyUnicode_FromString(self->activationName);
+}
+
+/**
+ * Network_get_dtype
+ * -----------------
+ * Returns the type of the parameters and activations.
+ */
+static PyObject* Network_get_dtype(NetworkObject *self, void *closure)
+{
+    return PyUnicode_FromString(dtypeName(self));
+}
+
+/**
+ * Network_get_mapped
+ * ------------------
+ * Returns whether the parameters lie in a memory-mapped state file.
+ */
+static PyObject* Network_get_mapped(NetworkObject *self, void *closure)
+{
+    return PyBool_FromLong(self->mapping != NULL);
+}
+
+/**
+ * Network_getset
+ * --------------
+ * Read-only Python attributes computed from the network.
+ */
+static PyGetSetDef Network_getset[] = {
+    {"architecture", (getter)Network_get_architecture, NULL,
+     "Number of neurons in each layer.", NULL
+    },
+    {"activation", (getter)Network_get_activation, NULL,
+     "Name of the activation function.", NULL
+    },
+    {"dtype", (getter)Network_get_dtype, NULL,
+     "Type of the parameters and activations, \"float64\" or \"float32\".", NULL
+    },
+    {"mapped", (getter)Network_get_mapped, NULL,
+     "Whether the parameters lie in a memory-mapped state file.", NULL
+    },
+    {NULL}  /* Sentinel */
+};
+
+/**
+ * Network_members
+ * ---------------
+ * Python attributes exposed by the Python network object.
+ */
+static PyMemberDef Network_members[] = {
+    {"threads", T_INT, offsetof(NetworkObject, numThreads), 0,
+     "Number of threads used for mini-batches."
+    },
+    {"softmax", T_INT, offsetof(NetworkObject, softmax), READONLY,
+     "Whether softmax is applied to the output layer."
+    },
+    {"num_parameters", T_LONG, offsetof(NetworkObject, numParams), READONLY,
+     "Total number of weights and biases."
+    },
+    {NULL}  /* Sentinel */
+};
+
+/**
+ * NetworkType
+ * -----------
+ * Python type definition for NetworkObject.
+ */
+static PyTypeObject NetworkType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    .tp_name = "pyceptron.Network",
+    .tp_doc = "Perceptron for Python.",
+    .tp_basicsize = sizeof(NetworkObject),
+    .tp_itemsize = 0,
+    .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
+    .tp_new = (newfunc)Network_new,
+    .tp_dealloc = (destructor)Network_dealloc,
+    .tp_methods = Network_methods,
+    .tp_members = Network_members,
+    .tp_getset = Network_getset,
+};
+
+/**
+ * acquireQuantized
+ * ----------------
+ * Marks a quantized network as busy before a method releases the GIL (see acquire).
+ */
+int acquireQuantized(QuantizedNetworkObject *self)
+{
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return -1;
+    }
+
+    if ( self->numThreads < 1 ) self->numThreads = 1;
+    self->busy = 1;
+    return 0;
+}
+
+/**
+ * QuantizedNetwork_dealloc
+ * ------------------------
+ * Frees all memory held by the quantized network.
+ */
+static void QuantizedNetwork_dealloc(QuantizedNetworkObject *self)
+{
+    free(self->layers);
+    free(self->numNeurons);
+    free(self->weights);
+    free(self->scales);
+    free(self->outputScales);
+    free(self->outputLows);
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+/**
+ * QuantizedNetwork_new
+ * --------------------
+ * Creates an empty quantized network, to be filled by load_state. Use
+ * Network.quantize to quantize a trained network.
+ * 
+ * architecture: Python list the length of the layer number containing the number of nodes in each layer.
+ * activation: Name of the activation function (see Network).
+ * softmax: Whether to apply softmax to the output layer.
+ * threads: Number of threads used for predict_batch.
+ * 
+ * Returns:
+ *  Python object representing the quantized network.
+ */
+static PyObject* QuantizedNetwork_new(PyTypeObject *type, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"architecture", "activation", "softmax", "threads", NULL};
+
+    PyObject * listObj;
+    char * actString = "sigmoid";
+    int softmax = 0;
+    int threads = 1;
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O!|sii", kwlist, &PyList_Type, &listObj, &actString, &softmax, &threads )) return NULL;
+
+    if ( threads < 1 )
+    {
+        PyErr_SetString(PyExc_ValueError, "The number of threads must be at least 1!");
+        return NULL;
+    }
+
+    const Activation *activation = findActivation(actString);
+    if ( activation == NULL ) return NULL;
+
+    QuantizedNetworkObject *self;
+    self = (QuantizedNetworkObject *) type->tp_alloc(type, 0);
+    if ( self == NULL ) return NULL;
+
+    self->activationFunc32 = activation->func32;
+    self->activationName = activation->name;
+    self->softmax = softmax;
+    self->numThreads = threads;
+
+    self->numLayers = readArchitecture(listObj, &self->numNeurons);
+    if ( self->numLayers < 0 )
+    {
+        Py_DECREF(self);
+        return NULL;
+    }
+
+    if ( QuantizedNetwork_initialize(self) < 0 )
+    {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+
+    return (PyObject *) self;
+}
+
+/**
+ * QuantizedNetwork_predict
+ * ------------------------
+ * Makes a single prediction.
+ * 
+ * inputObj: Input vector as Python list or as a buffer-protocol object
+ *           (see Network.predict).
+ * 
+ * Returns:
+ *  Output vector as Python list.
+ */
+static PyObject* QuantizedNetwork_predict(QuantizedNetworkObject *self, PyObject *args)
+{
+    PyObject *inputObj;
+    if (! PyArg_ParseTuple( args, "O", &inputObj)) return NULL;
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+    float *input = (float *)malloc((inputDim + outputDim) * sizeof(float));
+    if ( input == NULL ) return PyErr_NoMemory();
+    float *output = input + inputDim;
+
+    if ( PyList_Check(inputObj) )
+    {
+        if ( PyList_Size(inputObj) != inputDim )
+        {
+            PyErr_SetString(PyExc_ValueError, "Input dimension must match the input layers dimension!");
+        }
+        else
+        {
+            int i;
+            for ( i = 0; i < inputDim; i++ )
+            {
+                input[i] = (float)PyFloat_AsDouble(PyList_GET_ITEM(inputObj, i));
+            }
+        }
+    }
+    else
     {
-        PyErr_SetString(PyExc_ValueError, "One ore more indices are out of bounds!");
+        Py_buffer view;
+        long rows;
+        char format = getMatrix(inputObj, &view, inputDim, &rows);
+
+        if ( format != 0 && rows != 1 )
+        {
+            PyBuffer_Release(&view);
+            PyErr_SetString(PyExc_ValueError, "predict() takes a single input vector!");
+        }
+        else if ( format != 0 )
+        {
+            readVector32(view.buf, format, inputDim, input);
+            PyBuffer_Release(&view);
+        }
+    }
+
+    if ( PyErr_Occurred() || acquireQuantized(self) < 0 )
+    {
+        free(input);
         return NULL;
     }
 
-    return Py_BuildValue("d", self->layers[l].nodes[j].w[k]);
+    int status;
+    Py_BEGIN_ALLOW_THREADS
+    status = predictQuantizedSet(self, (const char *)input, 'f', sizeof(float), 1, 0, output);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    PyObject* outputList = status < 0 ? PyErr_NoMemory() : PyList_New(outputDim);
+    if ( outputList != NULL )
+    {
+        int j;
+        for ( j = 0; j < outputDim; j++ )
+        {
+            PyList_SET_ITEM(outputList, j, PyFloat_FromDouble(output[j]));
+        }
+    }
+
+    free(input);
+    return outputList;
 }
 
 /**
- * Network_save_state
- * ------------------
- * Saves all biases and weights of the network to a file a the supplied location.
+ * QuantizedNetwork_predict_batch
+ * ------------------------------
+ * Makes predictions for a whole set of input vectors at once.
+ * 
+ * inputObj: Buffer-protocol object of shape (N, input dimension) (see
+ *           Network.predict_batch).
+ * argmax: If true, only the index of the largest output of each sample
+ *         is returned.
+ * 
+ * Returns:
+ *  (N, output dimension) float32 NumPy array of output vectors or, with
+ *  argmax, an (N,) int64 NumPy array of class indices.
+ */
+static PyObject* QuantizedNetwork_predict_batch(QuantizedNetworkObject *self, PyObject *args, PyObject *kwargs)
+{
+    PyObject *inputObj;
+    int argmax = 0;
+
+    static char *kwlist[] = {"inputs", "argmax", NULL};
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "O|p", kwlist, &inputObj, &argmax)) return NULL;
+
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+
+    Py_buffer view;
+    long numSamples;
+    char format = getMatrix(inputObj, &view, inputDim, &numSamples);
+    if ( format == 0 ) return NULL;
+
+    if ( acquireQuantized(self) < 0 )
+    {
+        PyBuffer_Release(&view);
+        return NULL;
+    }
+
+    PyObject *result = newArray(numSamples, argmax ? 0 : outputDim, argmax ? "int64" : "float32");
+    Py_buffer resultView;
+    if ( result == NULL || PyObject_GetBuffer(result, &resultView, PyBUF_C_CONTIGUOUS) < 0 )
+    {
+        Py_XDECREF(result);
+        PyBuffer_Release(&view);
+        self->busy = 0;
+        return NULL;
+    }
+
+    int status;
+    Py_BEGIN_ALLOW_THREADS
+    status = predictQuantizedSet(self, view.buf, format, view.itemsize, numSamples, argmax, resultView.buf);
+    Py_END_ALLOW_THREADS
+    self->busy = 0;
+
+    PyBuffer_Release(&resultView);
+    PyBuffer_Release(&view);
+
+    if ( status < 0 )
+    {
+        Py_DECREF(result);
+        return PyErr_NoMemory();
+    }
+    return result;
+}
+
+/**
+ * QuantizedNetwork_payloadSizes
+ * -----------------------------
+ * Sizes in bytes of the parts of a quantized state file after the header:
+ * output scales, output lows, weight scales and biases, weights.
+ */
+void QuantizedNetwork_payloadSizes(const QuantizedNetworkObject *self, size_t sizes[4])
+{
+    long numNodes = 0;
+    int l;
+    for ( l = 1; l < self->numLayers; l++ ) numNodes += self->numNeurons[l];
+
+    sizes[0] = (self->numLayers - 1) * sizeof(float);
+    sizes[1] = (self->numLayers - 1) * sizeof(int);
+    sizes[2] = 2 * numNodes * sizeof(float);
+    sizes[3] = self->numParams - numNodes;
+}
+
+/**
+ * QuantizedNetwork_save_state
+ * ---------------------------
+ * Saves the quantized network to a file. The file starts with the header
+ * of state files (see state.h) with the magic "PCQ8", followed by the
+ * output scales, the weight scales and biases as float32 and the int8
+ * weights, all in native byte order.
  * 
  * filePath: path to the file to which to save to
  */
-static PyObject* Network_save_state(NetworkObject *self, PyObject *args)
+static PyObject* QuantizedNetwork_save_state(QuantizedNetworkObject *self, PyObject *args)
 {
     char *filePath;
 
     if (!PyArg_ParseTuple(args, "s", &filePath)) return NULL;
 
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return NULL;
+    }
+
+    size_t sizes[4];
+    QuantizedNetwork_payloadSizes(self, sizes);
+    const void *parts[4] = {self->outputScales, self->outputLows, self->scales, self->weights};
+
+    StateHeader header = {0};
+    header.dtype = 'b';
+    header.softmax = self->softmax;
+    strncpy(header.activation, self->activationName, ACTIVATION_NAME_SIZE);
+    header.numLayers = self->numLayers;
+    header.numNeurons = self->numNeurons;
+
+    int i;
+    for ( i = 0; i < 4; i++ )
+    {
+        header.checksum = checksum32(header.checksum, parts[i], sizes[i]);
+    }
+
     FILE *fp = fopen(filePath, "wb");
+    if ( fp == NULL ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
 
-    int l;
-    int j;
-    int k;
-    for ( l = 1; l < self->numLayers; l++ )
+    int ok = writeHeader(fp, QUANTIZED_MAGIC, &header) == 0;
+    for ( i = 0; i < 4 && ok; i++ )
     {
-        for ( j = 0; j < self->numNeurons[l-1]; j++ )
-        {
-            for ( k = 0; k < self->numNeurons[l]; k++ )
-            {
-                fwrite(&self->layers[l].nodes[k].w[j], sizeof(double), 1, fp);
-            }
-        }
+        ok = fwrite(parts[i], 1, sizes[i], fp) == sizes[i];
     }
 
-    for ( l = 1; l < self->numLayers; l++ )
+    if ( fclose(fp) != 0 || !ok )
     {
-        for ( j = 0; j < self->numNeurons[l]; j++ )
-        {
-            fwrite(&self->layers[l].nodes[j].b, sizeof(double), 1, fp);
-        }
+        return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
     }
-    
-    fclose(fp);
 
     Py_INCREF(Py_None);
     return Py_None;
 }
 
 /**
- * Network_load_state
- * ------------------
- * Tries to read weights and biases from a file at the supplied location and
- * applies them to the network. Checks only whether the file you're trying
- * to load has the correct size so make sure you're using the correct file.
+ * QuantizedNetwork_load_state
+ * ---------------------------
+ * Reads a quantized network saved by save_state. The architecture,
+ * activation function and softmax flag of the file must match the network,
+ * the checksum must match the payload and the scales must be valid,
+ * otherwise a ValueError is raised and the network is left unchanged.
+ * Files of the other byte order are converted.
  * 
- * filePath: path to the file to which to save to
+ * filePath: path to the file to load
  */
-static PyObject* Network_load_state(NetworkObject *self, PyObject *args)
+static PyObject* QuantizedNetwork_load_state(QuantizedNetworkObject *self, PyObject *args)
 {
     char *filePath;
 
     if (!PyArg_ParseTuple(args, "s", &filePath)) return NULL;
 
+    if ( self->busy )
+    {
+        PyErr_SetString(PyExc_RuntimeError, "The network is busy in another thread!");
+        return NULL;
+    }
+
     FILE *fp = fopen(filePath, "rb");
+    if ( fp == NULL ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
 
-    int l;
-    int j;
-    int k;
+    StateHeader header;
+    int hasHeader = loadQuantizedHeader(fp, &header);
+    if ( hasHeader < 0 )
+    {
+        fclose(fp);
+        return NULL;
+    }
+    if ( hasHeader == STATE_LEGACY )
+    {
+        fclose(fp);
+        PyErr_SetString(PyExc_ValueError, "The file is not a quantized state.");
+        return NULL;
+    }
 
-    long exptectedFileSize = 0;
+    int fits = checkHeader(&header, self->numLayers, self->numNeurons, self->activationName, self->softmax) == 0;
+    free(header.numNeurons);
+    if ( !fits )
+    {
+        fclose(fp);
+        return NULL;
+    }
 
-    for ( l = 1; l < self->numLayers; l++ )
+    /* read everything first, so a damaged file leaves the network as it was */
+    size_t sizes[4];
+    QuantizedNetwork_payloadSizes(self, sizes);
+    size_t payloadSize = sizes[0] + sizes[1] + sizes[2] + sizes[3];
+    char *buffer = (char *)malloc(payloadSize);
+    if ( buffer == NULL )
     {
-        exptectedFileSize += self->numNeurons[l]; /* number of biases */
-        exptectedFileSize += self->numNeurons[l] * self->numNeurons[l-1] ;/* number of weights */
+        fclose(fp);
+        return PyErr_NoMemory();
     }
-    exptectedFileSize *= sizeof(double);
 
-    long fileSize = 0;
-    fseek(fp, 0L, SEEK_END);
-    fileSize = ftell(fp);
-    rewind(fp);
+    int ok = fread(buffer, 1, payloadSize, fp) == payloadSize && fgetc(fp) == EOF;
+    fclose(fp);
 
-    if ( fileSize != exptectedFileSize )
+    if ( !ok )
     {
+        free(buffer);
         PyErr_SetString(PyExc_ValueError, "The file size doesn't match the expected value for this network.");
-        return NULL;       
+        return NULL;
     }
 
-    for ( l = 1; l < self->numLayers; l++ )
+    if ( checksum32(0, buffer, payloadSize) != header.checksum )
     {
-        for ( j = 0; j < self->numNeurons[l-1]; j++ )
-        {
-            for ( k = 0; k < self->numNeurons[l]; k++ )
-            {
-                fread(&self->layers[l].nodes[k].w[j], sizeof(double), 1, fp);
-            }
-        }
+        free(buffer);
+        PyErr_SetString(PyExc_ValueError, "The checksum of the state file doesn't match, the file is damaged.");
+        return NULL;
     }
 
-    for ( l = 1; l < self->numLayers; l++ )
+    /* all numbers but the int8 weights are 4 bytes wide */
+    if ( header.byteOrder != nativeByteOrder() ) swapBytes(buffer, (sizes[0] + sizes[1] + sizes[2]) / 4, 4);
+
+    long numNodes = sizes[2] / (2 * sizeof(float));
+    const float *outputScales = (const float *)buffer;
+    const int *outputLows = (const int *)(buffer + sizes[0]);
+    const float *scales = (const float *)(buffer + sizes[0] + sizes[1]);
+    long i;
+    for ( i = 0; i < self->numLayers - 1 && ok; i++ )
     {
-        for ( j = 0; j < self->numNeurons[l]; j++ )
-        {
-            fread(&self->layers[l].nodes[j].b, sizeof(double), 1, fp);
-        }
+        ok = (outputLows[i] == -127 || outputLows[i] == 0) && isfinite(outputScales[i]) && outputScales[i] > 0;
+    }
+    for ( i = 0; i < 2 * numNodes && ok; i++ )
+    {
+        /* weight scales, then biases */
+        ok = isfinite(scales[i]) && (i >= numNodes || scales[i] > 0);
+    }
+    if ( !ok )
+    {
+        free(buffer);
+        PyErr_SetString(PyExc_ValueError, "The state file holds invalid scales or biases.");
+        return NULL;
     }
-    
-    fclose(fp);
+
+    memcpy(self->outputScales, buffer, sizes[0]);
+    memcpy(self->outputLows, buffer + sizes[0], sizes[1]);
+    memcpy(self->scales, buffer + sizes[0] + sizes[1], sizes[2]);
+    memcpy(self->weights, buffer + sizes[0] + sizes[1] + sizes[2], sizes[3]);
+    free(buffer);
+
+    QuantizedNetwork_updateRowScales(self);
 
     Py_INCREF(Py_None);
-    return Py_None;    
+    return Py_None;
 }
 
-
 /**
- * Network_methods
- * ---------------
- * Python method definitions that will be exposed by the Python network object.
+ * QuantizedNetwork_methods
+ * ------------------------
+ * Python method definitions that will be exposed by the Python quantized network object.
  */
-static PyMethodDef Network_methods[] = {
-    {"predict", (PyCFunction)Network_predict, METH_VARARGS,
+static PyMethodDef QuantizedNetwork_methods[] = {
+    {"predict", (PyCFunction)QuantizedNetwork_predict, METH_VARARGS,
      "Forward feed prediction."
     },
-    {"train", (PyCFunction)Network_train, METH_VARARGS | METH_KEYWORDS,
-     "Train the network."
+    {"predict_batch", (PyCFunction)QuantizedNetwork_predict_batch, METH_VARARGS | METH_KEYWORDS,
+     "Forward feed prediction of a whole set of input vectors."
     },
-    {
-    "set_weight", (PyCFunction)Network_set_weight, METH_VARARGS,
-    "Set a weight manually."
+    {"save_state", (PyCFunction)QuantizedNetwork_save_state, METH_VARARGS,
+    "Saves the quantized weights and scales to disk."
     },
-    {
-    "set_bias",(PyCFunction)Network_set_bias, METH_VARARGS,
-    "Set a bias manually."
+    {"load_state", (PyCFunction)QuantizedNetwork_load_state, METH_VARARGS,
+    "Loads quantized weights and scales from disk."
     },
-    {
-    "get_weight", (PyCFunction)Network_get_weight, METH_VARARGS,
-    "Get a single weight."
+    {NULL}  /* Sentinel */
+};
+
+/**
+ * QuantizedNetwork_get_architecture
+ * ---------------------------------
+ * Returns the number of neurons in each layer as a Python list.
+ */
+static PyObject* QuantizedNetwork_get_architecture(QuantizedNetworkObject *self, void *closure)
+{
+    return architectureList(self->numNeurons, self->numLayers);
+}
+
+/**
+ * QuantizedNetwork_get_activation
+ * -------------------------------
+ * Returns the name of the activation function.
+ */
+static PyObject* QuantizedNetwork_get_activation(QuantizedNetworkObject *self, void *closure)
+{
+    return PyUnicode_FromString(self->activationName);
+}
+
+/**
+ * QuantizedNetwork_getset
+ * -----------------------
+ * Read-only Python attributes computed from the quantized network.
+ */
+static PyGetSetDef QuantizedNetwork_getset[] = {
+    {"architecture", (getter)QuantizedNetwork_get_architecture, NULL,
+     "Number of neurons in each layer.", NULL
     },
-    {"save_state", (PyCFunction)Network_save_state, METH_VARARGS,
-    "Saves the current weights and biases to disk."
+    {"activation", (getter)QuantizedNetwork_get_activation, NULL,
+     "Name of the activation function.", NULL
     },
-    {
-    "load_state", (PyCFunction)Network_load_state, METH_VARARGS,
-    "Loads weights and biases from disk."
+    {NULL}  /* Sentinel */
+};
+
+/**
+ * QuantizedNetwork_members
+ * ------------------------
+ * Python attributes exposed by the Python quantized network object.
+ */
+static PyMemberDef QuantizedNetwork_members[] = {
+    {"threads", T_INT, offsetof(QuantizedNetworkObject, numThreads), 0,
+     "Number of threads used by predict_batch."
+    },
+    {"softmax", T_INT, offsetof(QuantizedNetworkObject, softmax), READONLY,
+     "Whether softmax is applied to the output layer."
+    },
+    {"num_parameters", T_LONG, offsetof(QuantizedNetworkObject, numParams), READONLY,
+     "Total number of weights and biases."
     },
     {NULL}  /* Sentinel */
 };
 
 /**
- * NetworkType
- * -----------
- * Python type definition for NetworkObject.
+ * QuantizedNetworkType
+ * --------------------
+ * Python type definition for QuantizedNetworkObject.
  */
-static PyTypeObject NetworkType = {
+static PyTypeObject QuantizedNetworkType = {
     PyVarObject_HEAD_INIT(NULL, 0)
-    .tp_name = "pyceptron.Network",
-    .tp_doc = "Perceptron for Python.",
-    .tp_basicsize = sizeof(NetworkObject),
+    .tp_name = "pyceptron.QuantizedNetwork",
+    .tp_doc = "Int8 quantized perceptron for inference.",
+    .tp_basicsize = sizeof(QuantizedNetworkObject),
     .tp_itemsize = 0,
     .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_BASETYPE,
-    .tp_new = (PyCFunction)Network_new,
-    .tp_methods = Network_methods,
+    .tp_new = (newfunc)QuantizedNetwork_new,
+    .tp_dealloc = (destructor)QuantizedNetwork_dealloc,
+    .tp_methods = QuantizedNetwork_methods,
+    .tp_members = QuantizedNetwork_members,
+    .tp_getset = QuantizedNetwork_getset,
+};
+
+/**
+ * pyceptron_load
+ * --------------
+ * Creates the network saved in a state file from the file alone. Files
+ * saved by Network.save_state give a Network of the stored architecture,
+ * activation function, softmax flag and precision, files saved by
+ * QuantizedNetwork.save_state give a QuantizedNetwork. Older files without
+ * a header can't be loaded this way, create the Network and use load_state.
+ * 
+ * filePath: path to the state file
+ * threads: Number of threads of the network.
+ * dtype: "float64" or "float32" to convert the parameters, by default the
+ *        precision of the file is kept.
+ * mmap: Whether to map the file into memory (see Network.load_state).
+ * 
+ * Returns:
+ *  The network.
+ */
+static PyObject* pyceptron_load(PyObject *module, PyObject *args, PyObject *kwargs)
+{
+    static char *kwlist[] = {"path", "threads", "dtype", "mmap", NULL};
+
+    char *filePath;
+    int threads = 1;
+    char *dtypeString = NULL;
+    int map = 0;
+
+    if (! PyArg_ParseTupleAndKeywords( args, kwargs, "s|izp", kwlist, &filePath, &threads, &dtypeString, &map )) return NULL;
+
+    FILE *fp = fopen(filePath, "rb");
+    if ( fp == NULL ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+
+    PyObject *type;
+    PyObject *architecture;
+
+    StateHeader header;
+    int hasHeader = loadStateHeader(fp, &header);
+    if ( hasHeader == STATE_OK )
+    {
+        type = (PyObject *)&NetworkType;
+        if ( dtypeString == NULL ) dtypeString = header.dtype == 'f' ? "float32" : "float64";
+    }
+    else if ( hasHeader == STATE_LEGACY && (hasHeader = loadQuantizedHeader(fp, &header)) == STATE_OK )
+    {
+        type = (PyObject *)&QuantizedNetworkType;
+        if ( dtypeString != NULL || map )
+        {
+            free(header.numNeurons);
+            fclose(fp);
+            PyErr_SetString(PyExc_ValueError, dtypeString != NULL ? "A quantized network has no dtype!"
+                                                                  : "Quantized states can't be mapped!");
+            return NULL;
+        }
+    }
+    else
+    {
+        fclose(fp);
+        if ( hasHeader == STATE_LEGACY )
+        {
+            PyErr_SetString(PyExc_ValueError, "The file has no header, create the Network and use load_state to read older state files.");
+        }
+        return NULL;
+    }
+    fclose(fp);
+
+    architecture = architectureList(header.numNeurons, header.numLayers);
+    free(header.numNeurons);
+    if ( architecture == NULL ) return NULL;
+
+    const char *activation = header.activation;
+    int softmax = header.softmax;
+
+    PyObject *network;
+    if ( dtypeString != NULL )
+    {
+        network = PyObject_CallFunction(type, "Osiis", architecture, activation, softmax, threads, dtypeString);
+    }
+    else
+    {
+        network = PyObject_CallFunction(type, "Osii", architecture, activation, softmax, threads);
+    }
+    Py_DECREF(architecture);
+    if ( network == NULL ) return NULL;
+
+    PyObject *result;
+    if ( type == (PyObject *)&NetworkType )
+    {
+        result = PyObject_CallMethod(network, "load_state", "sO", filePath, map ? Py_True : Py_False);
+    }
+    else
+    {
+        result = PyObject_CallMethod(network, "load_state", "s", filePath);
+    }
+    if ( result == NULL )
+    {
+        Py_DECREF(network);
+        return NULL;
+    }
+    Py_DECREF(result);
+    return network;
+}
+
+/**
+ * pyceptron_state_info
+ * --------------------
+ * Reads the header of a state file without loading the parameters.
+ * 
+ * filePath: path to the state file
+ * 
+ * Returns:
+ *  A dict with the version, architecture, activation, softmax, dtype
+ *  ("int8" for quantized networks), byteorder and checksum stored in the
+ *  header, or None for older files without a header.
+ */
+static PyObject* pyceptron_state_info(PyObject *module, PyObject *args)
+{
+    char *filePath;
+
+    if (!PyArg_ParseTuple(args, "s", &filePath)) return NULL;
+
+    FILE *fp = fopen(filePath, "rb");
+    if ( fp == NULL ) return PyErr_SetFromErrnoWithFilename(PyExc_OSError, filePath);
+
+    StateHeader header;
+    int hasHeader = loadStateHeader(fp, &header);
+    if ( hasHeader == STATE_LEGACY ) hasHeader = loadQuantizedHeader(fp, &header);
+    fclose(fp);
+
+    if ( hasHeader < 0 ) return NULL;
+    if ( hasHeader == STATE_LEGACY )
+    {
+        Py_INCREF(Py_None);
+        return Py_None;
+    }
+
+    PyObject *architecture = architectureList(header.numNeurons, header.numLayers);
+    free(header.numNeurons);
+    if ( architecture == NULL ) return NULL;
+
+    const char *dtype = header.dtype == 'b' ? "int8" : header.dtype == 'f' ? "float32" : "float64";
+    return Py_BuildValue("{s:I,s:N,s:s,s:O,s:s,s:C,s:k}",
+                         "version", header.version,
+                         "architecture", architecture,
+                         "activation", header.activation,
+                         "softmax", header.softmax ? Py_True : Py_False,
+                         "dtype", dtype,
+                         "byteorder", header.byteOrder,
+                         "checksum", (unsigned long)header.checksum);
+}
+
+/**
+ * pyceptron_methods
+ * -----------------
+ * Python functions exposed by the module.
+ */
+static PyMethodDef pyceptron_methods[] = {
+    {"load", (PyCFunction)pyceptron_load, METH_VARARGS | METH_KEYWORDS,
+     "Creates the network saved in a state file."
+    },
+    {"state_info", (PyCFunction)pyceptron_state_info, METH_VARARGS,
+     "Reads the header of a state file."
+    },
+    {NULL}  /* Sentinel */
 };
 
 /**
@@ -749,6 +3057,7 @@ static struct PyModuleDef pyceptron =
     "pyceptron", // name of the module
     "Perceptron for Python.",  // description
     -1,		// size of per-interpreter state of the module, or -1 if the module keeps state in global variables.
+    pyceptron_methods,
 };
 
 /**
@@ -759,7 +3068,7 @@ static struct PyModuleDef pyceptron =
 PyMODINIT_FUNC PyInit_pyceptron(void)
 {
     PyObject *m;
-    if (PyType_Ready(&NetworkType) < 0)
+    if (PyType_Ready(&NetworkType) < 0 || PyType_Ready(&QuantizedNetworkType) < 0)
         return NULL;
 
     m = PyModule_Create(&pyceptron);
@@ -768,5 +3077,7 @@ PyMODINIT_FUNC PyInit_pyceptron(void)
 
     Py_INCREF(&NetworkType);
     PyModule_AddObject(m, "Network", (PyObject *) &NetworkType);
+    Py_INCREF(&QuantizedNetworkType);
+    PyModule_AddObject(m, "QuantizedNetwork", (PyObject *) &QuantizedNetworkType);
     return m;
 }
\ No newline at end of file
@@ -0,0 +1,234 @@
+// #########################################################################
+// #                              quantized.h                              #
+// #-----------------------------------------------------------------------#
+// # Forward feed of int8 quantized networks. Every weight is stored as an #
+// # 8 bit integer with one scale per row (or per layer), the outputs of   #
+// # every layer are quantized with a scale found by calibration, so each #
+// # node only takes an integer dot product. Biases, scales and the        #
+// # activation functions stay in single precision.                        #
+// # Included by pyceptron.c after network.h.                              #
+// #########################################################################
+
+#ifndef QUANTIZED_H
+#define QUANTIZED_H
+
+#define QUANTIZED_CHUNK 8 /* samples fed forward together, every row of weights is reused for all of them */
+
+/* Python is built for the oldest x86-64 CPUs, which have to sign-extend the
+   int8 weights in three instructions. With GCC the dot product is compiled
+   for AVX2 as well and the version is picked when the module is loaded
+   (GCC on Linux only). */
+#if defined(__GNUC__) && defined(__x86_64__) && defined(__linux__) && !defined(__clang__)
+#define DOT_TARGETS __attribute__((target_clones("avx2", "default")))
+#else
+#define DOT_TARGETS
+#endif
+
+/**
+ * QuantizedLayer
+ * --------------
+ * A fully connected layer of a quantized network. Unlike Layer, the
+ * weights are stored with one row per node of this layer, so every
+ * output is a dot product of two contiguous vectors.
+ * 
+ * w: numNeurons[l] rows of numNeurons[l-1] int8 weights.
+ * scale: Scale of the weights of every row, w * scale is the float weight.
+ * b: Biases of the nodes.
+ * rowScale: scale times the scale of the layers inputs, which turns an
+ *           integer dot product into the float net input.
+ */
+typedef struct {
+    signed char *w; /* Input weights */
+    float *scale; /* Weight scale of every node */
+    float *b; /* Input biases */
+    float *rowScale; /* Scale of the dot product of every node */
+} QuantizedLayer;
+
+/**
+ * dotInt8
+ * -------
+ * Integer dot product of int8 weights and quantized inputs. The inputs are
+ * at most 255 in magnitude, so the sum can't overflow for less than
+ * 66000 inputs.
+ * 
+ * w: Weights.
+ * x: Quantized inputs.
+ * n: Length of both vectors.
+ */
+DOT_TARGETS int dotInt8(const signed char *w, const short *x, int n)
+{
+    int sum = 0;
+    int i;
+    for ( i = 0; i < n; i++ )
+    {
+        sum += w[i] * x[i];
+    }
+    return sum;
+}
+
+/**
+ * quantizeVector
+ * --------------
+ * Rounds z / scale to the nearest integer in [low, 255] (or [-127, 127]
+ * if low is negative).
+ * 
+ * z: Input vector.
+ * n: Length of z.
+ * scale: Quantization scale.
+ * low: -127 for signed and 0 for unsigned values.
+ * q: Quantized output vector.
+ */
+void quantizeVector(const float *z, long n, float scale, int low, short *q)
+{
+    float inverse = 1.f / scale;
+    float lowest = (float)low;
+    float highest = low < 0 ? 127.f : 255.f;
+    long i;
+    for ( i = 0; i < n; i++ )
+    {
+        float v = z[i] * inverse;
+        v = v < lowest ? lowest : v;
+        v = v > highest ? highest : v;
+        q[i] = (short)(v + (v < 0 ? -0.5f : 0.5f));
+    }
+}
+
+/**
+ * quantizedRows
+ * -------------
+ * Feeds rows quantized input vectors forward. Each row of weights is
+ * applied to all samples before moving to the next, so it is read from
+ * memory once per chunk instead of once per sample.
+ * 
+ * self: Pointer to the quantized network Python object.
+ * rows: Number of samples, at most QUANTIZED_CHUNK.
+ * x: rows quantized input vectors, overwritten.
+ * y: Scratch space for rows quantized outputs of the widest layer.
+ * z: Scratch space for rows float outputs of the widest layer.
+ * output: rows output vectors.
+ */
+void quantizedRows(const QuantizedNetworkObject *self, long rows, short *x, short *y, float *z, float *output)
+{
+    const QuantizedLayer *layers = self->layers;
+    int L = self->numLayers-1;
+    int l, j;
+    long i;
+    for ( l = 1; l <= L; l++ )
+    {
+        int K = self->numNeurons[l-1];
+        int N = self->numNeurons[l];
+        const QuantizedLayer *layer = &layers[l];
+        float *out = l == L ? output : z;
+
+        for ( j = 0; j < N; j++ )
+        {
+            const signed char *w = layer->w + (long)j * K;
+            for ( i = 0; i < rows; i++ )
+            {
+                out[i * N + j] = dotInt8(w, x + i * K, K) * layer->rowScale[j] + layer->b[j];
+            }
+        }
+
+        self->activationFunc32(out, rows * N);
+
+        if ( l < L )
+        {
+            quantizeVector(out, rows * N, self->outputScales[l], self->outputLows[l], y);
+            short *swap = x;
+            x = y;
+            y = swap;
+        }
+        else if ( self->softmax )
+        {
+            for ( i = 0; i < rows; i++ )
+            {
+                act_softmax_vec_f(out + i * N, N);
+            }
+        }
+    }
+}
+
+/**
+ * predictQuantizedSet
+ * -------------------
+ * Feeds a whole set of input vectors forward in chunks of QUANTIZED_CHUNK
+ * samples, one chunk per thread at a time.
+ * 
+ * self: Pointer to the quantized network Python object.
+ * inputs: (numSamples, input dimension) matrix of numbers.
+ * format: struct format character of the inputs.
+ * itemsize: Size of one input number in bytes.
+ * numSamples: Number of samples.
+ * argmax: Whether to write class indices instead of output vectors.
+ * result: numSamples long long class indices or a (numSamples, output
+ *         dimension) float matrix.
+ * 
+ * Returns:
+ *  0 on success, -1 if the memory could not be allocated.
+ */
+int predictQuantizedSet(QuantizedNetworkObject *self, const char *inputs, char format, long itemsize, long numSamples, int argmax, void *result)
+{
+    int inputDim = self->numNeurons[0];
+    int outputDim = self->numNeurons[self->numLayers-1];
+    long numChunks = (numSamples + QUANTIZED_CHUNK - 1) / QUANTIZED_CHUNK;
+    int numThreads = numChunks < self->numThreads ? (int)numChunks : self->numThreads;
+    int widest = 0;
+    int l;
+    long c;
+
+    for ( l = 0; l < self->numLayers; l++ )
+    {
+        if ( self->numNeurons[l] > widest ) widest = self->numNeurons[l];
+    }
+
+    /* per thread: x and y, then z and the outputs */
+    long shorts = 2L * QUANTIZED_CHUNK * widest;
+    long floats = (long)QUANTIZED_CHUNK * (widest + outputDim);
+    long scratchSize = shorts * sizeof(short) + floats * sizeof(float);
+    char *scratch = (char *)malloc((numThreads > 0 ? numThreads : 1) * scratchSize);
+    if ( scratch == NULL ) return -1;
+
+    #pragma omp parallel for num_threads(numThreads) if (numThreads > 1) schedule(dynamic)
+    for ( c = 0; c < numChunks; c++ )
+    {
+        char *own = scratch + omp_get_thread_num() * scratchSize;
+        short *x = (short *)own;
+        short *y = x + QUANTIZED_CHUNK * widest;
+        float *z = (float *)(own + shorts * sizeof(short));
+        float *output = z + QUANTIZED_CHUNK * widest;
+        long start = c * QUANTIZED_CHUNK;
+        long chunk = numSamples - start < QUANTIZED_CHUNK ? numSamples - start : QUANTIZED_CHUNK;
+        long i;
+        int j;
+
+        for ( i = 0; i < chunk; i++ )
+        {
+            readVector32(inputs + (start + i) * inputDim * itemsize, format, inputDim, z + i * inputDim);
+        }
+        quantizeVector(z, chunk * inputDim, self->outputScales[0], self->outputLows[0], x);
+
+        if ( !argmax ) output = (float *)result + start * outputDim;
+
+        quantizedRows(self, chunk, x, y, z, output);
+
+        if ( argmax )
+        {
+            long long *indices = (long long *)result + start;
+            for ( i = 0; i < chunk; i++ )
+            {
+                const float *row = output + i * outputDim;
+                int best = 0;
+                for ( j = 1; j < outputDim; j++ )
+                {
+                    if ( row[j] > row[best] ) best = j;
+                }
+                indices[i] = best;
+            }
+        }
+    }
+
+    free(scratch);
+    return 0;
+}
+
+#endif
@@ -1,12 +1,27 @@
+import sys
 from setuptools import setup, Extension
 
-# Compiles the Python extension.
+# Compiles the Python extension. Multithreading uses OpenMP.
+# Without trapping math GCC may evaluate both sides of a conditional like
+# the one of Leaky ReLU, which the vectorized activation kernels need.
+# -O3 is passed as well, as Python isn't built with it everywhere, so the
+# loops that aren't marked for OpenMP are vectorized too.
+
+if sys.platform == "win32":
+	openmp_args = ['/openmp']
+	openmp_link_args = []
+else:
+	openmp_args = ['-fopenmp', '-fno-trapping-math', '-O3']
+	openmp_link_args = ['-fopenmp']
 
 module = Extension("pyceptron",
 		sources = ['pyceptron.c'],
+		depends = ['activation.h', 'linalg.h', 'network.h', 'quantized.h', 'state.h'],
 		include_dirs=[],
 		library_dirs=[],
-		libraries=[]
+		libraries=[],
+		extra_compile_args=openmp_args,
+		extra_link_args=openmp_link_args
 		)
 
 setup (name = "pyceptron",
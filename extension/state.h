@@ -0,0 +1,331 @@
+// #########################################################################
+// #                                state.h                                #
+// #-----------------------------------------------------------------------#
+// # The header of network state files. A state file starts with a header #
+// # describing the network, followed by all weights and biases in the     #
+// # order of the params block:                                            #
+// #                                                                       #
+// #  offset  size                                                         #
+// #   0       4   magic "PCST"                                            #
+// #   4       4   version                                                 #
+// #   8       4   header size, the parameters start here                  #
+// #  12       1   byte order of all numbers, '<' or '>'                    #
+// #  13       1   type of the parameters, 'd' (float64) or 'f' (float32)  #
+// #  14       1   softmax flag                                            #
+// #  15       1   reserved                                                #
+// #  16      16   name of the activation function, zero padded            #
+// #  32       4   CRC-32 of the parameters as stored (as zlib.crc32)       #
+// #  36       4   number of layers                                        #
+// #  40     4*n   number of neurons of every layer                        #
+// #                                                                       #
+// # The header is zero padded to a multiple of 64 bytes, older state     #
+// # files hold only the parameters (float64, native byte order).          #
+// #                                                                       #
+// # Quantized networks use the same header with the magic "PCQ8" and the  #
+// # type 'b' (int8). It is followed by the output scales (float32) and    #
+// # the output lows (int32) of all layers but the last, the weight scales #
+// # and biases (float32) and the int8 weights (see QuantizedNetwork).    #
+// #########################################################################
+
+#ifndef STATE_H
+#define STATE_H
+
+#define STATE_MAGIC "PCST"
+#define QUANTIZED_MAGIC "PCQ8"
+#define STATE_VERSION 1
+#define STATE_ALIGNMENT 64
+#define STATE_FIXED_SIZE 40 /* bytes before the numbers of neurons */
+#define ACTIVATION_NAME_SIZE 16
+
+#define STATE_OK 1
+#define STATE_LEGACY 0 /* no header */
+#define STATE_INVALID -1
+#define STATE_NEWER -2 /* written by a newer version */
+#define STATE_NO_MEMORY -3
+
+/**
+ * StateHeader
+ * -----------
+ * The decoded header of a state file.
+ * 
+ * version: Version of the file format.
+ * headerSize: Size of the header in bytes.
+ * byteOrder: '<' or '>'.
+ * dtype: struct format character of the parameters, 'b' for quantized networks.
+ * softmax: Softmax flag of the network.
+ * activation: Name of the activation function.
+ * checksum: CRC-32 of the parameters as stored.
+ * numLayers: Number of layers.
+ * numNeurons: Number of neurons of every layer, owned by the header.
+ */
+typedef struct {
+    unsigned int version;
+    unsigned int headerSize;
+    char byteOrder;
+    char dtype;
+    int softmax;
+    char activation[ACTIVATION_NAME_SIZE + 1];
+    unsigned int checksum;
+    int numLayers;
+    int *numNeurons;
+} StateHeader;
+
+/**
+ * nativeByteOrder
+ * ---------------
+ * Returns '<' on little-endian and '>' on big-endian machines.
+ */
+char nativeByteOrder(void)
+{
+    const unsigned int one = 1;
+    return *(const unsigned char *)&one == 1 ? '<' : '>';
+}
+
+/**
+ * swapBytes
+ * ---------
+ * Reverses the byte order of n numbers of size bytes each in place.
+ */
+void swapBytes(void *data, long n, size_t size)
+{
+    unsigned char *bytes = (unsigned char *)data;
+    long i;
+    size_t j;
+    for ( i = 0; i < n; i++, bytes += size )
+    {
+        for ( j = 0; j < size / 2; j++ )
+        {
+            unsigned char swap = bytes[j];
+            bytes[j] = bytes[size - 1 - j];
+            bytes[size - 1 - j] = swap;
+        }
+    }
+}
+
+/**
+ * checksum32
+ * ----------
+ * Continues the CRC-32 crc over n bytes of data. Gives the same value as
+ * zlib.crc32, so state files can be checked from Python as well. Eight
+ * bytes are processed per step with eight tables (slicing-by-8), which is
+ * about five times faster than one table lookup per byte.
+ */
+unsigned int checksum32(unsigned int crc, const void *data, size_t n)
+{
+    static unsigned int table[8][256];
+    const unsigned char *bytes = (const unsigned char *)data;
+
+    if ( table[0][255] == 0 )
+    {
+        unsigned int k, c;
+        int bit, t;
+        for ( k = 0; k < 256; k++ )
+        {
+            c = k;
+            for ( bit = 0; bit < 8; bit++ )
+            {
+                c = c & 1 ? 0xEDB88320u ^ (c >> 1) : c >> 1;
+            }
+            table[0][k] = c;
+        }
+        for ( k = 0; k < 256; k++ )
+        {
+            for ( t = 1; t < 8; t++ )
+            {
+                table[t][k] = (table[t-1][k] >> 8) ^ table[0][table[t-1][k] & 0xFF];
+            }
+        }
+    }
+
+    crc = ~crc;
+    for ( ; n >= 8; n -= 8, bytes += 8 )
+    {
+        /* the tables assume little-endian words */
+        unsigned int low = bytes[0] | bytes[1] << 8 | bytes[2] << 16 | (unsigned int)bytes[3] << 24;
+        unsigned int high = bytes[4] | bytes[5] << 8 | bytes[6] << 16 | (unsigned int)bytes[7] << 24;
+        low ^= crc;
+        crc = table[7][low & 0xFF] ^ table[6][(low >> 8) & 0xFF]
+            ^ table[5][(low >> 16) & 0xFF] ^ table[4][low >> 24]
+            ^ table[3][high & 0xFF] ^ table[2][(high >> 8) & 0xFF]
+            ^ table[1][(high >> 16) & 0xFF] ^ table[0][high >> 24];
+    }
+    for ( ; n > 0; n--, bytes++ )
+    {
+        crc = table[0][(crc ^ *bytes) & 0xFF] ^ (crc >> 8);
+    }
+    return ~crc;
+}
+
+/**
+ * stateHeaderSize
+ * ---------------
+ * Returns the size of the header of a network with numLayers layers.
+ */
+unsigned int stateHeaderSize(int numLayers)
+{
+    unsigned int size = STATE_FIXED_SIZE + 4 * numLayers;
+    return (size + STATE_ALIGNMENT - 1) / STATE_ALIGNMENT * STATE_ALIGNMENT;
+}
+
+/**
+ * readHeader
+ * ----------
+ * Reads the header of a state file with the given magic and leaves the
+ * file at the first parameter. Other files are rewound. The type of the
+ * parameters is not checked.
+ * 
+ * fp: The open state file.
+ * magic: STATE_MAGIC or QUANTIZED_MAGIC.
+ * header: Filled with the header. numNeurons must be freed by the caller
+ *         if STATE_OK is returned.
+ * 
+ * Returns:
+ *  STATE_OK, STATE_LEGACY for files without such a header, STATE_INVALID,
+ *  STATE_NEWER or STATE_NO_MEMORY.
+ */
+int readHeader(FILE *fp, const char *magic, StateHeader *header)
+{
+    unsigned char fixed[STATE_FIXED_SIZE];
+    header->numNeurons = NULL;
+
+    if ( fread(fixed, 1, STATE_FIXED_SIZE, fp) != STATE_FIXED_SIZE || memcmp(fixed, magic, 4) != 0 )
+    {
+        rewind(fp);
+        return STATE_LEGACY;
+    }
+
+    unsigned int numLayers;
+    header->byteOrder = (char)fixed[12];
+    header->dtype = (char)fixed[13];
+    header->softmax = fixed[14];
+    memcpy(header->activation, fixed + 16, ACTIVATION_NAME_SIZE);
+    header->activation[ACTIVATION_NAME_SIZE] = '\0';
+    memcpy(&header->version, fixed + 4, 4);
+    memcpy(&header->headerSize, fixed + 8, 4);
+    memcpy(&header->checksum, fixed + 32, 4);
+    memcpy(&numLayers, fixed + 36, 4);
+
+    if ( header->byteOrder != '<' && header->byteOrder != '>' ) return STATE_INVALID;
+
+    int swap = header->byteOrder != nativeByteOrder();
+    if ( swap )
+    {
+        swapBytes(&header->version, 1, 4);
+        swapBytes(&header->headerSize, 1, 4);
+        swapBytes(&header->checksum, 1, 4);
+        swapBytes(&numLayers, 1, 4);
+    }
+
+    if ( header->version > STATE_VERSION ) return STATE_NEWER;
+
+    /* the sizes are checked before they are subtracted or allocated */
+    if ( header->headerSize > (1u << 20)
+         || header->headerSize < STATE_FIXED_SIZE || numLayers < 2
+         || numLayers > (header->headerSize - STATE_FIXED_SIZE) / 4
+         || header->headerSize < stateHeaderSize(numLayers) )
+    {
+        return STATE_INVALID;
+    }
+
+    header->numLayers = numLayers;
+    header->numNeurons = (int *)malloc(numLayers * sizeof(int));
+    if ( header->numNeurons == NULL ) return STATE_NO_MEMORY;
+
+    if ( fread(header->numNeurons, 4, numLayers, fp) != numLayers || fseek(fp, header->headerSize, SEEK_SET) != 0 )
+    {
+        free(header->numNeurons);
+        header->numNeurons = NULL;
+        return STATE_INVALID;
+    }
+    if ( swap ) swapBytes(header->numNeurons, numLayers, 4);
+
+    return STATE_OK;
+}
+
+/**
+ * checkHeaderType
+ * ---------------
+ * Passes on the result of readHeader if the parameters have one of the
+ * given types, otherwise frees the header and returns STATE_INVALID.
+ */
+int checkHeaderType(int result, StateHeader *header, const char *dtypes)
+{
+    if ( result == STATE_OK && (header->dtype == '\0' || strchr(dtypes, header->dtype) == NULL) )
+    {
+        free(header->numNeurons);
+        header->numNeurons = NULL;
+        return STATE_INVALID;
+    }
+    return result;
+}
+
+/**
+ * readStateHeader
+ * ---------------
+ * Reads the header of a state file of a float network (see readHeader).
+ */
+int readStateHeader(FILE *fp, StateHeader *header)
+{
+    return checkHeaderType(readHeader(fp, STATE_MAGIC, header), header, "df");
+}
+
+/**
+ * readQuantizedHeader
+ * -------------------
+ * Reads the header of a state file of a quantized network (see readHeader).
+ */
+int readQuantizedHeader(FILE *fp, StateHeader *header)
+{
+    return checkHeaderType(readHeader(fp, QUANTIZED_MAGIC, header), header, "b");
+}
+
+/**
+ * writeHeader
+ * -----------
+ * Writes the header of a state file in native byte order. version,
+ * headerSize and byteOrder are set by this function.
+ * 
+ * fp: The state file.
+ * magic: STATE_MAGIC or QUANTIZED_MAGIC.
+ * header: The header to write.
+ * 
+ * Returns:
+ *  0 on success, -1 on failure.
+ */
+int writeHeader(FILE *fp, const char *magic, StateHeader *header)
+{
+    header->version = STATE_VERSION;
+    header->headerSize = stateHeaderSize(header->numLayers);
+    header->byteOrder = nativeByteOrder();
+
+    unsigned char *bytes = (unsigned char *)calloc(header->headerSize, 1);
+    if ( bytes == NULL ) return -1;
+
+    unsigned int numLayers = header->numLayers;
+    memcpy(bytes, magic, 4);
+    memcpy(bytes + 4, &header->version, 4);
+    memcpy(bytes + 8, &header->headerSize, 4);
+    bytes[12] = header->byteOrder;
+    bytes[13] = header->dtype;
+    bytes[14] = header->softmax != 0;
+    memcpy(bytes + 16, header->activation, strnlen(header->activation, ACTIVATION_NAME_SIZE));
+    memcpy(bytes + 32, &header->checksum, 4);
+    memcpy(bytes + 36, &numLayers, 4);
+    memcpy(bytes + STATE_FIXED_SIZE, header->numNeurons, 4 * numLayers);
+
+    int ok = fwrite(bytes, 1, header->headerSize, fp) == header->headerSize;
+    free(bytes);
+    return ok ? 0 : -1;
+}
+
+/**
+ * writeStateHeader
+ * ----------------
+ * Writes the header of a state file of a float network (see writeHeader).
+ */
+int writeStateHeader(FILE *fp, StateHeader *header)
+{
+    return writeHeader(fp, STATE_MAGIC, header);
+}
+
+#endif
@@ -13,7 +13,8 @@ class Bar(QtWidgets.QFrame):
     def setValue(self, value):
         # clamp between 0.0 and 1.0
         self.value = max(min(value, 1.0), 0.0)
-        self.repaint()
+        # schedule the repaint, all bars are then painted in one pass
+        self.update()
 
     def setColor(self, color):
         self.color = color
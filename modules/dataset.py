@@ -0,0 +1,230 @@
+######################################
+#            dataset.py              #
+#------------------------------------#
+#  Compact, compressed cache of an   #
+#  (images, labels) IDX file pair.   #
+######################################
+
+# A cache file holds named sections: the uint8 images, the labels and
+# optionally the images already normalized to float32 in [0, 1]. Every
+# section is split into chunks of records that are compressed separately,
+# so a section can be decompressed straight into a preallocated array.
+# Sections stored without compression are aligned and memory-mapped.
+#
+# The images and labels are compressed to keep the file small. The
+# normalized images are stored uncompressed instead: decompressing them
+# takes longer than normalizing the uint8 images, but mapping them is
+# almost free and the pages are shared by all processes using the cache.
+#
+# Layout:
+#   b"DSC1", header length (4 bytes, little-endian), JSON header, data
+#
+# The header lists, for every section, its dtype, shape, codec, the
+# offset and length of every chunk (relative to the start of the data)
+# and a CRC-32 of the uncompressed bytes.
+#
+# Convert once, e.g.
+#
+#   python modules/dataset.py -i mnist/train-images.idx3-ubyte
+#                             -l mnist/train-labels.idx1-ubyte
+#                             -o mnist/train.dsc
+#
+# (-f adds the normalized images) then load with
+# dataset.load("mnist/train.dsc", normalize=True).
+
+import sys
+import os
+import io
+import json
+import struct
+import getopt
+import zlib
+import lzma
+import numpy as np
+import idx
+
+MAGIC = b"DSC1"
+ALIGNMENT = 64
+
+# codec name: (compress(bytes, level), decompress(bytes))
+codecs = {
+    "none": (lambda data, level: data, lambda data: data),
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+
+try:
+    import lz4.frame
+    codecs["lz4"] = (lambda data, level: lz4.frame.compress(data, compression_level=level), lz4.frame.decompress)
+except ImportError:
+    pass # zlib is always available
+
+def _chunks(array, chunksize):
+    # Splits an array into contiguous byte strings of chunksize records.
+    array = np.ascontiguousarray(array)
+    for start in range(0, max(len(array), 1), chunksize):
+        yield array[start:start + chunksize].tobytes()
+
+def write(path, sections, codec="zlib", level=6, chunksize=4096, uncompressed=()):
+    # Writes a dict of name: array to a cache file. codec is one of the
+    # keys of codecs, the sections named in uncompressed are stored as is
+    # and memory-mapped on load.
+    if codec not in codecs:
+        raise ValueError("Unknown codec '%s', available are %s." % (codec, ", ".join(sorted(codecs))))
+
+    header = {"sections": {}}
+    blobs = []
+    offset = 0
+    for name, array in sections.items():
+        array = np.asarray(array)
+        section_codec = "none" if name in uncompressed else codec
+        compress = codecs[section_codec][0]
+        entry = {"dtype": array.dtype.str, "shape": list(array.shape), "codec": section_codec, "chunks": [], "crc32": 0}
+
+        # uncompressed sections start aligned so they can be mapped
+        padding = -offset % ALIGNMENT if section_codec == "none" else 0
+        blobs.append(bytes(padding))
+        offset += padding
+
+        for chunk in _chunks(array, chunksize):
+            entry["crc32"] = zlib.crc32(chunk, entry["crc32"])
+            blob = compress(chunk, level)
+            entry["chunks"].append([offset, len(blob)])
+            blobs.append(blob)
+            offset += len(blob)
+        header["sections"][name] = entry
+
+    header = json.dumps(header).encode("ascii")
+
+    # the data starts aligned as well
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % ALIGNMENT)
+
+    path_tmp = "%s.%i.tmp" % (path, os.getpid())
+    with io.open(path_tmp, "wb") as cache_file:
+        cache_file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for blob in blobs:
+            cache_file.write(blob)
+    os.replace(path_tmp, path)
+
+def _header(path):
+    with io.open(path, "rb") as cache_file:
+        magic = cache_file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError("%s is not a dataset cache file." % path)
+        size, = struct.unpack("<I", cache_file.read(4))
+        header = json.loads(cache_file.read(size).decode("ascii"))
+    return header, len(MAGIC) + 4 + size
+
+def read(path, names=None, verify=True):
+    # Reads sections of a cache file into a dict of name: array. With
+    # verify, the CRC-32 of every section is checked.
+    header, start = _header(path)
+    sections = header["sections"]
+    if names is None:
+        names = list(sections)
+
+    result = {}
+    with io.open(path, "rb") as cache_file:
+        for name in names:
+            entry = sections[name]
+            dtype = np.dtype(entry["dtype"])
+            shape = tuple(entry["shape"])
+
+            if entry["codec"] == "none":
+                offset = start + entry["chunks"][0][0]
+                if int(np.prod(shape)) == 0:
+                    array = np.empty(shape, dtype=dtype)
+                else:
+                    array = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+                if verify and zlib.crc32(array) != entry["crc32"]:
+                    raise ValueError("Section '%s' of %s is corrupted." % (name, path))
+                result[name] = array
+                continue
+
+            decompress = codecs[entry["codec"]][1]
+            array = np.empty(shape, dtype=dtype)
+            raw = array.reshape(-1).view(np.uint8)
+            crc = 0
+            position = 0
+            for offset, length in entry["chunks"]:
+                cache_file.seek(start + offset)
+                try:
+                    chunk = decompress(cache_file.read(length))
+                except (zlib.error, lzma.LZMAError, RuntimeError):
+                    raise ValueError("Section '%s' of %s is corrupted." % (name, path))
+                if verify:
+                    crc = zlib.crc32(chunk, crc)
+                raw[position:position + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+                position += len(chunk)
+
+            if position != raw.size or (verify and crc != entry["crc32"]):
+                raise ValueError("Section '%s' of %s is corrupted." % (name, path))
+            result[name] = array
+
+    return result
+
+def convert(path_img, path_lbl, path, codec="zlib", level=6, chunksize=4096, normalized=False):
+    # Converts an (images, labels) IDX file pair into a cache file. The
+    # images are stored as (N, rows * cols) uint8 and, with normalized, a
+    # second time as uncompressed float32 in [0, 1].
+    with idx.open(path_img) as images, idx.open(path_lbl) as labels:
+        if len(images) != len(labels):
+            raise ValueError("The number of images and labels doesn't match.")
+        img = images[:].reshape(len(images), -1).astype(np.uint8)
+        lbl = labels[:].astype(np.uint8)
+
+    sections = {"images": img, "labels": lbl}
+    if normalized:
+        sections["normalized"] = np.multiply(img, np.float32(1 / 255), dtype=np.float32)
+    write(path, sections, codec=codec, level=level, chunksize=chunksize, uncompressed=["normalized"])
+
+def load(path, normalize=False, verify=True):
+    # Returns (N, 784) images and (N,) labels like mnist.load. With
+    # normalize, the images are float32 in [0, 1], mapped from the
+    # precomputed section if the cache has one. Skipping the checksum
+    # with verify=False makes mapping the section instant.
+    sections = _header(path)[0]["sections"]
+    if normalize and "normalized" in sections:
+        data = read(path, ["normalized", "labels"], verify=verify)
+        return data["normalized"], data["labels"]
+
+    data = read(path, ["images", "labels"], verify=verify)
+    img = data["images"]
+    if normalize:
+        img = np.multiply(img, np.float32(1 / 255), dtype=np.float32)
+    return img, data["labels"]
+
+def main(argv):
+    usage = 'dataset.py -i <images> -l <labels> -o <cache> [-c <codec>] [-f]'
+    path_img = ''
+    path_lbl = ''
+    path = ''
+    codec = "lz4" if "lz4" in codecs else "zlib"
+    normalized = False
+    try:
+        opts, args = getopt.getopt(argv, "hfi:l:o:c:", [])
+    except getopt.GetoptError:
+        print(usage)
+        sys.exit(2)
+    for opt, arg in opts:
+        if opt == '-h':
+            print(usage)
+            print('  -c  one of %s' % ", ".join(sorted(codecs)))
+            print('  -f  also store the normalized float32 images')
+            sys.exit()
+        elif opt in ("-i"):
+            path_img = arg
+        elif opt in ("-l"):
+            path_lbl = arg
+        elif opt in ("-o"):
+            path = arg
+        elif opt in ("-c"):
+            codec = arg
+        elif opt in ("-f"):
+            normalized = True
+
+    convert(path_img, path_lbl, path, codec=codec, normalized=normalized)
+    print("%s: %i bytes" % (path, os.path.getsize(path)))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
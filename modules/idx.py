@@ -4,6 +4,8 @@
 #   Open idx files.  #
 ######################
 
+import io
+import os
 import numpy as np
 import struct
 
@@ -13,66 +15,272 @@ class file:
         self.datashape = np.array(datashape, dtype=">u4")
         self.empty = True
 
+        # records live in the front of a buffer that grows by doubling,
+        # so appending is amortized O(1) instead of copying the body
+        self._buffer = np.empty([0] + list(self.datashape), dtype=self.dtype)
+        self._size = 0
+
+    @property
+    def body(self):
+        return self._buffer[:self._size]
+
+    @body.setter
+    def body(self, data):
+        self._buffer = np.asarray(data, dtype=self.dtype)
+        self._size = len(self._buffer)
+        self.empty = False
+
+    def _reserve(self, size):
+        if size <= len(self._buffer):
+            return
+        capacity = max(size, 2 * len(self._buffer), 16)
+        buffer = np.empty((capacity,) + self._buffer.shape[1:], dtype=self.dtype)
+        buffer[:self._size] = self._buffer[:self._size]
+        self._buffer = buffer
+
     def append(self, data):
-        if self.empty:
-            self.body = np.array(data, dtype=self.dtype)
-            self.empty = False
-        else:
-            self.body = np.append(self.body, data, axis=0)
+        self.extend([data])
+
+    def extend(self, arrays):
+        # Appends many arrays of records at once with a single reallocation.
+        arrays = [np.asarray(data, dtype=self.dtype) for data in arrays]
+        for data in arrays:
+            if data.shape[1:] != self._buffer.shape[1:]:
+                raise ValueError("Records of shape %s don't match the datashape %s." % (data.shape[1:], self._buffer.shape[1:]))
+
+        self._reserve(self._size + sum(len(data) for data in arrays))
+        for data in arrays:
+            self._buffer[self._size:self._size + len(data)] = data
+            self._size += len(data)
+        self.empty = False
+
+# IDX datatype codes and their big-endian numpy dtypes
+_dtypes = {8: ">u1", 9: ">i1", 11: ">i2", 12: ">i4", 13: ">f4", 14: ">f8"}
+_codes = {dtype: code for code, dtype in _dtypes.items()}
+
+def _body(idx_obj):
+    # The body as one contiguous big-endian array.
+    if idx_obj.dtype not in _codes:
+        raise ValueError('Unknown datatype. Note that only big-endian datatypes are allowed.')
+    return np.ascontiguousarray(idx_obj.body, dtype=idx_obj.dtype)
 
 def write(path, idx_obj):
-    idx_file = open(path, "wb+")
+    body = _body(idx_obj)
+    dims = body.ndim
 
-    dtype = 0
-    fmt = ''
-    if (idx_obj.dtype == ">u1"):
-        dtype = 8
-        fmt ='>B'
-    elif (idx_obj.dtype == ">i1"):
-        dtype = 9
-        fmt ='>b'
-    elif (idx_obj.dtype == ">i2"):
-        dtype = 11
-        fmt ='>h'
-    elif (idx_obj.dtype == ">i4"):
-        dtype = 12
-        fmt='>i'
-    elif (idx_obj.dtype == ">f4"):
-        dtype = 13
-        fmt='>f'
-    elif (idx_obj.dtype == ">f8"):
-        dtype = 14
-        fmt='>d'
-    else:
+    # magic number, then the size of every dimension
+    header = bytes([0, 0, _codes[idx_obj.dtype], dims]) + struct.pack(">%iI" % dims, *body.shape)
+
+    with io.open(path, "wb") as idx_file:
+        bytes_written = idx_file.write(header)
+        bytes_written += idx_file.write(body.tobytes())
+
+    expected_bytes_written = 4 + dims * 4 + body.size * body.itemsize
+
+    if not bytes_written == expected_bytes_written:
+        print("Error writing to file! (%i, %i)" % (bytes_written, expected_bytes_written))
+
+def append(path, idx_obj):
+    # Appends the records of idx_obj to an existing IDX file and patches
+    # the record count in its header. Creates the file if it doesn't exist.
+    if not os.path.exists(path):
+        write(path, idx_obj)
+        return
+
+    body = _body(idx_obj)
+
+    with io.open(path, "r+b") as idx_file:
+        dtype, shape = _header(idx_file)
+
+        if dtype != idx_obj.dtype or tuple(shape[1:]) != body.shape[1:]:
+            raise ValueError("The records don't match the datatype or shape of %s." % path)
+
+        # the body ends right where the header says, drop anything after it
+        end = 4 + 4 * len(shape) + int(np.prod(shape, dtype=np.int64)) * body.itemsize
+        if os.path.getsize(path) < end:
+            raise ValueError("%s is shorter than its header says." % path)
+        idx_file.seek(end)
+        idx_file.write(body.tobytes())
+        idx_file.truncate()
+
+        idx_file.seek(4)
+        idx_file.write(struct.pack(">I", shape[0] + len(body)))
+
+def _header(idx_file):
+    # Parses the header and returns the dtype and shape of the body, which
+    # starts right after it at offset 4 + 4 * len(shape).
+    magic_number = idx_file.read(4)
+    if len(magic_number) != 4 or magic_number[2] not in _dtypes:
         raise ValueError('Unknown datatype. Note that only big-endian datatypes are allowed.')
+    dims = magic_number[3]
+    sizes = idx_file.read(4 * dims)
+    if len(sizes) != 4 * dims:
+        raise ValueError('The header is truncated.')
+    shape = struct.unpack(">%iI" % dims, sizes)
+    return _dtypes[magic_number[2]], shape
 
-    dims = len(idx_obj.datashape) + 1
-    shape = np.array([len(idx_obj.body)], dtype=">u4")
-    shape = np.append(shape, idx_obj.datashape, axis=0)
+def _map(path):
+    # Memory-maps the body of an IDX file without reading it.
+    with io.open(path, "rb") as idx_file:
+        dtype, shape = _header(idx_file)
 
-    bytes_written = 0
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", offset=4 + 4 * len(shape), shape=shape)
 
-    magic_number = bytes([0,
-                          0, 
-                          dtype,
-                          dims])
+class reader:
+    # Random access to the records of an IDX file. Only the header is
+    # parsed, records are read on demand with one positioned read per
+    # contiguous run, e.g.
+    #
+    #   with idx.open("mnist/t10k-images.idx3-ubyte") as images:
+    #       image = images[42]
+    #       last = images[-4:]
+    #       some = images[[3, 14, 15]]
 
-    bytes_written += idx_file.write(magic_number)
+    def __init__(self, path):
+        self.path = path
+        self._file = io.open(path, "rb")
+        dtype, shape = _header(self._file)
 
-    for i in range(dims):
-        bytes_written += idx_file.write(struct.pack(">I", shape[i]))
+        self.dtype = np.dtype(dtype)
+        self.shape = tuple(shape)
+        self.datashape = self.shape[1:]
+        self._offset = 4 + 4 * len(shape)
+        self._stride = int(np.prod(self.datashape, dtype=np.int64)) * self.dtype.itemsize
 
-    for index in idx_obj.body:
-        for element in np.nditer(index):
-            bytes_written += idx_file.write(struct.pack(fmt, element))
+    def __len__(self):
+        return self.shape[0]
 
-    expected_bytes_written = 4 + dims * 4 + idx_obj.body.size * idx_obj.body.itemsize
+    def __enter__(self):
+        return self
 
-    if not bytes_written == expected_bytes_written:
-        print("Error writing to file! (%i, %i)" % (bytes_written, expected_bytes_written))
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._file.close()
+
+    def _read(self, start, count):
+        # count records starting at record start
+        size = count * self._stride
+        position = self._offset + start * self._stride
+        if hasattr(os, "pread"):
+            data = os.pread(self._file.fileno(), size, position)
+        else:
+            self._file.seek(position)
+            data = self._file.read(size)
+        if len(data) != size:
+            raise IOError("%s is shorter than its header says." % self.path)
+        return np.frombuffer(data, dtype=self.dtype).reshape((count,) + self.datashape)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            index = int(key) + len(self) if key < 0 else int(key)
+            if not 0 <= index < len(self):
+                raise IndexError("record %i out of range for %i records" % (key, len(self)))
+            return self._read(index, 1)[0]
+
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return self._read(start, max(stop - start, 0))
+            indices = np.arange(start, stop, step)
+        else:
+            indices = np.asarray(key)
+            if indices.dtype == bool:
+                indices = np.flatnonzero(indices)
+            indices = np.where(indices < 0, indices + len(self), indices)
+            if np.any((indices < 0) | (indices >= len(self))):
+                raise IndexError("index out of range for %i records" % len(self))
+
+        # read every run of consecutive records at once
+        result = np.empty((len(indices),) + self.datashape, dtype=self.dtype)
+        order = np.argsort(indices, kind="stable")
+        sorted_indices = indices[order]
+        runs = np.flatnonzero(np.diff(sorted_indices) != 1) + 1
+        for run in np.split(np.arange(len(indices)), runs):
+            if len(run) == 0:
+                continue
+            first = sorted_indices[run[0]]
+            count = sorted_indices[run[-1]] - first + 1
+            result[order[run]] = self._read(int(first), int(count))[sorted_indices[run] - first]
+        return result
+
+def open(path):
+    return reader(path)
+
+def pairs(path):
+    # Lists all (images, labels) file pairs in a directory, e.g. survey/samples.
+    result = list()
+    for file_lbl in sorted(os.listdir(path)):
+        if file_lbl.endswith(".idx1-ubyte"):
+            path_lbl = os.path.join(path, file_lbl)
+            path_img = os.path.splitext(path_lbl)[0] + ".idx3-ubyte"
+            if os.path.exists(path_img):
+                result.append((path_img, path_lbl))
+    return result
+
+def batches(file_pairs, batchsize, buffersize=10000, seed=None, drop_last=False):
+    # Yields shuffled (images, labels) mini-batches from one or more
+    # (images, labels) IDX file pairs. Images are flattened to one row per
+    # sample. The files are memory-mapped and read in chunks through a
+    # shuffle buffer of buffersize samples, so memory use is bounded by the
+    # buffer and not by the dataset size. The files are visited in random
+    # order, so samples are only shuffled across files within the buffer.
+    random = np.random.RandomState(seed)
+    chunk = max(buffersize // 2, 1)
+    # half of the buffer is kept after emitting, so it holds at least two
+    # mini-batches for the other half to fit one
+    buffersize = max(buffersize, 2 * batchsize)
+
+    img_buf = None
+    lbl_buf = None
+    count = 0
+
+    def emit(num):
+        # yields num buffered samples in random order, keeps the rest
+        perm = random.permutation(count)
+        for start in range(0, num, batchsize):
+            index = perm[start:min(start + batchsize, num)]
+            yield img_buf[index], lbl_buf[index]
+        kept = perm[num:]
+        img_buf[:len(kept)] = img_buf[kept]
+        lbl_buf[:len(kept)] = lbl_buf[kept]
+
+    for pair in random.permutation(len(file_pairs)):
+        path_img, path_lbl = file_pairs[pair]
+        img = _map(path_img)
+        lbl = _map(path_lbl)
+        if len(img) != len(lbl):
+            raise ValueError("%s and %s hold a different number of samples." % (path_img, path_lbl))
+        img = img.reshape(len(img), -1)
+
+        if img_buf is None:
+            img_buf = np.empty((buffersize + chunk, img.shape[1]), dtype=img.dtype.newbyteorder("="))
+            lbl_buf = np.empty(buffersize + chunk, dtype=lbl.dtype.newbyteorder("="))
+        elif img.shape[1] != img_buf.shape[1]:
+            raise ValueError("%s doesn't match the sample shape of the other files." % path_img)
+
+        for start in range(0, len(img), chunk):
+            part = slice(start, min(start + chunk, len(img)))
+            num = part.stop - part.start
+            img_buf[count:count+num] = img[part]
+            lbl_buf[count:count+num] = lbl[part]
+            count += num
+
+            if count >= buffersize:
+                num = (count - buffersize // 2) // batchsize * batchsize
+                if num > 0:
+                    yield from emit(num)
+                    count -= num
+
+    if count > 0:
+        num = count if not drop_last else count // batchsize * batchsize
+        yield from emit(num)
 
 def read(path):
-    idx_file = open(path, "rb")
+    idx_file = io.open(path, "rb")
     magic_number = idx_file.read(4) # first 4 bytes
 
     # Magic number:
@@ -105,4 +313,15 @@ def read(path):
 
     idx_obj = file(dtype=dtype, datashape=shape[1:])
     idx_obj.body = data_arr
-    return idx_obj
\ No newline at end of file
+    return idx_obj
+
+def frombytes(data):
+    # Parses an IDX file that was read into memory, e.g. to hash the same
+    # bytes. The body is a read-only view of data.
+    dtype, shape = _header(io.BytesIO(data))
+    body = np.frombuffer(data, dtype=dtype, count=int(np.prod(shape, dtype=np.int64)),
+                         offset=4 + 4 * len(shape)).reshape(shape)
+
+    idx_obj = file(dtype=dtype, datashape=shape[1:])
+    idx_obj.body = body
+    return idx_obj
@@ -6,19 +6,79 @@ import numpy as np
 # loosely inspired by http://abel.ee.ucla.edu/cvxopt/_downloads/mnist.py
 # which is GPL licensed.
 
+# Arrays returned by load(), keyed by file path and normalization, so
+# repeated calls in the same process don't touch the disk again.
+_cache = dict()
+
+def _paths(dataset, path):
+    if dataset == "training":
+        return (os.path.join(path, 'train-images.idx3-ubyte'),
+                os.path.join(path, 'train-labels.idx1-ubyte'))
+    elif dataset == "testing":
+        return (os.path.join(path, 't10k-images.idx3-ubyte'),
+                os.path.join(path, 't10k-labels.idx1-ubyte'))
+    else:
+        raise ValueError("dataset must be 'testing' or 'training'")
+
+def _map_idx(fname, magic_number, dims):
+    # Memory-maps the body of an IDX ubyte file without reading it.
+    with open(fname, 'rb') as f:
+        header = struct.unpack(">%iI" % (dims + 1), f.read(4 * (dims + 1)))
+    if header[0] != magic_number:
+        raise ValueError("%s is not an MNIST IDX file." % fname)
+    num = header[1]
+    size = int(np.prod(header[2:], dtype=np.int64))
+    shape = (num, size) if dims > 1 else (num,)
+    return np.memmap(fname, dtype=np.uint8, mode='r', offset=4 * (dims + 1), shape=shape)
+
+def _normalized(fname_img, img):
+    # float32 images in [0, 1], cached next to the IDX file as .npy so
+    # other processes can memory-map (and share) the converted data.
+    fname_npy = os.path.splitext(fname_img)[0] + ".float32.npy"
+    try:
+        if os.path.getmtime(fname_npy) >= os.path.getmtime(fname_img):
+            arr = np.load(fname_npy, mmap_mode='r')
+            if arr.shape == img.shape:
+                return arr
+    except (OSError, ValueError):
+        pass
+
+    arr = np.multiply(img, np.float32(1 / 255), dtype=np.float32)
+    try:
+        # write to a temporary file first so readers never see a partial cache
+        fname_tmp = "%s.%i.tmp" % (fname_npy, os.getpid())
+        with open(fname_tmp, 'wb') as f:
+            np.save(f, arr)
+        os.replace(fname_tmp, fname_npy)
+    except OSError:
+        pass # read-only data directory, keep the array in memory only
+    return arr
+
+def load(dataset = "training", path = ".", normalize = False):
+    # Loads the MNIST data set without copying it. Returns a tuple of
+    # (N, 784) images and (N,) labels. The images are memory-mapped uint8
+    # pixel values (pyceptron scales them to [0, 1] itself) or, with
+    # normalize, float32 values in [0, 1].
+    fname_img, fname_lbl = _paths(dataset, path)
+    key = (os.path.abspath(fname_img), normalize)
+
+    if key not in _cache:
+        img = _map_idx(fname_img, 2051, 3)
+        lbl = _map_idx(fname_lbl, 2049, 1)
+        if len(img) != len(lbl):
+            raise ValueError("The number of images and labels doesn't match.")
+        if normalize:
+            img = _normalized(fname_img, img)
+        _cache[key] = (img, lbl)
+
+    return _cache[key]
+
 def read(dataset = "training", path = "."):
     # Python function for importing the MNIST data set.  It returns an iterator
     # of 2-tuplesq2f s with the first element being the label and the second element
     # being a numpy.uint8 2D array of pixel data for the given image.
 
-    if dataset is "training":
-        fname_img = os.path.join(path, 'train-images.idx3-ubyte')
-        fname_lbl = os.path.join(path, 'train-labels.idx1-ubyte')
-    elif dataset is "testing":
-        fname_img = os.path.join(path, 't10k-images.idx3-ubyte')
-        fname_lbl = os.path.join(path, 't10k-labels.idx1-ubyte')
-    else:
-        raise ValueError("dataset must be 'testing' or 'training'")
+    fname_img, fname_lbl = _paths(dataset, path)
 
     # Load everything in some numpy arrays
     with open(fname_lbl, 'rb') as flbl:
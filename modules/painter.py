@@ -1,4 +1,5 @@
 from PyQt5 import QtGui, QtCore, QtWidgets
+import numpy as np
 
 # This class represents a single point with x and y coordinates.
 class Point:
@@ -25,50 +26,176 @@ class Shape:
         self.location = location
         self.index = index
 
-# Holds information about the drawing as whole, combining multiple Shapes
+# Holds information about the drawing as whole, combining multiple Shapes.
+# The points are stored in growable NumPy columns (x, y and the index of
+# their shape, i.e. stroke) and in a uniform grid of cells, so the eraser
+# only looks at the points near it. Erased points are only marked until
+# they make up half of the columns, and a stroke the eraser cuts through is
+# split by giving the pieces after the cut new, negative indices (which
+# addShape never gets), so no other stroke is renumbered. Every index
+# stands for one run of consecutive points: if the points of a stroke can't
+# continue the run of its last point, because erasing cut the stroke, they
+# start a new run with a new negative index as well.
+# The points of a stroke must be added one after another, as Painter does.
 class Shapes:
-    # Stores all the shapes
-    __Shapes = []
+    # Width and height of the cells of the spatial index in pixels
+    cellSize = 32
 
     # Constructor
     def __init__(self):
-        self.__Shapes = []
+        self.__x = np.empty(256, dtype=np.float64)
+        self.__y = np.empty(256, dtype=np.float64)
+        self.__index = np.empty(256, dtype=np.int64)
+        self.__alive = np.empty(256, dtype=bool)
+        self.__length = 0 # stored points, including erased ones
+        self.__erased = 0
+        self.__nextSplit = -1 # index of the next piece of a split stroke
+        self.__ranges = {} # start and end position of the points of every stroke
+        self.__grid = {} # positions of the points in every cell
+        self.__live = None # positions of the points not erased, if known
+        self.__drawing = None # index passed to addShape and index of its run
 
     # Returns the number of shapes being stored.
     def getNumberOfShapes(self):
-        return len(self.__Shapes)
+        return self.__length - self.__erased
 
     # Add a shape to the database, recording its position,
     # width, colour and shape relation information
     def addShape(self, location, index):
-        shape = Shape(location, index)
-        self.__Shapes.append(shape)
+        position = self.__length
+        if position == len(self.__x):
+            self.__resize(2 * position)
+
+        shape = index
+        if self.__drawing is not None and self.__drawing[0] == shape:
+            index = self.__drawing[1]
+        if index in self.__ranges and self.__ranges[index][1] == position:
+            self.__ranges[index][1] += 1
+        else:
+            if index in self.__ranges:
+                # an earlier run of the stroke is left
+                index = self.__nextSplit
+                self.__nextSplit -= 1
+            self.__ranges[index] = [position, position + 1]
+        self.__drawing = (shape, index)
+
+        self.__x[position] = location.x
+        self.__y[position] = location.y
+        self.__index[position] = index
+        self.__alive[position] = True
+        self.__length += 1
+        self.__live = None
+
+        cell = (int(location.x // self.cellSize), int(location.y // self.cellSize))
+        self.__grid.setdefault(cell, []).append(position)
 
     # returns the shape at the requested index.
     def getShape(self, index):
-        return self.__Shapes[index]
+        position = self.__positions()[index]
+        return Shape(Point(self.__x[position], self.__y[position]), int(self.__index[position]))
+
+    # Returns the x and y coordinates of all points as an (n, 2) array
+    # and the index of the shape of every point (see preprocess.render).
+    def getArrays(self):
+        positions = self.__positions()
+        points = np.stack((self.__x[positions], self.__y[positions]), axis=1)
+        return points, self.__index[positions]
 
     # Removes any point data within a certain threshold of a point.
     def removeShapeAtLoc(self, location, threshold):
-        # while True is neccessary so the list size can change in the loop
-        i = 0
-        while True:
-            if(i==len(self.__Shapes)):
-                break 
-            # finds if a point is within a certain distance of the point to remove.
-            if((abs(location.x - self.__Shapes[i].location.x) < threshold) and (abs(location.y - self.__Shapes[i].location.y) < threshold)):
-                # removes all data for that index
-                del self.__Shapes[i]
-
-                # goes through the rest of the data and adds an extra
-                # 1 to defined them as a seprate shape and shuffles on the effect.
-                for n in range(len(self.__Shapes)-i):
-                    self.__Shapes[n+i].index += 1
-                # Go back a step so we dont miss a point.
-                i -= 1
-            i += 1
+        # only the cells the square around the location reaches
+        first = (int((location.x - threshold) // self.cellSize), int((location.y - threshold) // self.cellSize))
+        last = (int((location.x + threshold) // self.cellSize), int((location.y + threshold) // self.cellSize))
+        near = [self.__grid.get((column, row), ()) for column in range(first[0], last[0] + 1)
+                                                   for row in range(first[1], last[1] + 1)]
+        near = np.fromiter((position for cell in near for position in cell), dtype=np.int64)
+        if len(near) == 0:
+            return
+
+        hit = (self.__alive[near] & (np.abs(location.x - self.__x[near]) < threshold)
+                                  & (np.abs(location.y - self.__y[near]) < threshold))
+        hit = near[hit]
+        if len(hit) == 0:
+            return
+
+        self.__alive[hit] = False
+        self.__erased += len(hit)
+        self.__live = None
+        for index in np.unique(self.__index[hit]):
+            self.__split(int(index))
+
+        if self.__erased > self.__length // 2:
+            self.__compact()
+
+    # Gives every piece of a stroke that is left after erasing points its
+    # own index, the first piece keeps the index of the stroke.
+    def __split(self, index):
+        start, end = self.__ranges.pop(index)
+        alive = self.__alive[start:end]
+        before = np.concatenate(([False], alive[:-1]))
+        after = np.concatenate((alive[1:], [False]))
+        starts = np.flatnonzero(alive & ~before) + start
+        ends = np.flatnonzero(alive & ~after) + start + 1
+
+        drawing = self.__drawing is not None and self.__drawing[1] == index
+        for piece in range(len(starts)):
+            if piece > 0:
+                index = self.__nextSplit
+                self.__nextSplit -= 1
+                self.__index[starts[piece]:ends[piece]] = index
+            self.__ranges[index] = [starts[piece], ends[piece]]
+
+            # the stroke being drawn continues its last piece
+            if drawing and ends[piece] == self.__length:
+                self.__drawing = (self.__drawing[0], index)
+
+    # Positions of all points that are not erased.
+    def __positions(self):
+        if self.__live is None:
+            self.__live = np.flatnonzero(self.__alive[:self.__length])
+        return self.__live
+
+    def __resize(self, capacity):
+        self.__x = self.__grow(self.__x, capacity)
+        self.__y = self.__grow(self.__y, capacity)
+        self.__index = self.__grow(self.__index, capacity)
+        self.__alive = self.__grow(self.__alive, capacity)
+
+    def __grow(self, column, capacity):
+        grown = np.empty(capacity, dtype=column.dtype)
+        grown[:self.__length] = column[:self.__length]
+        return grown
+
+    # Drops the erased points and rebuilds the ranges and the grid.
+    def __compact(self):
+        keep = self.__positions()
+        length = len(keep)
+        self.__x[:length] = self.__x[keep]
+        self.__y[:length] = self.__y[keep]
+        self.__index[:length] = self.__index[keep]
+        self.__alive[:length] = True
+        self.__length = length
+        self.__erased = 0
+        self.__live = None
+
+        index = self.__index[:length]
+        starts = np.flatnonzero(np.concatenate(([True], index[1:] != index[:-1])))[:length]
+        ends = np.concatenate((starts[1:], [length]))
+        self.__ranges = {int(index[start]): [start, end] for start, end in zip(starts, ends)}
+
+        self.__grid = {}
+        columns = (self.__x[:length] // self.cellSize).astype(np.int64)
+        rows = (self.__y[:length] // self.cellSize).astype(np.int64)
+        for position, cell in enumerate(zip(columns.tolist(), rows.tolist())):
+            self.__grid.setdefault(cell, []).append(position)
 
 class Painter(QtWidgets.QFrame):
+    # Width of the pen, see preprocess.PEN_WIDTH
+    penWidth = 25.0
+
+    # Emitted whenever points are added to the drawing or it is cleared
+    changed = QtCore.pyqtSignal()
+
     def __init__(self, parent):
         QtWidgets.QFrame.__init__(self, parent)
         self.isPainting = False
@@ -77,6 +204,12 @@ class Painter(QtWidgets.QFrame):
         self.img = QtGui.QImage()
         self.imgActive = False
 
+        # The drawing is kept in a transparent image of the size of the
+        # widget. New segments are drawn onto it as they come in and only
+        # their bounding rect is repainted, so painting doesn't depend on
+        # the length of the drawing.
+        self.canvas = QtGui.QImage()
+
         self.mouseLoc = Point(0,0)  
         self.lastPos = Point(0,0)  
         self.drawingShapes = Shapes()
@@ -87,7 +220,9 @@ class Painter(QtWidgets.QFrame):
         self.drawingShapes = Shapes()
         self.shapeNum = 0
         self.imgActive = False
-        self.repaint()
+        self.canvas.fill(QtCore.Qt.transparent)
+        self.update()
+        self.changed.emit()
 
     #Mouse down event
     def mousePressEvent(self, event):
@@ -96,8 +231,12 @@ class Painter(QtWidgets.QFrame):
             self.lastPos = Point(event.x(), event.y())
             self.shapeNum += 1
             self.drawingShapes.addShape(self.lastPos, self.shapeNum)
-            self.imgActive = False
-            self.repaint()
+            self.drawSegment(self.lastPos, self.lastPos)
+            if (self.imgActive):
+                # the preview covers the whole canvas
+                self.imgActive = False
+                self.update()
+            self.changed.emit()
         elif event.button() == QtCore.Qt.RightButton:
             self.clearCanvas()
 
@@ -106,37 +245,86 @@ class Painter(QtWidgets.QFrame):
         if (self.isPainting == True):
             self.mouseLoc = Point(event.x(), event.y())
             if (self.lastPos.x != self.mouseLoc.x) or (self.lastPos.y != self.mouseLoc.y):
-                self.lastPos = Point(event.x(), event.y())
-                self.drawingShapes.addShape(self.lastPos, self.shapeNum)
-            self.repaint()
+                # store the point first, a stale canvas is redrawn from the shapes
+                self.drawingShapes.addShape(self.mouseLoc, self.shapeNum)
+                self.drawSegment(self.lastPos, self.mouseLoc)
+                self.lastPos = self.mouseLoc
+                self.changed.emit()
 
     #Mose Up Event
     def mouseReleaseEvent(self, event):
         if(self.isPainting == True):
             self.isPainting = False
 
-    def drawLines(self, painter):
-        painter.setRenderHint(QtGui.QPainter.Antialiasing)     
+    def createPen(self):
+        return QtGui.QPen(QtGui.QColor(0.0 ,0.0 ,0.0), self.penWidth, QtCore.Qt.SolidLine, QtCore.Qt.RoundCap)
+
+    # Draws the line from start to end (a point if both are the same) onto
+    # the canvas and schedules a repaint of the area it covers.
+    def drawSegment(self, start, end):
+        if self.canvas.size() != self.size():
+            self.redrawCanvas()
+            self.update()
+            return
+
+        painter = QtGui.QPainter()
+        painter.begin(self.canvas)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(self.createPen())
+        painter.drawPoint(end.x, end.y)
+        if (start.x != end.x) or (start.y != end.y):
+            painter.drawLine(start.x, start.y, end.x, end.y)
+        painter.end()
 
-        pen = QtGui.QPen(QtGui.QColor(0.0 ,0.0 ,0.0), 25.0, QtCore.Qt.SolidLine, QtCore.Qt.RoundCap)
-        painter.setPen(pen) 
+        # the pen reaches half its width past the points, one more pixel for antialiasing
+        margin = int(self.penWidth / 2) + 2
+        rect = QtCore.QRect(QtCore.QPoint(min(start.x, end.x), min(start.y, end.y)),
+                            QtCore.QPoint(max(start.x, end.x), max(start.y, end.y)))
+        self.update(rect.adjusted(-margin, -margin, margin, margin))
 
-        for i in range(self.drawingShapes.getNumberOfShapes()):
-            T1 = self.drawingShapes.getShape(i)
+    # Draws the whole drawing onto a new canvas of the size of the widget,
+    # needed only when the size changes or shapes are removed.
+    def redrawCanvas(self):
+        self.canvas = QtGui.QImage(self.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.canvas.fill(QtCore.Qt.transparent)
 
-            painter.drawPoint(T1.location.x, T1.location.y)
+        painter = QtGui.QPainter()
+        painter.begin(self.canvas)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(self.createPen())
+
+        points, indices = self.drawingShapes.getArrays()
+        for i in range(len(points)):
+            painter.drawPoint(QtCore.QPointF(*points[i]))
+
+            if (i > 0 and indices[i] == indices[i-1]):
+                painter.drawLine(QtCore.QPointF(*points[i-1]), QtCore.QPointF(*points[i]))
+
+        painter.end()
+
+    # Draws the drawing with another painter, e.g. onto an image. Reads the
+    # canvas instead of drawing every shape again.
+    def drawLines(self, painter):
+        if self.canvas.size() != self.size():
+            self.redrawCanvas()
+        painter.drawImage(0, 0, self.canvas)
 
-            if (i > 0):
-                T = self.drawingShapes.getShape(i-1)
+    # Returns the points and shape indices of the drawing and the height
+    # of the canvas, the arguments of preprocess.digit.
+    def getStrokes(self):
+        points, indices = self.drawingShapes.getArrays()
+        return points, indices, self.geometry().height()
 
-                if (T.index == T1.index):
-                    painter.drawLine(T.location.x,T.location.y,T1.location.x,T1.location.y)
+    def resizeEvent(self, event):
+        QtWidgets.QFrame.resizeEvent(self, event)
+        self.redrawCanvas()
 
     def paintEvent(self, event):
         QtWidgets.QFrame.paintEvent(self, event)
         painter = QtGui.QPainter()
         painter.begin(self)
-        self.drawLines(painter)
+        # only the dirty part of the canvas is copied
+        painter.drawImage(event.rect(), self.canvas, event.rect())
         if (self.imgActive):
             rect = self.geometry()
             rect.moveTopLeft(QtCore.QPoint(0, 0))
@@ -146,4 +334,4 @@ class Painter(QtWidgets.QFrame):
     def showImage(self, img):
         self.imgActive = True
         self.img = img
-        self.repaint()
\ No newline at end of file
+        self.update()
@@ -0,0 +1,132 @@
+######################################
+#            parallel.py             #
+#------------------------------------#
+#  Data-parallel training of one     #
+#  pyceptron.Network across several  #
+#  worker processes.                 #
+######################################
+
+# Every worker holds a copy of the network and a contiguous shard of the
+# training set. In each step, every worker accumulates the gradients of
+# batchsize / workers samples of its shard and writes them to its row of a
+# shared-memory buffer. After a barrier, all workers sum the rows in the
+# same order and apply the same update, so all copies stay identical.
+# Each update therefore averages over batchsize samples, like
+# network.train does, but the samples of a batch come from all shards.
+#
+# On platforms that spawn instead of fork (Windows), the calling script
+# must guard its entry point with if __name__ == "__main__".
+
+import ctypes
+import multiprocessing as mp
+import numpy as np
+import pyceptron
+
+def _share(array):
+    # Copies an array into shared memory that is inherited by the workers.
+    array = np.ascontiguousarray(array)
+    raw = mp.RawArray(ctypes.c_char, max(array.nbytes, 1))
+    view = np.frombuffer(raw, dtype=array.dtype, count=array.size).reshape(array.shape)
+    view[...] = array
+    return (raw, array.dtype.str, array.shape)
+
+def _view(shared):
+    raw, dtype, shape = shared
+    count = int(np.prod(shape))
+    return np.frombuffer(raw, dtype=dtype, count=count).reshape(shape)
+
+def _worker(rank, workers, architecture, activation, softmax, dtype, images, labels,
+            params, grads, barrier, epochs, batchsize, eta):
+    network = pyceptron.Network(architecture, activation=activation, softmax=softmax, dtype=dtype)
+
+    params = np.frombuffer(params, dtype=dtype)
+    grads = np.frombuffer(grads, dtype=dtype).reshape(workers, -1)
+    network.set_parameters(params)
+
+    images = _view(images)
+    labels = _view(labels)
+
+    shard_size = len(labels) // workers
+    shard_start = rank * shard_size
+    local_batchsize = batchsize // workers
+    steps = shard_size // local_batchsize
+
+    for epoch in range(epochs):
+        for step in range(steps):
+            start = shard_start + step * local_batchsize
+            end = start + local_batchsize
+            network.accumulate_gradients(images[start:end], labels[start:end])
+            network.get_gradients(out=grads[rank])
+
+            barrier.wait()
+            network.set_gradients(grads.sum(axis=0))
+            network.apply_gradients(eta / (local_batchsize * workers))
+            # don't overwrite a row another worker is still summing
+            barrier.wait()
+
+    if rank == 0:
+        network.get_parameters(out=params)
+
+class ParallelTrainer:
+    # images: (N, input dimension) array of float64, float32 or uint8 values
+    #         (uint8 values are scaled to [0, 1] by the network).
+    # labels: (N,) array of class indices.
+    # workers: Number of worker processes, by default one per CPU.
+    def __init__(self, images, labels, workers=None):
+        if len(images) != len(labels):
+            raise ValueError("There must be one label per image.")
+        if workers is None:
+            workers = mp.cpu_count()
+        if workers < 1:
+            raise ValueError("There must be at least one worker.")
+
+        self.workers = workers
+        self.images = images
+        self.labels = labels
+
+        if workers > 1:
+            self.shared_images = _share(images)
+            self.shared_labels = _share(labels)
+
+    # Trains the network in place with mini-batches of batchsize samples.
+    # The samples at the end of each shard that don't fill a whole batch
+    # are skipped. With one worker, this simply calls network.train.
+    def train(self, network, epochs=1, batchsize=100, eta=0.005):
+        if self.workers == 1:
+            network.train(self.images, epochs=epochs, batchsize=batchsize, eta=eta, labels=self.labels)
+            return
+
+        # checked here, a worker's error would only show as a failed worker
+        if batchsize < self.workers or batchsize % self.workers != 0:
+            raise ValueError("The batch size must be a positive multiple of the number of workers.")
+        if len(self.labels) // self.workers < batchsize // self.workers:
+            raise ValueError("The shard of every worker must hold at least %i samples." % (batchsize // self.workers))
+
+        ctype = ctypes.c_float if network.dtype == "float32" else ctypes.c_double
+        params = mp.RawArray(ctype, network.num_parameters)
+        grads = mp.RawArray(ctype, self.workers * network.num_parameters)
+        network.get_parameters(out=np.frombuffer(params, dtype=network.dtype))
+        barrier = mp.Barrier(self.workers)
+
+        processes = list()
+        for rank in range(self.workers):
+            process = mp.Process(target=_worker, args=(rank, self.workers, network.architecture,
+                                                       network.activation, network.softmax, network.dtype,
+                                                       self.shared_images, self.shared_labels,
+                                                       params, grads, barrier, epochs, batchsize, eta))
+            process.start()
+            processes.append(process)
+
+        # a crashed worker would leave the others waiting at the barrier forever
+        failed = False
+        while any(process.is_alive() for process in processes):
+            for process in processes:
+                process.join(timeout=0.1)
+                if process.exitcode not in (None, 0) and not failed:
+                    failed = True
+                    barrier.abort()
+
+        if failed or any(process.exitcode != 0 for process in processes):
+            raise RuntimeError("A training worker failed.")
+
+        network.set_parameters(np.frombuffer(params, dtype=network.dtype))
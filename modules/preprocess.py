@@ -0,0 +1,198 @@
+######################################
+#           preprocess.py            #
+#------------------------------------#
+#  Turns the strokes drawn on a      #
+#  canvas into the input vector of   #
+#  a network, shared by all GUIs.    #
+######################################
+
+# The strokes are rasterized straight into a small supersampled buffer
+# instead of a full-size QImage: every stroke is sampled at least once per
+# buffer pixel and a disk the size of the pen is stamped at every sample,
+# all with array indexing. Averaging blocks of supersample x supersample
+# pixels gives the antialiased 28x28 image. The digit is then moved so
+# that its center of mass lies in the middle, like the MNIST digits, by a
+# whole number of pixels, which only copies a slice of the image.
+#
+# A canvas holding several characters is split into them by segment, and
+# all characters are rasterized together as a stack of images.
+#
+# Canvases are square, the strokes are scaled by the canvas height.
+
+import functools
+import numpy as np
+
+SIZE = 28 # width and height of the images
+SUPERSAMPLE = 4 # buffer pixels per image pixel in each direction
+PEN_WIDTH = 25.0 # width of the pen on the canvas, see painter.Painter
+
+
+@functools.lru_cache(maxsize=8)
+def _disk(radius):
+    # Offsets of all buffer pixels whose center lies within radius of the
+    # center of pixel (0, 0).
+    reach = int(np.ceil(radius))
+    dy, dx = np.mgrid[-reach:reach + 1, -reach:reach + 1]
+    inside = dy**2 + dx**2 <= radius**2
+    return dy[inside], dx[inside]
+
+
+def rasterize(points, strokes, images, count, pen_width, size=SIZE, supersample=SUPERSAMPLE):
+    # Rasterizes strokes into count (size, size) float32 images of the ink
+    # coverage in [0, 1], all in one pass. points holds the x and y
+    # coordinates of all points in image pixels, strokes the stroke index
+    # and images the image index of every point; consecutive points of the
+    # same stroke and image are joined by lines. pen_width is in image
+    # pixels as well.
+    fine = size * supersample
+    radius = pen_width / 2 * supersample
+    dy, dx = _disk(radius)
+
+    # the buffers have a margin the size of the pen, so no stamp needs clipping
+    margin = int(np.ceil(radius)) + 1
+    width = fine + 2 * margin
+    buffer = np.zeros(count * width * width, dtype=bool)
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2) * supersample
+    strokes = np.asarray(strokes)
+    images = np.asarray(images, dtype=np.int64)
+    if len(points) > 0:
+        # sample every line at least once per buffer pixel
+        joined = (strokes[1:] == strokes[:-1]) & (images[1:] == images[:-1])
+        start = points[:-1][joined]
+        step = points[1:][joined] - start
+        counts = np.maximum(np.ceil(np.hypot(step[:, 0], step[:, 1])).astype(np.int64), 1)
+        line = np.repeat(np.arange(len(start)), counts)
+        t = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t = t / counts[line]
+        samples = np.concatenate((points, start[line] + step[line] * t[:, None]))
+        owner = np.concatenate((images, images[:-1][joined][line]))
+
+        # stamp the pen once at every buffer pixel holding a sample
+        cells = np.clip(np.floor(samples).astype(np.int64) + margin, 0, width - 1)
+        cells = np.unique((owner * width + cells[:, 1]) * width + cells[:, 0])
+        buffer[(cells[:, None] + (dy * width + dx)).ravel()] = True
+
+    # sum the blocks with strided adds, which is several times faster than
+    # reducing the short block axes
+    ink = buffer.view(np.uint8).reshape(count, width, width)[:, margin:margin + fine, margin:margin + fine]
+    rows = ink[:, 0::supersample].astype(np.int32)
+    for k in range(1, supersample):
+        rows += ink[:, k::supersample]
+    blocks = rows[:, :, 0::supersample].copy()
+    for k in range(1, supersample):
+        blocks += rows[:, :, k::supersample]
+    return blocks.astype(np.float32) / supersample**2
+
+
+def render(points, strokes, height, size=SIZE, supersample=SUPERSAMPLE, pen_width=PEN_WIDTH):
+    # Rasterizes the strokes of a canvas into a (size, size) float32 image
+    # of the ink coverage in [0, 1]. points holds the x and y canvas
+    # coordinates of all points, strokes the stroke index of every point.
+    scale = size / height
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2) * scale
+    return rasterize(points, strokes, np.zeros(len(points), dtype=np.int64), 1, pen_width * scale, size, supersample)[0]
+
+
+def center(image):
+    # Moves the center of mass of an image (or of each of a stack of
+    # images) to its middle by a whole number of pixels. Returns new images.
+    size = image.shape[-1]
+    images = image.reshape(-1, size, size)
+    index = np.arange(size, dtype=np.float32)
+    mass = images.sum(axis=(1, 2))
+    empty = mass == 0
+    mass[empty] = 1
+
+    shift = np.stack((size / 2 - images.sum(axis=2) @ index / mass,
+                      size / 2 - images.sum(axis=1) @ index / mass), axis=1)
+    shift = np.rint(shift).astype(np.int64)
+    shift[empty] = 0
+    shift = np.clip(shift, -size, size)
+
+    # read every image from a window of a zero padded copy
+    padded = np.zeros((len(images), 3 * size, 3 * size), dtype=image.dtype)
+    padded[:, size:2 * size, size:2 * size] = images
+    rows = size - shift[:, 0, None] + np.arange(size)
+    cols = size - shift[:, 1, None] + np.arange(size)
+    centered = padded[np.arange(len(images))[:, None, None], rows[:, :, None], cols[:, None, :]]
+    return centered.reshape(image.shape)
+
+
+def digit(points, strokes, height):
+    # Returns the centered (28, 28) float32 image of a canvas, 1 is ink.
+    return center(render(points, strokes, height))
+
+
+def segment(points, strokes, height, pen_width=PEN_WIDTH):
+    # Splits a drawing into its characters. Strokes whose ink touches (at
+    # the resolution of the images) or that lie above one another, like
+    # the bar of a 5, belong to the same character. Returns the character
+    # index of every point, counted from left to right, and the number of
+    # characters.
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) == 0:
+        return np.zeros(0, dtype=np.int64), 0
+
+    stroke = np.unique(strokes, return_inverse=True)[1].reshape(-1)
+    count = stroke.max() + 1
+    if count == 1:
+        return stroke, 1
+
+    scale = SIZE / height
+    ink = rasterize(points * scale, stroke, stroke, count, pen_width * scale, supersample=1) > 0
+    ink = ink.reshape(count, -1).astype(np.float32)
+    connected = ink @ ink.T > 0
+
+    left = np.full(count, np.inf)
+    right = np.full(count, -np.inf)
+    np.minimum.at(left, stroke, points[:, 0] - pen_width / 2)
+    np.maximum.at(right, stroke, points[:, 0] + pen_width / 2)
+    overlap = np.minimum.outer(right, right) - np.maximum.outer(left, left)
+    connected |= overlap > np.minimum.outer(right - left, right - left) / 2
+
+    # join the strokes of a character until nothing changes
+    while True:
+        joined = connected.astype(np.float32) @ connected.astype(np.float32) > 0
+        if (joined == connected).all():
+            break
+        connected = joined
+
+    # number the characters by their left edge
+    character = np.unique(connected.argmax(axis=1), return_inverse=True)[1].reshape(-1)
+    edges = np.full(character.max() + 1, np.inf)
+    np.minimum.at(edges, character, left)
+    order = np.argsort(np.argsort(edges))
+    return order[character][stroke], len(edges)
+
+
+def characters(points, strokes, labels, count, height, box=20, pen_width=PEN_WIDTH):
+    # Returns (count, 28, 28) float32 images of the characters of a
+    # drawing, see segment. Like the MNIST digits, every character is
+    # scaled to fit a box x box square and centered by its center of mass.
+    # The pen keeps the width it has when a whole canvas is rendered, and
+    # tiny characters (e.g. a dot) are scaled up at most twice as much.
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    labels = np.asarray(labels, dtype=np.int64)
+    low = np.full((count, 2), np.inf)
+    high = np.full((count, 2), -np.inf)
+    np.minimum.at(low, labels, points)
+    np.maximum.at(high, labels, points)
+
+    extent = np.maximum((high - low).max(axis=1), 1)
+    scale = np.minimum(box / extent, 2 * SIZE / height)
+    middle = (low + high) / 2
+    fitted = (points - middle[labels]) * scale[labels, None] + SIZE / 2
+    return center(rasterize(fitted, strokes, labels, count, pen_width * SIZE / height))
+
+
+def to_input(image):
+    # Returns an image (or a stack of images) as the contiguous float32
+    # input vector (or matrix) of a network.
+    image = np.ascontiguousarray(image, dtype=np.float32)
+    return image.reshape(-1) if image.ndim == 2 else image.reshape(len(image), -1)
+
+
+def to_uint8(image):
+    # Returns an image as uint8 pixels, 255 is ink, like the IDX files.
+    return np.rint(image * 255).astype(np.uint8)
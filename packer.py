@@ -1,42 +1,165 @@
 import sys
 import getopt
 import os
+import json
+import hashlib
+import multiprocessing as mp
 import numpy as np
 sys.path.append("modules")
 import idx
 
+# The manifest lists every sample file that is already part of the packed
+# files (size, modification time, number of records and the hash of their
+# bytes), so a run only has to read files that are new or have grown since
+# the last one. A file whose packed records are unchanged only had records
+# appended (like survey.py does), and only those are packed.
+MANIFEST = "manifest.json"
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def readFile(path, entry):
+    # Returns the records of a sample file that aren't packed yet and its
+    # new manifest entry, or None if the packed records changed. The file
+    # is read once, the hash covers the same bytes that are parsed.
+    stat = fingerprint(path)
+    with open(path, "rb") as sample_file:
+        body = idx.frombytes(sample_file.read()).body
+
+    packed = 0 if entry is None else entry["records"]
+    digest = hashlib.sha1(body[:packed])
+    if entry is not None and (len(body) < packed or digest.hexdigest() != entry["hash"]):
+        return None
+    digest.update(body[packed:])
+    return body[packed:], dict(stat, records=len(body), hash=digest.hexdigest())
+
+def readPair(item):
+    # Runs in the worker processes.
+    pair, entries = item
+    result = [readFile(path, entry) for path, entry in zip(pair, entries)]
+    if result[0] is None or result[1] is None:
+        return None
+    if len(result[0][0]) != len(result[1][0]):
+        raise ValueError("%s and %s hold a different number of samples." % pair)
+    return result[0][0], result[1][0], {os.path.basename(path): result[i][1] for i, path in enumerate(pair)}
+
+def isPacked(path, manifest):
+    entry = manifest.get(os.path.basename(path))
+    if entry is None:
+        return False
+    stat = fingerprint(path)
+    if stat["size"] == entry["size"] and stat["mtime"] == entry["mtime"]:
+        return True
+    if stat["size"] != entry["size"]:
+        return False
+    # touched but maybe not changed
+    if readFile(path, entry) is None:
+        return False
+    entry.update(stat)
+    return True
+
+def countRecords(path):
+    with idx.open(path) as records:
+        return len(records)
+
+def loadManifest(out_path, path_img, path_lbl):
+    # Returns the manifest if the packed files are consistent with it.
+    path_manifest = os.path.join(out_path, MANIFEST)
+    if not (os.path.exists(path_manifest) and os.path.exists(path_img) and os.path.exists(path_lbl)):
+        return None
+    with open(path_manifest, "r") as manifest_file:
+        manifest = json.load(manifest_file)
+    samples = manifest.pop("samples", -1)
+    if countRecords(path_img) != samples or countRecords(path_lbl) != samples:
+        return None
+    return manifest
+
+def saveManifest(out_path, manifest, samples):
+    path_manifest = os.path.join(out_path, MANIFEST)
+    manifest = dict(manifest, samples=samples)
+    with open(path_manifest + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=1, sort_keys=True)
+    os.replace(path_manifest + ".tmp", path_manifest)
+
+def readPairs(file_pairs, manifest, workers):
+    # Reads the records of the pairs past those in the manifest.
+    items = [(pair, [manifest.get(os.path.basename(path)) for path in pair]) for pair in file_pairs]
+    if len(items) > 1 and workers > 1:
+        with mp.Pool(min(workers, len(items))) as pool:
+            return pool.map(readPair, items, chunksize=max(1, len(items) // (4 * workers)))
+    return [readPair(item) for item in items]
+
 def main(argv):
     in_path = ''
     out_path = ''
+    rebuild = False
+    workers = mp.cpu_count()
     try:
-        opts, args = getopt.getopt(argv,"hi:o:",[])
+        opts, args = getopt.getopt(argv,"hri:o:j:",[])
     except getopt.GetoptError:
-        print('packer.py -i <inputpath> -o <outputpath>')
+        print('packer.py -i <inputpath> -o <outputpath> [-j <workers>] [-r]')
         sys.exit(2)
     for opt, arg in opts:
         if opt == '-h':
-            print('packer.py -i <inputpath> -o <outputpath>')
+            print('packer.py -i <inputpath> -o <outputpath> [-j <workers>] [-r]')
+            print('  -r  repack everything instead of appending new sample files')
             sys.exit()
         elif opt in ("-i"):
             in_path = arg
         elif opt in ("-o"):
             out_path = arg
+        elif opt in ("-j"):
+            workers = int(arg)
+        elif opt in ("-r"):
+            rebuild = True
 
+    path_img = os.path.join(out_path, "img.idx3-ubyte")
+    path_lbl = os.path.join(out_path, "lbl.idx1-ubyte")
+
+    file_pairs = [pair for pair in idx.pairs(in_path)
+                  if os.path.abspath(pair[0]) != os.path.abspath(path_img)]
+
+    manifest = None if rebuild else loadManifest(out_path, path_img, path_lbl)
+
+    if manifest is not None:
+        names = set(os.path.basename(path) for pair in file_pairs for path in pair)
+        if not names.issuperset(manifest) or not all("records" in entry for entry in manifest.values()):
+            # sample files were removed or the manifest is older, the packed
+            # files have to be rebuilt
+            manifest = None
+
+    if manifest is not None:
+        new_pairs = [pair for pair in file_pairs if not (isPacked(pair[0], manifest) and isPacked(pair[1], manifest))]
+        results = readPairs(new_pairs, manifest, workers)
+        if any(result is None for result in results):
+            # an already packed sample file changed, not only grew
+            manifest = None
+
+    if manifest is None:
+        manifest = {}
+        new_pairs = file_pairs
+        for path in (path_img, path_lbl):
+            if os.path.exists(path):
+                os.remove(path)
+        results = readPairs(new_pairs, manifest, workers)
 
     out_lbl = idx.file(dtype=">u1", datashape=[])
     out_img = idx.file(dtype=">u1", datashape=[28, 28])
 
-    for file_lbl in os.listdir(in_path):
-        if file_lbl.endswith(".idx1-ubyte"):
-            path_lbl = os.path.join(in_path, file_lbl)
-            path_img = os.path.splitext(path_lbl)[0] + ".idx3-ubyte"
-            out_lbl.append(idx.read(path_lbl).body)
-            out_img.append(idx.read(path_img).body)
-    
-    idx.write(os.path.join(out_path, "lbl.idx1-ubyte"), out_lbl)
-    idx.write(os.path.join(out_path, "img.idx3-ubyte"), out_img)
-
-    saved =idx.read(os.path.join(out_path, "img.idx3-ubyte")).body
-    print(saved.shape)
+    out_img.extend(result[0] for result in results)
+    out_lbl.extend(result[1] for result in results)
+    for result in results:
+        manifest.update(result[2])
+
+    # creates the packed files on the first run
+    idx.append(path_img, out_img)
+    idx.append(path_lbl, out_lbl)
+
+    samples = countRecords(path_img)
+    saveManifest(out_path, manifest, samples)
+
+    print("Packed %i new or grown sample files (%i samples), %i samples in total." % (len(new_pairs), len(out_img.body), samples))
+
 if __name__ == "__main__":
-   main(sys.argv[1:])
\ No newline at end of file
+   main(sys.argv[1:])
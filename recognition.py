@@ -1,14 +1,125 @@
 from PyQt5 import QtGui, QtCore, QtWidgets
 import sys
+import time
+import threading
+import collections
 import numpy as np
-from scipy import ndimage
 sys.path.append('modules')
 import mnist
+import preprocess
 sys.path.append('extension')
 import pyceptron
 sys.path.append("recognition")
 import gui
 
+# Preprocesses drawings and feeds them to a network on its own thread, so
+# guessing while drawing never blocks the GUI. Only the latest request is
+# kept: a request that is submitted before the thread got to the previous
+# one replaces it, so the thread never works on an outdated canvas.
+class LivePredictor(QtCore.QThread):
+    # sequence number of the request, the prediction and the seconds it took
+    predicted = QtCore.pyqtSignal(int, object, float)
+
+    def __init__(self, parent=None):
+        super(LivePredictor, self).__init__(parent)
+        self.condition = threading.Condition()
+        self.request = None
+        self.stopped = False
+
+    # strokes are the arguments of preprocess.digit, they must not be
+    # changed afterwards (Painter.getStrokes returns copies).
+    def submit(self, sequence, network, strokes):
+        with self.condition:
+            self.request = (sequence, network, strokes)
+            self.condition.notify()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.request is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                sequence, network, strokes = self.request
+                self.request = None
+
+            start = time.perf_counter()
+            arr = preprocess.digit(*strokes)
+            try:
+                prediction = network.predict(preprocess.to_input(arr))
+            except RuntimeError:
+                # the network is in use by training or the Guess button,
+                # the next change of the drawing tries again
+                continue
+            self.predicted.emit(sequence, prediction, time.perf_counter() - start)
+
+# Trains a network on MNIST on its own thread, a few thousand samples per
+# call of train_batches, and reports after every call, so the GUI stays
+# responsive and training can be cancelled between two calls.
+class TrainingWorker(QtCore.QThread):
+    # epoch (from 1), fraction of the epoch done and samples per second
+    progressed = QtCore.pyqtSignal(int, float, float)
+    # epoch and error rate on the test set after it
+    tested = QtCore.pyqtSignal(int, float)
+    # whether all epochs were trained, or the error message if training failed
+    done = QtCore.pyqtSignal(object)
+
+    samplesPerCall = 2000
+
+    def __init__(self, network, epochs, batchsize, eta, parent=None):
+        super(TrainingWorker, self).__init__(parent)
+        self.network = network
+        self.epochs = epochs
+        self.batchsize = batchsize
+        self.eta = eta
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            images, labels = mnist.load(path="./mnist")
+            test_images, test_labels = mnist.load("testing", path="./mnist")
+        except (OSError, ValueError) as error:
+            self.done.emit(str(error))
+            return
+
+        batches = len(images) // self.batchsize # per epoch
+        count = max(1, self.samplesPerCall // self.batchsize)
+        position = 0
+        while position < self.epochs * batches and not self.cancelled:
+            epoch = position // batches
+            end = min(position + count, (epoch + 1) * batches)
+
+            start = time.perf_counter()
+            samples = (end - position) * self.batchsize
+            try:
+                position = self.network.train_batches(images, self.batchsize, self.eta, position, end - position, labels=labels)
+            except RuntimeError:
+                # the Guess button is using the network, try again
+                time.sleep(0.01)
+                continue
+            self.progressed.emit(epoch + 1, (position - epoch * batches) / batches,
+                                 samples / (time.perf_counter() - start))
+
+            while position == (epoch + 1) * batches:
+                try:
+                    error = self.network.evaluate(test_images, labels=test_labels)["error_rate"]
+                except RuntimeError:
+                    time.sleep(0.01)
+                    continue
+                self.tested.emit(epoch + 1, error)
+                break
+
+        self.done.emit(not self.cancelled)
+
 class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
     def setEta(self, value):
         self.eta = value
@@ -23,54 +134,76 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
             self.previewEnabled = False
 
     def trainNetwork(self):
-        training_set = mnist.read(path="./mnist")
-        vectorized_training_set = mnist.read(path="./mnist")
-
-        self.network.train(vectorized_training_set, epochs=self.epochs, batchsize=1, eta = self.eta / 60000)
+        if (self.trainingWorker is not None):
+            self.trainingWorker.cancel()
+            self.Train_Button.setEnabled(False)
+            self.Status_Label.setText("Cancelling training...")
+            return
 
-        self.Status_Label.setText("Training finished!")
-        self.StatusLamp.setGreen()
+        self.trainingWorker = TrainingWorker(self.network, self.epochs, 1, self.eta / 60000, self)
+        self.trainingWorker.progressed.connect(self.showTrainingProgress)
+        self.trainingWorker.tested.connect(self.showTestError)
+        self.trainingWorker.done.connect(self.trainingDone)
+
+        self.setTrainingWidgets(True)
+        self.Status_Label.setText("Loading MNIST...")
+        self.StatusLamp.setYellow()
+        self.trainingWorker.start()
+
+    # The network can't be replaced, saved or loaded while it is trained.
+    def setTrainingWidgets(self, training):
+        widgets = [self.Save_Button, self.Load_Button, self.Eta_DoubleSpinBox, self.Epochs_SpinBox,
+                   self.Activation_comboBox, self.Softmax_CheckBox, self.Architecture_lineEdit]
+        for widget in widgets:
+            widget.setEnabled(not training)
+
+        self.Train_Button.setEnabled(True)
+        self.Train_Button.setText("Cancel Training" if training else "Train Network")
+
+    def showTrainingProgress(self, epoch, fraction, speed):
+        self.Status_Label.setText("Epoch %i/%i: %i%%, %.0f samples/s%s"
+                                  % (epoch, self.epochs, 100 * fraction, speed, self.testError))
+
+    def showTestError(self, epoch, error):
+        self.testError = ", test error %.2f%%" % (100 * error)
+        self.Status_Label.setText("Epoch %i/%i%s" % (epoch, self.epochs, self.testError))
+
+    def trainingDone(self, result):
+        self.trainingWorker.wait()
+        self.trainingWorker = None
+        self.setTrainingWidgets(False)
+
+        if (result is True):
+            self.Status_Label.setText("Training finished!" + self.testError)
+            self.StatusLamp.setGreen()
+        elif (result is False):
+            self.Status_Label.setText("Training cancelled!" + self.testError)
+            self.StatusLamp.setRed()
+        else:
+            self.Status_Label.setText("Couldn't load MNIST! " + result)
+            self.StatusLamp.setRed()
+        self.testError = ""
 
     def guess(self):
-        img = QtGui.QImage(self.canvasPanel.geometry().width(), self.canvasPanel.geometry().height(), QtGui.QImage.Format_Grayscale8)
-        img.fill(QtCore.Qt.white)
-        painter = QtGui.QPainter()
-        painter.begin(img)
-        self.canvasPanel.drawLines(painter)
-        painter.end()
-        
-        scaled_img = img.scaledToHeight(28, mode=QtCore.Qt.SmoothTransformation)
-        scaled_img = scaled_img.convertToFormat(QtGui.QImage.Format_Grayscale8)
-
-        # image to buffer
-        b = scaled_img.bits()
-        # sip.voidptr must know size to support python buffer interface
-        b.setsize(28 * 28)
-        # buffer to array
-        arr = np.frombuffer(b, np.uint8).reshape((28, 28))
-    
-        arr = 255 - arr
-
-        # shift by weight (maybe better shift by bounding box?)
-        com = ndimage.measurements.center_of_mass(arr)
-        shift = np.subtract((14, 14),  com)
-        arr = ndimage.interpolation.shift(arr, shift)
+        arr = preprocess.digit(*self.canvasPanel.getStrokes())
 
         if (self.previewEnabled):
-
-            #arr_bits = arr * 255
-            arr_bits = 255 - arr
+            arr_bits = 255 - preprocess.to_uint8(arr)
             arr_bits = arr_bits.tobytes()
-            
 
             centered_img = QtGui.QImage(arr_bits, 28, 28, QtGui.QImage.Format_Grayscale8)
 
             self.canvasPanel.showImage(centered_img)
 
-        # normalize
-        arr = arr / 255
+        try:
+            prediction = self.network.predict(preprocess.to_input(arr))
+        except RuntimeError:
+            # still guessing the drawing on the live thread
+            self.Status_Label.setText("The network is busy, try again!")
+            return
+        self.showPrediction(prediction)
 
-        prediction = self.network.predict(arr.flatten().tolist())
+    def showPrediction(self, prediction):
         number = np.argmax(prediction)
         probability = prediction[number]
 
@@ -86,6 +219,53 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
         self.Bar_8.setValue(prediction[8])
         self.Bar_9.setValue(prediction[9])
 
+    def toggleLive(self):
+        if (self.Live_CheckBox.isChecked()):
+            self.liveEnabled = True
+            self.drawingChanged()
+        else:
+            self.liveEnabled = False
+            self.liveTimer.stop()
+
+    # The drawing is read at most once per liveInterval while it changes,
+    # so the bars follow the pen without a request for every mouse event.
+    def drawingChanged(self):
+        if (self.liveEnabled and not self.liveTimer.isActive()):
+            self.liveTimer.start(self.liveInterval)
+
+    def submitLive(self):
+        if (self.trainingWorker is not None):
+            # the network is busy
+            return
+
+        self.liveSequence += 1
+        if (self.canvasPanel.drawingShapes.getNumberOfShapes() == 0):
+            # drop the results still on their way
+            self.shownSequence = self.liveSequence
+            self.showPrediction(np.zeros(10))
+            self.Output_Label.setText("")
+            return
+
+        self.livePredictor.submit(self.liveSequence, self.network, self.canvasPanel.getStrokes())
+
+    def showLive(self, sequence, prediction, seconds):
+        self.latencies.append(seconds)
+        if (sequence <= self.shownSequence):
+            return
+        self.shownSequence = sequence
+
+        self.showPrediction(prediction)
+
+        p50, p90, p99 = np.percentile(self.latencies, [50, 90, 99]) * 1000
+        self.Status_Label.setText("Guess: %.1f ms (p90 %.1f, p99 %.1f)" % (p50, p90, p99))
+
+    def closeEvent(self, event):
+        if (self.trainingWorker is not None):
+            self.trainingWorker.cancel()
+            self.trainingWorker.wait()
+        self.livePredictor.stop()
+        super(GUI, self).closeEvent(event)
+
     def saveState(self):
         dlg = QtWidgets.QFileDialog()
         file_path = dlg.getSaveFileName(self, "Save Network State", './states',
@@ -100,18 +280,44 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
         file_path = dlg.getOpenFileName(self, 'Load Network State', './states',
                                         filter='Network State (*.state)')[0]
 
-        if file_path:
-            try:
+        if not file_path:
+            return
+
+        try:
+            info = pyceptron.state_info(file_path)
+            if info is None:
+                # older state files have no header and must fit the current network
                 self.network.load_state(file_path)
-            except:
-                self.Status_Label.setText("Incompatible state file!")
+            elif info["dtype"] == "int8":
+                self.Status_Label.setText("Quantized networks can't be trained here!")
                 return
-        else:
+            elif info["architecture"][0] != 784 or info["architecture"][-1] != 10:
+                self.Status_Label.setText("Architecture doesn't match dataset! (Should be 784,..,10.)")
+                return
+            else:
+                self.network = pyceptron.load(file_path)
+                self.showNetwork(info)
+        except (OSError, ValueError) as error:
+            self.Status_Label.setText("Incompatible state file! " + str(error))
             return
 
         self.Status_Label.setText("Loaded network state from disk!")
         self.StatusLamp.setGreen()
 
+    def showNetwork(self, info):
+        # the widgets would create a new network if their signals weren't blocked
+        widgets = [self.Activation_comboBox, self.Softmax_CheckBox, self.Architecture_lineEdit]
+        for widget in widgets:
+            widget.blockSignals(True)
+
+        activations = ["sigmoid", "tanh", "ReLU", "Leaky ReLU", "linear"]
+        self.Activation_comboBox.setCurrentIndex(activations.index(info["activation"]))
+        self.Softmax_CheckBox.setChecked(info["softmax"])
+        self.Architecture_lineEdit.setText(",".join(str(n) for n in info["architecture"]))
+
+        for widget in widgets:
+            widget.blockSignals(False)
+
     def createNetwork(self):
         activation = ""
         if self.Activation_comboBox.currentIndex() == 0:
@@ -174,6 +380,10 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
         self.Save_Button.clicked.connect(self.saveState)
         self.Load_Button.clicked.connect(self.loadState)
         self.Preview_CheckBox.clicked.connect(self.togglePreview)
+        self.Live_CheckBox.clicked.connect(self.toggleLive)
+        self.canvasPanel.changed.connect(self.drawingChanged)
+        self.liveTimer.timeout.connect(self.submitLive)
+        self.livePredictor.predicted.connect(self.showLive)
         self.Eta_DoubleSpinBox.valueChanged.connect(self.setEta)
         self.Epochs_SpinBox.valueChanged.connect(self.setEpochs)
         self.Activation_comboBox.currentIndexChanged.connect(self.createNetwork)
@@ -189,6 +399,20 @@ class GUI(QtWidgets.QMainWindow, gui.Ui_MainWindow):
         self.epochs = 1
         self.Eta_DoubleSpinBox.setValue(self.eta)
         self.Epochs_SpinBox.setValue(self.epochs)
+
+        self.liveEnabled = False
+        self.liveInterval = 30 # ms
+        self.liveTimer = QtCore.QTimer(self)
+        self.liveTimer.setSingleShot(True)
+        self.liveSequence = 0 # number of the latest request
+        self.shownSequence = 0 # number of the request shown in the bars
+        self.latencies = collections.deque(maxlen=500) # seconds of the latest guesses
+        self.livePredictor = LivePredictor(self)
+        self.livePredictor.start()
+
+        self.trainingWorker = None
+        self.testError = "" # of the latest epoch, shown until training is done
+
         self.connectSignals()
 
         self.previewEnabled = False
@@ -26,6 +26,9 @@ class Ui_MainWindow(object):
         self.Preview_CheckBox = QtWidgets.QCheckBox(self.centralwidget)
         self.Preview_CheckBox.setGeometry(QtCore.QRect(300, 370, 341, 29))
         self.Preview_CheckBox.setObjectName("Preview_CheckBox")
+        self.Live_CheckBox = QtWidgets.QCheckBox(self.centralwidget)
+        self.Live_CheckBox.setGeometry(QtCore.QRect(20, 370, 251, 29))
+        self.Live_CheckBox.setObjectName("Live_CheckBox")
         self.Eta_DoubleSpinBox = QtWidgets.QDoubleSpinBox(self.centralwidget)
         self.Eta_DoubleSpinBox.setGeometry(QtCore.QRect(170, 430, 101, 31))
         self.Eta_DoubleSpinBox.setDecimals(2)
@@ -241,6 +244,7 @@ class Ui_MainWindow(object):
         self.Guess_Button.setText(_translate("MainWindow", "Make A Guess"))
         self.Clear_Button.setText(_translate("MainWindow", "Clear"))
         self.Preview_CheckBox.setText(_translate("MainWindow", "Show Processing"))
+        self.Live_CheckBox.setText(_translate("MainWindow", "Guess While Drawing"))
         self.Eta_Label.setText(_translate("MainWindow", "Learning Rate"))
         self.Epochs_Label.setText(_translate("MainWindow", "Epochs"))
         self.Save_Button.setText(_translate("MainWindow", "Save State"))
@@ -1,16 +1,13 @@
 from PyQt5 import QtGui, QtCore, QtWidgets
 import sys
 import numpy as np
-from scipy import ndimage
-import datetime
 import struct
 sys.path.append("modules")
 import idx
+import preprocess
 sys.path.append("Survey")
 import uisurvey
 
-now = datetime.datetime.now
-
 class GUI(QtWidgets.QMainWindow, uisurvey.Ui_MainWindow):
 
     def clearAll(self):
@@ -20,35 +17,8 @@ class GUI(QtWidgets.QMainWindow, uisurvey.Ui_MainWindow):
         self.frame_4.clearCanvas()
         
     def get_image(self, painterWidget):
-        img = QtGui.QImage(painterWidget.geometry().width(), painterWidget.geometry().height(), QtGui.QImage.Format_Grayscale8)
-        img.fill(QtCore.Qt.white)
-        painter = QtGui.QPainter()
-        painter.begin(img)
-        painterWidget.drawLines(painter)
-        painter.end()
-        
-        scaled_img = img.scaledToHeight(28, mode=QtCore.Qt.SmoothTransformation)
-        scaled_img = scaled_img.convertToFormat(QtGui.QImage.Format_Grayscale8)
-
-        # image to buffer
-        b = scaled_img.bits()
-        # sip.voidptr must know size to support python buffer interface
-        b.setsize(28 * 28)
-        # buffer to array
-        arr = np.frombuffer(b, np.uint8).reshape((28, 28))
-        
-
-        arr = 255 - arr
-
-        # normalize
-        #arr = arr / 255
-
-        # shift by weight (maybe better shift by bounding box?)
-        com = ndimage.measurements.center_of_mass(arr)
-        shift = np.subtract((14, 14),  com)
-        arr = ndimage.interpolation.shift(arr, shift)
-
-        return arr
+        # uint8 pixels like the MNIST files, 255 is ink
+        return preprocess.to_uint8(preprocess.digit(*painterWidget.getStrokes()))
 
     def showImage(self, img_arr, frame):
         arr_bits = 255 - img_arr
@@ -76,10 +46,9 @@ class GUI(QtWidgets.QMainWindow, uisurvey.Ui_MainWindow):
 
             index += 1
 
-        str_now = now().strftime("%Y%m%d%H%M%S")
-
-        idx.write("Survey/samples/%s.idx3-ubyte" % str_now, img_file)
-        idx.write("Survey/samples/%s.idx1-ubyte" % str_now, lbl_file)
+        # all submissions go to one growing file pair
+        idx.append("Survey/samples/survey.idx3-ubyte", img_file)
+        idx.append("Survey/samples/survey.idx1-ubyte", lbl_file)
 
     def openSamples(self):
         dlg = QtWidgets.QFileDialog()
@@ -87,11 +56,13 @@ class GUI(QtWidgets.QMainWindow, uisurvey.Ui_MainWindow):
                                         filter='idx3 (*.idx3-ubyte)')[0]
 
         if file_path:
-            img = idx.read(file_path).body
+            with idx.open(file_path) as samples:
+                if not (len(samples) > 0 and len(samples) % 4 == 0 and samples.datashape == (28, 28)):
+                    print("Data shape doesn't match. Are you opening the correct file?")
+                    return 
 
-            if not (img.shape == (4, 28, 28)):
-                print("Data shape doesn't match. Are you opening the correct file?")
-                return 
+                # only read the latest submission
+                img = samples[-4:]
 
             frames = [self.frame_1, self.frame_2, self.frame_3, self.frame_4]
             for i in range(len(frames)):
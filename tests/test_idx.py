@@ -0,0 +1,58 @@
+import os
+import sys
+import numpy as np
+import pytest
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "modules"))
+import idx
+
+
+def write_pair(directory, name, images, labels):
+    img = idx.file(dtype=">u1", datashape=[28, 28])
+    img.body = images
+    lbl = idx.file(dtype=">u1", datashape=[])
+    lbl.body = labels
+    idx.write(os.path.join(directory, name + ".idx3-ubyte"), img)
+    idx.write(os.path.join(directory, name + ".idx1-ubyte"), lbl)
+
+
+def test_batches_larger_than_the_buffer(tmp_path):
+    # every image holds its sample number, so each sample must come out once
+    num_samples = 500
+    images = np.zeros((num_samples, 28, 28), dtype=np.uint8)
+    images[:, 0, 0] = np.arange(num_samples) % 256
+    images[:, 0, 1] = np.arange(num_samples) // 256
+    labels = np.arange(num_samples) % 10
+    write_pair(str(tmp_path), "a", images[:300], labels[:300])
+    write_pair(str(tmp_path), "b", images[300:], labels[300:])
+
+    batches = list(idx.batches(idx.pairs(str(tmp_path)), 64, buffersize=20, seed=0))
+
+    assert all(len(batch[0]) == 64 for batch in batches[:-1])
+    seen = np.concatenate([batch[0][:, 0] + 256 * batch[0][:, 1].astype(np.int64) for batch in batches])
+    assert sorted(seen) == list(range(num_samples))
+    assert all((batch[1] == (batch[0][:, 0] + 256 * batch[0][:, 1].astype(np.int64)) % 10).all() for batch in batches)
+
+
+def test_append_grows_the_record_count(tmp_path):
+    path = str(tmp_path / "labels.idx1-ubyte")
+    lbl = idx.file(dtype=">u1", datashape=[])
+    lbl.body = np.arange(3)
+    idx.append(path, lbl)
+    idx.append(path, lbl)
+
+    assert list(idx.read(path).body) == [0, 1, 2, 0, 1, 2]
+
+
+def test_append_rejects_damaged_files(tmp_path):
+    lbl = idx.file(dtype=">u1", datashape=[])
+    lbl.body = np.arange(3)
+    path = str(tmp_path / "labels.idx1-ubyte")
+    idx.write(path, lbl)
+    with open(path, "rb") as idx_file:
+        data = idx_file.read()
+
+    for damaged in (b"", data[:6], data[:-1], data[:2] + b"\x07" + data[3:]):
+        with open(path, "wb") as idx_file:
+            idx_file.write(damaged)
+        with pytest.raises(ValueError):
+            idx.append(path, lbl)
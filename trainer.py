@@ -6,17 +6,19 @@ sys.path.append("modules")
 import mnist
 sys.path.append("extension")
 import pyceptron
+import parallel
 
-# Read the training and testing set
+# Map the training and testing set, the network reads the arrays in place
 
-training_set = mnist.read(dataset="training", path="mnist")
-testing_set = mnist.read(dataset="testing", path="mnist")
+training_images, training_labels = mnist.load(dataset="training", path="mnist")
+testing_images, testing_labels = mnist.load(dataset="testing", path="mnist")
 
 architecture = [784, 10]
 activation = "ReLU"
 softmax = 1
 
 batchsize=1
+workers=1 # worker processes, batchsize must be a multiple
 
 network = pyceptron.Network(architecture, activation=activation, softmax=softmax)
 
@@ -27,33 +29,21 @@ for l in range(1, len(architecture)):
                         network.set_weight(l, j, k, 0.5-random.random())
                 network.set_bias(l, j, 0.5-random.random())
 
+trainer = parallel.ParallelTrainer(training_images, training_labels, workers=workers)
+
 data = list()
 epochs = 10
 
 for epoch in range(epochs+1):
     print(epoch)
 
-    # Calculate the testing error rate
-    num_wrong_test = 0
-    for sample in testing_set:
-        prediction = network.predict(sample[0])
-        prediction = np.argmax(prediction)
-        expectation = np.argmax(sample[1])
-        if not prediction == expectation:
-            num_wrong_test += 1
-
-    # Calculate the training error rate
-    num_wrong_train = 0
-    for sample in training_set:
-        prediction = network.predict(sample[0])
-        prediction = np.argmax(prediction)
-        expectation = np.argmax(sample[1])
-        if not prediction == expectation:
-            num_wrong_train += 1
-
-    data.append([epoch, num_wrong_train / len(training_set), num_wrong_test / len(testing_set)])
-
-    network.train(training_set, epochs=1, batchsize=batchsize, eta=0.005)
+    # Calculate the testing and training error rate
+    error_test = network.evaluate(testing_images, testing_labels)["error_rate"]
+    error_train = network.evaluate(training_images, training_labels)["error_rate"]
+
+    data.append([epoch, error_train, error_test])
+
+    trainer.train(network, epochs=1, batchsize=batchsize, eta=0.005)
 
 np.savetxt("data/test.txt", data)
 network.save_state("states/test.state")